@@ -0,0 +1,67 @@
+import os
+import sys
+import logging
+from logging.handlers import RotatingFileHandler
+
+from job_settings import app_cache_dir
+
+# 程序自己的日志都记在这个日志器下面，不影响第三方库（Pillow、python-pptx 等）的日志
+APP_LOGGER = 'xhs'
+
+# 环境变量：日志级别（DEBUG、INFO、WARNING、ERROR），默认 INFO；渲染子进程同样读取
+LOG_LEVEL_ENV = 'PPT_LOG_LEVEL'
+DEFAULT_LOG_LEVEL = 'INFO'
+
+# 日志文件达到这个大小后轮换，保留的旧文件个数
+LOG_FILE_MAX_BYTES = 2 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+CONSOLE_FORMAT = '%(message)s'
+FILE_FORMAT = '%(asctime)s %(levelname)s [%(processName)s] %(name)s: %(message)s'
+
+
+def get_logger(name):
+    """模块使用的日志器，例如 get_logger(__name__)"""
+    return logging.getLogger(f"{APP_LOGGER}.{name}")
+
+
+def default_log_path():
+    """日志文件的保存位置"""
+    return app_cache_dir('logs', 'app.log')
+
+
+def setup_logging(level=None, console=True, log_path=None, log_file=True):
+    """配置程序的日志：控制台（有控制台时）和按大小轮换的日志文件，可以重复调用
+
+    level 默认读取环境变量 PPT_LOG_LEVEL。渲染子进程只输出到控制台，
+    多个进程同时轮换同一个文件会互相覆盖。返回日志文件路径（不写文件时为 None）。
+    """
+    level = (level or os.environ.get(LOG_LEVEL_ENV) or DEFAULT_LOG_LEVEL).upper()
+    logger = logging.getLogger(APP_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    # 打包后的窗口程序没有控制台，sys.stdout 为 None
+    if console and sys.stdout is not None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        logger.addHandler(handler)
+
+    if not log_file:
+        return None
+    log_path = log_path or default_log_path()
+    try:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+            encoding='utf-8', delay=True
+        )
+    except OSError as e:
+        logger.warning("无法写入日志文件 %s: %s", log_path, e)
+        return None
+    handler.setFormatter(logging.Formatter(FILE_FORMAT))
+    logger.addHandler(handler)
+    return log_path
@@ -0,0 +1,334 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+
+from PIL import Image, ImageDraw
+from openpyxl import Workbook
+from pptx import Presentation
+from pptx.util import Emu, Pt
+
+from app_logging import LOG_LEVEL_ENV, setup_logging
+from generator import PPTGenerator, GenerationJob
+from render_cache import RenderCache
+from slide_filler import FIRST_IMAGE_MARK
+from slide_renderer import RENDERER_BACKENDS, StubRenderer
+from template_cache import TemplateCache
+from workbook_cache import WorkbookSnapshotCache
+
+# 结果文件格式版本（2：缓存放在测试目录中，不再读取用户缓存中的模板编译结果和表格快照）
+RESULT_VERSION = 2
+
+# 每像素的EMU数（模板按 96 DPI 把像素尺寸换算为幻灯片尺寸）
+EMU_PER_PIXEL = 914400 // 96
+
+EMOJIS = "😀😂🥰😎🤔🔥✨🎉💡📱💻🚀🌟❤️👍📷🍀🌈"
+
+
+class FakeRenderer(StubRenderer):
+    """基准测试用的模拟渲染器：导出带背景和文字色块的图片，编码开销接近真实页面
+
+    每页额外等待 BENCH_EXPORT_LATENCY 毫秒，模拟办公软件导出一页的耗时。
+    用环境变量传递是因为渲染子进程只会收到后端名称。
+    """
+
+    def export_slide(self, index, output_path, width, height, filter_name="JPG"):
+        if not 1 <= index <= self._slide_count:
+            raise IndexError(f"幻灯片序号超出范围: {index}")
+        latency = float(os.environ.get('BENCH_EXPORT_LATENCY', '0'))
+        if latency > 0:
+            time.sleep(latency / 1000)
+        image_format = "JPEG" if filter_name.upper() in ("JPG", "JPEG") else filter_name.upper()
+
+        # 渐变背景加上一行行色块代替文字
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        draw = ImageDraw.Draw(img)
+        rng = random.Random(index)
+        line_height = max(height // 45, 8)
+        for y in range(line_height * 2, height - line_height * 2, line_height * 3 // 2):
+            x = width // 15
+            while x < width - width // 10:
+                glyph = rng.randint(line_height * 3 // 4, line_height * 5 // 4)
+                draw.rectangle((x, y, x + glyph, y + line_height), fill=(30, 30, 30))
+                x += glyph + line_height // 4
+        img.save(output_path, image_format)
+
+
+# 在模块顶层注册，渲染子进程（spawn）导入本模块时同样可用
+RENDERER_BACKENDS['fake'] = FakeRenderer
+
+
+def shape_names(count):
+    """模板中文本框的名称，前两个与示例模板一致"""
+    names = ['标题', '内容']
+    return (names + [f"字段{i}" for i in range(3, count + 1)])[:count]
+
+
+def random_text(rng, length, emoji_density):
+    """生成指定长度的中文文本，按比例混入emoji，每约30个字换一行"""
+    chars = []
+    for i in range(length):
+        if i and i % 30 == 0:
+            chars.append('\n')
+        if rng.random() < emoji_density:
+            chars.append(rng.choice(EMOJIS))
+        else:
+            chars.append(chr(0x4e00 + rng.randrange(3000)))
+    return ''.join(chars)
+
+
+def build_template(path, shapes, width, height):
+    """生成单页模板：一张背景图和 shapes 个命名文本框"""
+    prs = Presentation()
+    prs.slide_width = Emu(width * EMU_PER_PIXEL)
+    prs.slide_height = Emu(height * EMU_PER_PIXEL)
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+
+    background = io.BytesIO()
+    Image.linear_gradient("L").resize((width // 4, height // 4)).convert("RGB").save(background, "PNG")
+    background.seek(0)
+    slide.shapes.add_picture(background, 0, 0, prs.slide_width, prs.slide_height)
+
+    margin = prs.slide_width // 12
+    box_height = (prs.slide_height - margin * 2) // max(shapes, 1)
+    for i, name in enumerate(shape_names(shapes)):
+        box = slide.shapes.add_textbox(margin, margin + box_height * i, prs.slide_width - margin * 2, box_height)
+        box.name = name
+        box.text_frame.word_wrap = True
+        box.text_frame.text = name
+        box.text_frame.paragraphs[0].runs[0].font.size = Pt(40 if i == 0 else 24)
+    prs.save(path)
+
+
+def build_workbook(path, rows, shapes, text_length, emoji_density, seed):
+    """生成与模板形状同名的数据表，第一行标题带首图标记"""
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    names = shape_names(shapes)
+    sheet.append(names)
+    for row in range(rows):
+        values = []
+        for column in range(len(names)):
+            # 标题较短，其余列使用指定长度
+            length = max(text_length // 4, 4) if column == 0 else text_length
+            values.append(random_text(rng, length, emoji_density))
+        if row == 0:
+            values[0] = FIRST_IMAGE_MARK + values[0]
+        sheet.append(values)
+    workbook.save(path)
+
+
+def git_commit():
+    """当前代码的提交号，便于对比不同版本的结果"""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        )
+        return output.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def summarize_runs(runs):
+    """多次运行取中位数"""
+    stages = {}
+    for name in sorted({name for run in runs for name in run['stages']}):
+        seconds = [run['stages'].get(name, {}).get('seconds', 0.0) for run in runs]
+        counts = [run['stages'].get(name, {}).get('count', 0) for run in runs]
+        stages[name] = {'seconds': statistics.median(seconds), 'count': max(counts)}
+    return {
+        'total_seconds': statistics.median(run['total_seconds'] for run in runs),
+        'stages': stages,
+    }
+
+
+def use_caches(generator, cache_dir):
+    """让生成器使用 cache_dir 中的模板编译结果和表格快照，不读写用户的缓存；渲染缓存不使用"""
+    generator.templates = TemplateCache(os.path.join(cache_dir, 'templates'))
+    generator.workbook_snapshots = WorkbookSnapshotCache(os.path.join(cache_dir, 'workbooks'))
+    generator.render_cache = RenderCache(os.path.join(cache_dir, 'renders'), max_bytes=0)
+
+
+def run_scenario(args, rows, work_dir):
+    """生成一组素材并重复运行，返回该场景的结果
+
+    默认每次运行都使用空的缓存（冷启动）；--warm 时各次运行共用缓存，第一次为冷启动，其余为热启动，分别统计。
+    """
+    name = f"rows={rows},shapes={args.shapes},text={args.text_length},emoji={args.emoji_density}"
+    if args.warm:
+        name += ",warm"
+    scenario_dir = os.path.join(work_dir, f"rows_{rows}")
+    os.makedirs(scenario_dir, exist_ok=True)
+    template_path = os.path.join(scenario_dir, "template.pptx")
+    excel_path = os.path.join(scenario_dir, "data.xlsx")
+    build_template(template_path, args.shapes, args.width, args.height)
+    build_workbook(excel_path, rows, args.shapes, args.text_length, args.emoji_density, args.seed)
+
+    runs = []
+    generator = PPTGenerator(max_documents=args.recycle_after)
+    try:
+        for repeat in range(args.repeat):
+            output_dir = os.path.join(scenario_dir, f"run_{repeat}")
+            os.makedirs(output_dir)
+            if not args.warm or repeat == 0:
+                use_caches(generator, os.path.join(output_dir if not args.warm else scenario_dir, "cache"))
+            job = GenerationJob(
+                template_path, excel_path, output_dir, args.width, args.height,
+                render_workers=args.workers, output_name="benchmark",
+                batch_size=args.batch_size, renderer_backend=args.backend,
+                # 每次重复的内容相同，使用渲染缓存就测不到导出耗时
+                render_cache=False, excel_cache=args.warm
+            )
+            start = time.perf_counter()
+            result = generator.run(job)
+            total = time.perf_counter() - start
+            runs.append({'total_seconds': total, 'stages': result.timings})
+            print(f"{name} 第 {repeat + 1}/{args.repeat} 次: {total:.3f} 秒")
+            if not args.keep:
+                shutil.rmtree(output_dir)
+    finally:
+        generator.close()
+
+    scenario = {
+        'name': name,
+        'params': {
+            'rows': rows, 'shapes': args.shapes, 'text_length': args.text_length,
+            'emoji_density': args.emoji_density, 'width': args.width, 'height': args.height,
+            'workers': args.workers, 'batch_size': args.batch_size, 'backend': args.backend,
+            'export_latency_ms': args.export_latency, 'seed': args.seed, 'warm': args.warm,
+        },
+        'runs': runs,
+    }
+    if args.warm:
+        # 主要结果为热启动，冷启动（第一次运行）另外记录
+        summary = summarize_runs(runs[1:])
+        scenario['cold'] = summarize_runs(runs[:1])
+    else:
+        summary = summarize_runs(runs)
+    scenario.update({
+        'total_seconds': summary['total_seconds'],
+        'rows_per_second': rows / summary['total_seconds'] if summary['total_seconds'] else None,
+        'stages': summary['stages'],
+    })
+    return scenario
+
+
+def compare_results(current, baseline, threshold):
+    """与之前的结果对比，返回变慢超过阈值的 (场景, 阶段, 之前, 现在) 列表"""
+    if baseline.get('version') != RESULT_VERSION:
+        print(f"基准结果的格式版本为 {baseline.get('version')}，与当前版本 {RESULT_VERSION} 的测量方式不同，仅供参考")
+    previous = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+    regressions = []
+    for scenario in current['scenarios']:
+        old = previous.get(scenario['name'])
+        if old is None:
+            print(f"{scenario['name']}: 基准结果中没有该场景")
+            continue
+        pairs = [('total', old['total_seconds'], scenario['total_seconds'])]
+        for stage, item in scenario['stages'].items():
+            if stage in old['stages']:
+                pairs.append((stage, old['stages'][stage]['seconds'], item['seconds']))
+        print(f"{scenario['name']}:")
+        for stage, before, after in pairs:
+            ratio = after / before if before else float('inf')
+            mark = ''
+            if before and ratio > 1 + threshold:
+                mark = '  <-- 变慢'
+                regressions.append((scenario['name'], stage, before, after))
+            print(f"  {stage:<14} {before:9.3f} -> {after:9.3f} 秒 ({ratio:5.2f}x){mark}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="生成与转换流程的基准测试：自动生成模板和数据，统计各阶段耗时并输出JSON结果"
+    )
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500], help="数据行数，可以给多个，默认 50 500")
+    parser.add_argument('--shapes', type=int, default=2, help="每页绑定的文本框数量，默认2")
+    parser.add_argument('--text-length', type=int, default=120, help="每个单元格的文字长度，默认120")
+    parser.add_argument('--emoji-density', type=float, default=0.05, help="emoji所占比例（0-1），默认0.05")
+    parser.add_argument('--width', type=int, default=1242, help="图片宽度，默认1242")
+    parser.add_argument('--height', type=int, default=1660, help="图片高度，默认1660")
+    parser.add_argument('--workers', type=int, default=1, help="转换图片的进程数，默认1")
+    parser.add_argument('--batch-size', type=int, default=50, help="每批转换的页数，默认50")
+    parser.add_argument('--backend', default='fake', help="渲染后端，默认为模拟渲染器 fake，也可以用 native 或 wps")
+    parser.add_argument('--export-latency', type=float, default=0,
+                        help="模拟渲染器每页额外等待的毫秒数，默认0")
+    parser.add_argument('--recycle-after', type=int, default=50, help="每个渲染器打开多少个文档后重启")
+    parser.add_argument('--repeat', type=int, default=3, help="每个场景重复次数，取中位数，默认3")
+    parser.add_argument('--warm', action='store_true',
+                        help="各次运行共用模板编译结果和表格快照，第一次运行记为冷启动，其余记为热启动（至少运行2次）")
+    parser.add_argument('--seed', type=int, default=1, help="随机数种子，默认1")
+    parser.add_argument('--output', default='benchmark_results.json', help="结果文件，默认 benchmark_results.json")
+    parser.add_argument('--compare', help="与之前的结果文件对比")
+    parser.add_argument('--threshold', type=float, default=0.2, help="对比时判定变慢的比例，默认0.2（20%%）")
+    parser.add_argument('--workdir', help="素材和输出文件的目录，默认使用临时目录")
+    parser.add_argument('--keep', action='store_true', help="保留生成的素材和输出文件")
+    parser.add_argument('--verbose', action='store_true', help="显示生成过程的日志（默认只显示警告和错误）")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.warm and args.repeat < 2:
+        parser.error("--warm 需要 --repeat 至少为2")
+    os.environ['BENCH_EXPORT_LATENCY'] = str(args.export_latency)
+    # 不显示生成过程的日志时只保留警告，渲染子进程通过环境变量使用同一级别
+    if not args.verbose:
+        os.environ[LOG_LEVEL_ENV] = 'WARNING'
+    setup_logging(log_file=False)
+
+    work_dir = args.workdir or tempfile.mkdtemp(prefix="ppt_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        scenarios = [run_scenario(args, rows, work_dir) for rows in args.rows]
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'version': RESULT_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scenarios': scenarios,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    for scenario in scenarios:
+        print(f"\n{scenario['name']}: 共 {scenario['total_seconds']:.3f} 秒，每秒 {scenario['rows_per_second']:.1f} 行")
+        if 'cold' in scenario:
+            print(f"冷启动（第一次运行）: 共 {scenario['cold']['total_seconds']:.3f} 秒")
+        for stage, item in scenario['stages'].items():
+            print(f"- {stage}: {item['count']} 次, 共 {item['seconds']:.3f} 秒")
+    print(f"\n结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n与 {args.compare} 对比（阈值 {args.threshold:.0%}）:")
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"有 {len(regressions)} 项变慢")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import os
+import tempfile
+
+from app_logging import get_logger
+from slide_filler import cell_content, set_shape_text
+
+# 数据格式版本，宏和本地替身据此检查
+PAYLOAD_VERSION = 'XHS1'
+
+# 记录分隔符和字段分隔符（ASCII 的 RS、US），单元格内容中的这两个字符会被删除
+RECORD_SEP = '\x1e'
+FIELD_SEP = '\x1f'
+
+# 每次调用宏填充的行数，也是批量填充时保存断点的间隔
+BULK_FILL_CHUNK_ROWS = 500
+
+# Office 中 MsoTriState 的“否”
+MSO_FALSE = 0
+
+# VBA 标准模块的类型（vbext_ct_StdModule）
+VBA_STD_MODULE = 1
+
+MACRO_MODULE = 'XhsBulkFill'
+MACRO_NAME = 'XhsBulkFill'
+
+# 在WPS进程内执行的填充宏：读取UTF-8的数据文件，按记录设置字号和文字，返回出错的形状数。
+# 字号为空时保持原字号。宏代码只用ASCII字符，避免VBA编辑器的编码问题
+FILL_MACRO = r'''
+Public Function XhsBulkFill(payloadPath As String, presentationName As String) As Long
+    Dim stream As Object, text As String, records() As String, fields() As String
+    Dim i As Long, failed As Long, pres As Object, textRange As Object
+
+    Set stream = CreateObject("ADODB.Stream")
+    stream.Type = 2
+    stream.Charset = "utf-8"
+    stream.Open
+    stream.LoadFromFile payloadPath
+    text = stream.ReadText(-1)
+    stream.Close
+
+    records = Split(text, Chr(30))
+    If records(0) <> "XHS1" Then
+        Err.Raise vbObjectError + 1, "XhsBulkFill", "invalid payload"
+    End If
+    Set pres = Presentations(presentationName)
+
+    For i = 1 To UBound(records)
+        If Len(records(i)) > 0 Then
+            On Error Resume Next
+            Set textRange = Nothing
+            fields = Split(records(i), Chr(31))
+            Set textRange = pres.Slides(CLng(fields(0))).Shapes(CLng(fields(1))).TextFrame.TextRange
+            If Err.Number = 0 Then
+                If Len(fields(2)) > 0 Then textRange.Font.Size = Val(fields(2))
+                textRange.Text = fields(3)
+            End If
+            If Err.Number <> 0 Then
+                failed = failed + 1
+                Err.Clear
+            End If
+            On Error GoTo 0
+        End If
+    Next i
+    XhsBulkFill = failed
+End Function
+'''
+
+logger = get_logger(__name__)
+
+
+class BulkFillUnavailable(Exception):
+    """WPS中不能运行填充宏（没有安装VBA环境，或不允许访问VBA工程）"""
+
+
+def row_writes(row, bindings, empty_value, first_image_font_size, font_sizes=None):
+    """一行要写入的 [(形状序号, 字号, 文字)]，形状序号从1开始（绑定计划中的序号从0开始，在这里换算），
+    字号规则与逐个形状写入时一致：自动缩小的字号优先，其次首图字号，否则恢复模板中的原始字号
+    """
+    writes = []
+    for binding in bindings:
+        content, first_image = cell_content(row, binding.column, empty_value)
+        if font_sizes and font_sizes.get(binding.column) is not None:
+            font_size = font_sizes[binding.column]
+        elif first_image:
+            font_size = first_image_font_size
+        else:
+            font_size = binding.font_size
+        writes.append((binding.index + 1, font_size, content))
+    return writes
+
+
+class FillPayload:
+    """一批行的填充数据，序列化后一次交给WPS进程内的宏执行
+
+    writes 为 [(页码, 形状序号, 字号, 文字)]，页码和形状序号从1开始（与COM一致），字号为 None 时保持原字号。
+    """
+
+    def __init__(self, writes=None):
+        self.writes = writes or []
+        self.rows = 0
+
+    def __len__(self):
+        return len(self.writes)
+
+    def add_row(self, slide_index, writes):
+        for shape_index, font_size, text in writes:
+            self.writes.append((slide_index, shape_index, font_size, text))
+        self.rows += 1
+
+    def serialize(self):
+        records = [PAYLOAD_VERSION]
+        for slide_index, shape_index, font_size, text in self.writes:
+            text = text.replace(RECORD_SEP, '').replace(FIELD_SEP, '')
+            size = '' if font_size is None else repr(float(font_size))
+            records.append(FIELD_SEP.join((str(slide_index), str(shape_index), size, text)))
+        return RECORD_SEP.join(records)
+
+    @classmethod
+    def parse(cls, data):
+        records = data.split(RECORD_SEP)
+        if records[0] != PAYLOAD_VERSION:
+            raise ValueError("填充数据格式不正确")
+        writes = []
+        for record in records[1:]:
+            if not record:
+                continue
+            slide_index, shape_index, size, text = record.split(FIELD_SEP)
+            writes.append((int(slide_index), int(shape_index), float(size) if size else None, text))
+        return cls(writes)
+
+
+class WpsMacroExecutor:
+    """在WPS进程内执行填充数据：宏放在一个不保存的辅助演示文稿中，目标文件不含宏，保存时不会弹出提示
+
+    每批数据只需要一次 Application.Run 调用。
+    """
+
+    def __init__(self, app, presentation):
+        self.app = app
+        self.presentation = presentation
+        self.host = None
+
+    def start(self):
+        try:
+            self.host = self.app.Presentations.Add(MSO_FALSE)
+            module = self.host.VBProject.VBComponents.Add(VBA_STD_MODULE)
+            module.Name = MACRO_MODULE
+            module.CodeModule.AddFromString(FILL_MACRO)
+        except Exception as e:
+            self.close()
+            raise BulkFillUnavailable(f"无法在WPS中添加填充宏（需要VBA环境并允许访问VBA工程）: {str(e)}")
+        return self
+
+    def run(self, payload):
+        """执行一批填充数据，返回出错的形状数"""
+        fd, payload_path = tempfile.mkstemp(prefix="xhs_fill_", suffix=".txt")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload.serialize())
+            return int(self.app.Run(
+                f"{self.host.Name}!{MACRO_MODULE}.{MACRO_NAME}", payload_path, self.presentation.Name
+            ))
+        finally:
+            os.remove(payload_path)
+
+    def close(self):
+        if self.host is not None:
+            try:
+                self.host.Close()
+            except Exception as e:
+                logger.warning("关闭填充宏所在的演示文稿失败: %s", e)
+            self.host = None
+
+
+class PptxPayloadExecutor:
+    """本地替身：把同样的填充数据写入python-pptx演示文稿，没有WPS时批量填充使用（见 PPTGenerator._fill_pptx_bulk）
+
+    数据先序列化再解析，与交给宏的内容完全相同；页码和形状序号从1开始，与宏一致。
+    """
+
+    def __init__(self, prs):
+        self.prs = prs
+
+    def run(self, payload):
+        """执行一批填充数据，返回出错的形状数"""
+        slides = list(self.prs.slides)
+        shapes = {}
+        failed = 0
+        for slide_index, shape_index, font_size, text in FillPayload.parse(payload.serialize()).writes:
+            try:
+                if slide_index not in shapes:
+                    shapes[slide_index] = list(slides[slide_index - 1].shapes)
+                set_shape_text(shapes[slide_index][shape_index - 1].text_frame, text, font_size)
+            except Exception as e:
+                failed += 1
+                logger.debug("第 %d 页形状 %d 写入失败: %s", slide_index, shape_index, e)
+        return failed
+
+    def close(self):
+        pass
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+import traceback
+
+from generator import PPTGenerator, GenerationJob
+from job_settings import SIZE_PRESETS, DEFAULT_SIZE_PRESET, FIT_MODES, parse_size
+from com_trace import COM_TRACE_ENV
+from app_logging import LOG_LEVEL_ENV, setup_logging
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="小红书图文批量制作工具（命令行版）：把Excel数据写入PPT模板并导出图片"
+    )
+    parser.add_argument('--template', help="PPT模板文件")
+    parser.add_argument('--excel', help="Excel数据文件")
+    parser.add_argument('--output', help="保存文件夹")
+    parser.add_argument('--size', nargs='+', default=[DEFAULT_SIZE_PRESET],
+                        help="图片尺寸：预设名称或 宽x高（如 1080x1440），默认为小红书图文封面（竖版）；"
+                             "给出多个尺寸时只导出一次，每种尺寸保存到图片文件夹下的子文件夹")
+    parser.add_argument('--fit', choices=list(FIT_MODES), default=None,
+                        help="尺寸比例与幻灯片不同时：stretch 拉伸、crop 居中裁剪、letterbox 留白；"
+                             "默认只有一种尺寸时拉伸，多种尺寸时裁剪")
+    parser.add_argument('--font-size', default="45", help="首图字体大小，默认45")
+    parser.add_argument('--empty-value', default=" ", help="空值替换内容，默认为空格")
+    parser.add_argument('--workers', type=int, default=None, help="转换图片的并行进程数")
+    parser.add_argument('--incremental', action='store_true', help="增量生成，只重新导出有变化的页面")
+    parser.add_argument('--no-auto-fit', dest='auto_fit', action='store_false',
+                        help="关闭自动缩小字号（默认内容放不下时自动缩小到能放下的最大字号）")
+    parser.add_argument('--no-render-cache', dest='render_cache', action='store_false',
+                        help="不使用渲染缓存（默认内容相同的页面直接复制以前导出的图片）")
+    parser.add_argument('--no-excel-cache', dest='excel_cache', action='store_false',
+                        help="不使用表格快照（默认同一个表格再次运行时直接读取上次解析的结果）")
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help="不从上次中断的地方继续（默认同一个任务上次没有完成时沿用其输出文件和已导出的图片）")
+    parser.add_argument('--name', help="输出PPT文件名，默认带时间戳")
+    parser.add_argument('--backend', default='auto',
+                        help="渲染后端：auto（默认，模板支持时使用原生渲染器，否则使用WPS；原生渲染器不支持渐变、阴影、"
+                             "文字轮廓、三维等艺术字效果）、native、wps、stub（输出纯色占位图片，用于测试调度流程）")
+    parser.add_argument('--bulk-fill', action='store_true',
+                        help="把每批行的数据打包一次写入：WPS填充时由WPS中的宏写入（需要WPS的VBA环境，不可用时自动逐个形状写入），"
+                             "python-pptx填充时由本地替身写入")
+    parser.add_argument('--render-timeout', type=float, default=None,
+                        help="导出一页的期限（秒），超过时重启渲染进程并重试该页，默认60")
+    parser.add_argument('--recycle-after', type=int, default=50,
+                        help="每个渲染器打开多少个文档后重启，默认50")
+    parser.add_argument('--trace-com', nargs='?', const='1', metavar='FILE',
+                        help="记录每个任务的COM调用次数和耗时（按成员和阶段），给出文件时每个任务追加一行JSON")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="日志级别，默认 INFO（或环境变量 PPT_LOG_LEVEL）；DEBUG 会记录每批页面和每个出错的形状")
+    parser.add_argument('--log-file', help="日志文件，默认写入应用缓存目录下的 logs/app.log（按大小轮换）")
+    parser.add_argument('--jobs', help="任务列表JSON文件，每个任务可设置与命令行参数同名的字段")
+    parser.add_argument('--list-sizes', action='store_true', help="列出预设尺寸后退出")
+    return parser
+
+
+def job_from_options(options):
+    """根据参数字典创建任务，字段名与命令行参数一致（横线换成下划线）"""
+    # 任务列表中 size 可以是单个尺寸或尺寸数组
+    sizes = options['size']
+    if isinstance(sizes, str):
+        sizes = [sizes]
+    width, height = parse_size(sizes[0])
+    return GenerationJob(
+        template_path=options['template'],
+        excel_path=options['excel'],
+        save_dir=options['output'],
+        width=width,
+        height=height,
+        first_image_font_size=str(options['font_size']),
+        empty_value=options['empty_value'],
+        render_workers=options['workers'],
+        incremental=options['incremental'],
+        output_name=options['name'],
+        renderer_backend=options['backend'],
+        auto_fit=options['auto_fit'],
+        extra_sizes=[parse_size(size) for size in sizes[1:]],
+        fit_mode=options['fit'],
+        render_cache=options['render_cache'],
+        resume=options['resume'],
+        render_timeout=options['render_timeout'],
+        bulk_fill=options['bulk_fill'],
+        excel_cache=options['excel_cache'],
+    )
+
+
+def load_jobs(args):
+    """读取任务列表，命令行参数作为每个任务的默认值"""
+    defaults = vars(args).copy()
+    if not args.jobs:
+        return [job_from_options(defaults)]
+
+    with open(args.jobs, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("任务列表必须是JSON数组")
+
+    # 任务列表中的相对路径以列表文件所在目录为准
+    base_dir = os.path.dirname(os.path.abspath(args.jobs))
+    jobs = []
+    for entry in entries:
+        options = defaults.copy()
+        options.update({key.replace('-', '_'): value for key, value in entry.items()})
+        for key in ('template', 'excel', 'output'):
+            if options[key] and not os.path.isabs(options[key]):
+                options[key] = os.path.join(base_dir, options[key])
+        jobs.append(job_from_options(options))
+    return jobs
+
+
+def print_progress(value, message):
+    print(f"[{value:5.1f}%] {message}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.list_sizes:
+        for name, size in SIZE_PRESETS.items():
+            if size is not None:
+                print(f"{size[0]}x{size[1]}\t{name}")
+        return 0
+
+    if args.log_level:
+        # 通过环境变量传给渲染子进程
+        os.environ[LOG_LEVEL_ENV] = args.log_level
+    setup_logging(log_path=args.log_file)
+
+    if args.trace_com:
+        # 通过环境变量开启，渲染子进程同样会继承
+        os.environ[COM_TRACE_ENV] = args.trace_com
+
+    try:
+        jobs = load_jobs(args)
+    except (OSError, ValueError) as e:
+        print(f"读取任务失败: {str(e)}", file=sys.stderr)
+        return 2
+
+    # 所有任务在同一个进程内依次执行，渲染器在任务之间常驻复用
+    generator = PPTGenerator(progress_callback=print_progress, max_documents=args.recycle_after)
+    failed = 0
+    try:
+        for index, job in enumerate(jobs, start=1):
+            print(f"=== 任务 {index}/{len(jobs)}: {job.excel_path}")
+            try:
+                result = generator.run(job)
+                print(f"完成: {result.ppt_path}（共 {result.slide_count} 页，导出 {result.rendered_count} 页图片）")
+                if result.failed_slides:
+                    print(f"以下 {len(result.failed_slides)} 页导出失败，再次运行同一个任务时会重新导出:", file=sys.stderr)
+                    for page, reason in sorted(result.failed_slides.items()):
+                        print(f"  第{page}页: {reason}", file=sys.stderr)
+            except Exception as e:
+                failed += 1
+                print(f"任务失败: {str(e)}\n{traceback.format_exc()}", file=sys.stderr)
+    finally:
+        generator.close()
+
+    print(f"全部完成：成功 {len(jobs) - failed} 个，失败 {failed} 个")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from app_logging import get_logger
+
+# 环境变量：设置后记录每次COM调用（属性读取、赋值、方法调用）的次数和耗时，按成员和阶段汇总。
+# 值为 1 时只在每个任务结束时打印汇总，其他值作为JSON文件路径（每个任务追加一行）。
+# 渲染子进程继承环境变量，各自记录后随批次结果一起传回主进程
+COM_TRACE_ENV = 'PPT_COM_TRACE'
+
+logger = get_logger(__name__)
+
+# 汇总中列出的最慢成员数量
+REPORT_TOP_MEMBERS = 25
+
+# 不在任何阶段内的调用
+NO_STAGE = 'other'
+
+# 这些类型的返回值不是COM对象，直接返回
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None), tuple, list, dict)
+
+# 返回集合中一个元素的方法，结果按元素命名（Slides.Item() 得到 Slide）
+_ITEM_METHODS = ('Item', 'Open', 'Add')
+
+
+def _item_name(collection):
+    """集合元素的名称：Slides -> Slide"""
+    return collection[:-1] if collection.endswith('s') else collection
+
+
+class ComTracer:
+    """COM调用统计：{(阶段, 成员): [次数, 耗时]}
+
+    成员名称带上取得该对象的属性名，例如 TextRange.Font.Size 记为 Font.Size，
+    方法调用记为 Slides.Item()（包括取得方法本身的耗时），赋值记为 Font.Size=，
+    集合的元素按集合名称的单数命名，例如 Shapes(1).Name 记为 Shape.Name。
+    """
+
+    def __init__(self):
+        self.calls = {}
+        # 每个线程各自的阶段栈（后处理线程与导出线程同时处于不同阶段）
+        self._local = threading.local()
+
+    def _stages(self):
+        if not hasattr(self._local, 'stages'):
+            self._local.stages = []
+        return self._local.stages
+
+    @property
+    def current_stage(self):
+        stages = self._stages()
+        return stages[-1] if stages else NO_STAGE
+
+    @contextmanager
+    def stage(self, name):
+        stages = self._stages()
+        stages.append(name)
+        try:
+            yield
+        finally:
+            stages.pop()
+
+    def add(self, member, seconds, stage=None, count=1):
+        key = (stage or self.current_stage, member)
+        item = self.calls.setdefault(key, [0, 0.0])
+        item[0] += count
+        item[1] += seconds
+
+    def wrap(self, obj, name='Application'):
+        return TracedObject(obj, self, name)
+
+    def as_list(self):
+        return [
+            {'stage': stage, 'member': member, 'count': count, 'seconds': seconds}
+            for (stage, member), (count, seconds) in self.calls.items()
+        ]
+
+    def merge(self, calls):
+        """合并另一个记录器（或子进程返回的 as_list() 结果）"""
+        if isinstance(calls, ComTracer):
+            calls = calls.as_list()
+        for item in calls:
+            self.add(item['member'], item['seconds'], item['stage'], item['count'])
+
+    def drain(self):
+        """返回已有的记录并清空"""
+        calls = self.as_list()
+        self.calls = {}
+        return calls
+
+    def report(self, title="COM调用统计"):
+        """按阶段和成员的可读汇总"""
+        total_count = sum(count for count, _ in self.calls.values())
+        total_seconds = sum(seconds for _, seconds in self.calls.values())
+        lines = [f"{title}: 共 {total_count} 次, {total_seconds:.3f} 秒"]
+
+        stages = {}
+        for (stage, _), (count, seconds) in self.calls.items():
+            item = stages.setdefault(stage, [0, 0.0])
+            item[0] += count
+            item[1] += seconds
+        lines.append("- 按阶段:")
+        for stage, (count, seconds) in sorted(stages.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"  {stage}: {count} 次, {seconds:.3f} 秒")
+
+        members = {}
+        for (_, member), (count, seconds) in self.calls.items():
+            item = members.setdefault(member, [0, 0.0])
+            item[0] += count
+            item[1] += seconds
+        lines.append(f"- 最慢的 {REPORT_TOP_MEMBERS} 个成员（次数/总耗时/平均）:")
+        slowest = sorted(members.items(), key=lambda item: item[1][1], reverse=True)[:REPORT_TOP_MEMBERS]
+        for member, (count, seconds) in slowest:
+            lines.append(f"  {member}: {count} 次, {seconds:.3f} 秒, 平均 {seconds / count * 1000:.2f} 毫秒")
+        return "\n".join(lines)
+
+
+def _unwrap(value):
+    return object.__getattribute__(value, '_obj') if isinstance(value, TracedObject) else value
+
+
+class TracedObject:
+    """COM对象的代理：每次属性读取、赋值和调用都计时，返回的COM对象同样被代理"""
+
+    __slots__ = ('_obj', '_tracer', '_name')
+
+    def __init__(self, obj, tracer, name):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_tracer', tracer)
+        object.__setattr__(self, '_name', name)
+
+    def _wrap_result(self, value, name):
+        if isinstance(value, _PLAIN_TYPES):
+            return value
+        return TracedObject(value, object.__getattribute__(self, '_tracer'), name)
+
+    def __getattr__(self, name):
+        obj = object.__getattribute__(self, '_obj')
+        tracer = object.__getattribute__(self, '_tracer')
+        owner = object.__getattribute__(self, '_name')
+        member = f"{owner}.{name}"
+        start = time.perf_counter()
+        try:
+            value = getattr(obj, name)
+        except BaseException:
+            tracer.add(member, time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        if callable(value) and not any(hasattr(value, attr) for attr in ('_oleobj_', '_comobj', 'QueryInterface')):
+            # 方法：取得方法的耗时计入调用
+            result_name = _item_name(owner) if name in _ITEM_METHODS else name
+            return _TracedMethod(value, tracer, member, result_name, elapsed)
+        tracer.add(member, elapsed)
+        return self._wrap_result(value, name)
+
+    def __setattr__(self, name, value):
+        tracer = object.__getattribute__(self, '_tracer')
+        member = f"{object.__getattribute__(self, '_name')}.{name}="
+        start = time.perf_counter()
+        try:
+            setattr(object.__getattribute__(self, '_obj'), name, _unwrap(value))
+        finally:
+            tracer.add(member, time.perf_counter() - start)
+
+    def __call__(self, *args):
+        # 集合按序号取元素，例如 Shapes(1)
+        tracer = object.__getattribute__(self, '_tracer')
+        name = object.__getattribute__(self, '_name')
+        start = time.perf_counter()
+        try:
+            value = object.__getattribute__(self, '_obj')(*[_unwrap(arg) for arg in args])
+        finally:
+            tracer.add(f"{name}()", time.perf_counter() - start)
+        return self._wrap_result(value, _item_name(name))
+
+    def __iter__(self):
+        tracer = object.__getattribute__(self, '_tracer')
+        name = object.__getattribute__(self, '_name')
+        iterator = iter(object.__getattribute__(self, '_obj'))
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                tracer.add(f"{name}.__iter__", time.perf_counter() - start, count=0)
+                return
+            tracer.add(f"{name}.__iter__", time.perf_counter() - start)
+            yield self._wrap_result(item, _item_name(name))
+
+    def __repr__(self):
+        return f"<Traced {object.__getattribute__(self, '_name')}: {object.__getattribute__(self, '_obj')!r}>"
+
+
+class _TracedMethod:
+    def __init__(self, method, tracer, member, result_name, lookup_seconds):
+        self._method = method
+        self._tracer = tracer
+        self._member = f"{member}()"
+        self._name = result_name
+        self._lookup_seconds = lookup_seconds
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            value = self._method(*[_unwrap(arg) for arg in args],
+                                 **{key: _unwrap(arg) for key, arg in kwargs.items()})
+        finally:
+            self._tracer.add(self._member, time.perf_counter() - start + self._lookup_seconds)
+        if isinstance(value, _PLAIN_TYPES):
+            return value
+        return TracedObject(value, self._tracer, self._name)
+
+
+# 当前进程的记录器，未开启时为 None
+tracer = None
+
+
+def enable():
+    global tracer
+    if tracer is None:
+        tracer = ComTracer()
+    return tracer
+
+
+def enable_from_env():
+    """环境变量 PPT_COM_TRACE 设置时开启，返回是否已开启"""
+    if os.environ.get(COM_TRACE_ENV):
+        enable()
+        return True
+    return False
+
+
+def wrap(obj, name='Application'):
+    """开启时返回代理对象，否则原样返回"""
+    if tracer is None:
+        return obj
+    return tracer.wrap(obj, name)
+
+
+@contextmanager
+def stage(name):
+    """把 with 块内的COM调用计入 name 阶段（未开启时什么也不做）"""
+    if tracer is None:
+        yield
+        return
+    with tracer.stage(name):
+        yield
+
+
+def drain():
+    """取出当前进程的记录（子进程随批次结果传回），未开启时返回 None"""
+    return tracer.drain() if tracer is not None else None
+
+
+def merge(calls):
+    if tracer is not None and calls:
+        tracer.merge(calls)
+
+
+def write_report(label, stages=None):
+    """任务结束时按环境变量输出本任务的汇总并清空记录；stages 为 StageTimer.as_dict()，一起写入JSON"""
+    target = os.environ.get(COM_TRACE_ENV)
+    if tracer is None or not target:
+        return
+    logger.info(tracer.report(f"COM调用统计（{label}）"))
+    calls = tracer.drain()
+    if target == '1':
+        return
+    entry = {
+        'label': label,
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'pid': os.getpid(),
+        'calls': calls,
+        'stages': stages or {},
+    }
+    try:
+        with open(target, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning("写入COM调用统计失败: %s", e)
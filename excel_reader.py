@@ -0,0 +1,165 @@
+import os
+import csv
+
+from app_logging import get_logger
+
+# Excel空单元格的替换值（与原来 fillna(' ') 一致）
+EMPTY_CELL = ' '
+
+logger = get_logger(__name__)
+
+
+def _header_names(header):
+    """按pandas的规则生成列名：空列名为 Unnamed: n，重复列名加 .1、.2 后缀"""
+    names = []
+    seen = {}
+    for index, value in enumerate(header):
+        name = f"Unnamed: {index}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and value == '')
+
+
+class ExcelRowSource:
+    """流式读取Excel/CSV数据，逐行产出字典，内存占用与表格大小无关
+
+    第一行作为列名；整行为空的行跳过，空单元格替换为空格。
+    columns 指定只保留哪些列（例如模板中的形状名称），None 表示保留全部列。
+    .xlsx 使用 openpyxl 只读模式，.csv 使用 csv 模块，.xls 只能整体读入（pandas）。
+    传入 snapshots（WorkbookSnapshotCache）时，第一次完整读取的同时保存解析结果的快照，
+    之后读取内容相同的表格直接从快照读取，不再解析Excel。
+    """
+
+    def __init__(self, path, columns=None, snapshots=None):
+        self.path = path
+        self.wanted = set(columns) if columns is not None else None
+        self.columns = []
+        self.estimated_rows = 0
+        self.snapshots = snapshots
+        self._snapshot = None
+        # 使用快照时顺便计算的文件内容摘要，调用方可以直接使用
+        self.content_digest = None
+        if snapshots is not None:
+            try:
+                self._snapshot, self.content_digest = snapshots.find(path)
+                if self._snapshot is not None:
+                    from workbook_cache import read_snapshot_header
+
+                    # 快照中的行数是准确的
+                    self.columns, self.estimated_rows = read_snapshot_header(self._snapshot)
+                    return
+            except (OSError, ValueError) as e:
+                logger.warning("读取表格快照失败，重新解析表格: %s", e)
+                self._snapshot = None
+        self._read_header()
+
+    def _extension(self):
+        return os.path.splitext(self.path)[1].lower()
+
+    def _read_header(self):
+        extension = self._extension()
+        if extension == '.csv':
+            with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+                header = next(csv.reader(f), [])
+                self.estimated_rows = sum(1 for _ in f)
+        elif extension == '.xls':
+            import pandas as pd
+
+            # pandas 已经处理过空列名和重复列名
+            self.columns = [str(name) for name in pd.read_excel(self.path, nrows=0).columns]
+            self.estimated_rows = 0
+            return
+        else:
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(self.path, read_only=True, data_only=True)
+            try:
+                sheet = workbook.worksheets[0]
+                header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+                # 只读模式下的行数来自表格的尺寸信息，只用于估算进度
+                self.estimated_rows = max((sheet.max_row or 1) - 1, 0)
+            finally:
+                workbook.close()
+        self.columns = _header_names(header)
+
+    def selected_columns(self):
+        """实际产出的列"""
+        if self.wanted is None:
+            return list(self.columns)
+        return [name for name in self.columns if name in self.wanted]
+
+    def _raw_rows(self):
+        extension = self._extension()
+        if extension == '.csv':
+            with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    yield row
+        elif extension == '.xls':
+            import pandas as pd
+
+            df = pd.read_excel(self.path)
+            for row in df.itertuples(index=False, name=None):
+                yield [None if pd.isna(value) else value for value in row]
+        else:
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(self.path, read_only=True, data_only=True)
+            try:
+                sheet = workbook.worksheets[0]
+                for row in sheet.iter_rows(min_row=2, values_only=True):
+                    yield row
+            finally:
+                workbook.close()
+
+    def __iter__(self):
+        positions = [
+            (index, name) for index, name in enumerate(self.columns)
+            if self.wanted is None or name in self.wanted
+        ]
+        if self._snapshot is None and self.content_digest is not None:
+            # 同一个任务前一遍读取时可能已经写好了快照
+            self._snapshot = self.snapshots.lookup(self.content_digest)
+        if self._snapshot is not None:
+            from workbook_cache import iter_snapshot_rows
+
+            for values in iter_snapshot_rows(self._snapshot):
+                yield {name: values[index] for index, name in positions}
+            return
+
+        writer = None
+        if self.content_digest is not None:
+            try:
+                writer = self.snapshots.writer(self.content_digest, self.columns)
+            except OSError as e:
+                logger.warning("无法写入表格快照: %s", e)
+        width = len(self.columns)
+        try:
+            for raw in self._raw_rows():
+                # 跳过整行为空的行（与原来 dropna(how='all') 一致，判断所有列）
+                if all(_is_empty(value) for value in raw):
+                    continue
+                # 快照保存所有列，换了模板（用到的列不同）也能使用
+                values = tuple(
+                    EMPTY_CELL if index >= len(raw) or _is_empty(raw[index]) else raw[index]
+                    for index in range(width)
+                )
+                if writer is not None:
+                    writer.add(values)
+                yield {name: values[index] for index, name in positions}
+        except BaseException:
+            # 出错或没有读完（调用方提前结束）时不保存快照
+            if writer is not None:
+                writer.discard()
+            raise
+        if writer is not None and writer.commit():
+            self._snapshot = writer.path
@@ -0,0 +1,157 @@
+import os
+
+from PIL import ImageFont
+
+
+# 环境变量：指定缺少字体时使用的字体文件
+FALLBACK_FONT_ENV = 'PPT_RENDER_FONT'
+
+# 中文字体名称与字体文件中英文名称的对应关系
+FONT_ALIASES = {
+    '微软雅黑': 'microsoft yahei',
+    '宋体': 'simsun',
+    '新宋体': 'nsimsun',
+    '黑体': 'simhei',
+    '楷体': 'kaiti',
+    '仿宋': 'fangsong',
+    '等线': 'dengxian',
+    '苹方-简': 'pingfang sc',
+    '思源黑体': 'source han sans sc',
+}
+
+# 模板字体没有安装时依次尝试的中文字体
+FALLBACK_FAMILIES = [
+    'microsoft yahei', 'dengxian', 'simhei', 'simsun', 'pingfang sc',
+    'noto sans cjk sc', 'noto sans sc', 'source han sans sc',
+    'wenquanyi micro hei', 'wenquanyi zen hei', 'droid sans fallback',
+]
+
+EMOJI_FAMILIES = ['segoe ui emoji', 'noto emoji', 'symbola']
+
+
+def is_east_asian(ch):
+    code = ord(ch)
+    return (0x2e80 <= code <= 0x9fff or 0xf900 <= code <= 0xfaff or 0xfe30 <= code <= 0xfe4f
+            or 0xff00 <= code <= 0xffef or 0x20000 <= code <= 0x2ffff)
+
+
+def is_emoji(ch):
+    code = ord(ch)
+    return 0x1f000 <= code <= 0x1faff or 0x2600 <= code <= 0x27bf
+
+
+def _normalize_family(name):
+    name = name.strip()
+    return FONT_ALIASES.get(name, name).lower()
+
+
+def _font_dirs():
+    """系统字体目录（Windows、Linux、macOS）"""
+    dirs = []
+    windir = os.environ.get('WINDIR')
+    if windir:
+        dirs.append(os.path.join(windir, 'Fonts'))
+    local = os.environ.get('LOCALAPPDATA')
+    if local:
+        dirs.append(os.path.join(local, 'Microsoft', 'Windows', 'Fonts'))
+    home = os.path.expanduser('~')
+    dirs += ['/usr/share/fonts', '/usr/local/share/fonts', os.path.join(home, '.fonts'),
+             os.path.join(home, '.local', 'share', 'fonts'), '/Library/Fonts', '/System/Library/Fonts']
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+class FontLibrary:
+    """按字体名称查找系统字体文件，缓存字体对象和字宽
+
+    第一次查找时扫描系统字体目录，每个进程只扫描一次。
+    """
+
+    def __init__(self):
+        self._index = None
+        self.fonts = {}
+        self._widths = {}
+        self._fallback = False
+        self._emoji = False
+
+    def _scan(self):
+        self._index = {}
+        for font_dir in _font_dirs():
+            for root, _, files in os.walk(font_dir):
+                for filename in files:
+                    if not filename.lower().endswith(('.ttf', '.ttc', '.otf', '.otc')):
+                        continue
+                    path = os.path.join(root, filename)
+                    for index in range(16):
+                        try:
+                            family, style = ImageFont.truetype(path, 12, index=index).getname()
+                        except Exception:
+                            break
+                        if family:
+                            self._index.setdefault(family.lower(), []).append((path, index, (style or '').lower()))
+                        if not filename.lower().endswith(('.ttc', '.otc')):
+                            break
+
+    def find(self, typeface, bold=False):
+        """按字体名称查找，返回 (文件, 序号, 是否为粗体字形)，找不到返回 None"""
+        if not typeface:
+            return None
+        if self._index is None:
+            self._scan()
+        faces = self._index.get(_normalize_family(typeface))
+        if not faces:
+            return None
+        if bold:
+            for path, index, style in faces:
+                if 'bold' in style:
+                    return path, index, True
+        for path, index, style in faces:
+            if style in ('regular', 'normal', 'book', ''):
+                return path, index, False
+        path, index, style = faces[0]
+        return path, index, 'bold' in style
+
+    def fallback(self):
+        """模板字体缺失时使用的中文字体，环境变量 PPT_RENDER_FONT 可以指定字体文件"""
+        if self._fallback is False:
+            self._fallback = None
+            path = os.environ.get(FALLBACK_FONT_ENV)
+            if path and os.path.exists(path):
+                self._fallback = (path, 0, False)
+            else:
+                for family in FALLBACK_FAMILIES:
+                    face = self.find(family)
+                    if face is not None:
+                        self._fallback = face
+                        break
+        return self._fallback
+
+    def emoji(self):
+        if self._emoji is False:
+            self._emoji = None
+            for family in EMOJI_FAMILIES:
+                face = self.find(family)
+                if face is not None:
+                    self._emoji = face
+                    break
+        return self._emoji
+
+    def font(self, face, size_px):
+        key = (face[0], face[1], size_px)
+        font = self.fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(face[0], size_px, index=face[1])
+            self.fonts[key] = font
+        return font
+
+    def width(self, font, ch):
+        """单个字符的宽度（像素），按字体和字号缓存"""
+        key = (id(font), ch)
+        width = self._widths.get(key)
+        if width is None:
+            width = font.getlength(ch)
+            self._widths[key] = width
+        return width
+
+
+# 每个进程共用一个字体库
+fonts = FontLibrary()
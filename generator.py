@@ -0,0 +1,905 @@
+import os
+import time
+import shutil
+from collections import Counter
+
+import com_trace
+from app_logging import get_logger
+from excel_reader import ExcelRowSource
+from slide_filler import SlideFiller, ShapeBinding, cell_content, row_slide_index, deck_slide_count
+from slide_renderer import (
+    render_slides, RendererPool, ImageOutput, slide_image_path, outputs_export_size, package_slide_count
+)
+from render_supervisor import RenderSupervisor, Watchdog, OPEN_TIMEOUT, EXPORT_TIMEOUT
+from stage_timer import StageTimer
+from job_settings import default_worker_count
+from text_fit import fitter_for_slide, fit_box_from_com, fit_signature, TextFitter
+from template_cache import TemplateCache
+from incremental import RenderManifest, RowKeyRecorder, settings_digest, row_key, slide_keys, file_digest
+from render_cache import RenderCache, image_key
+from workbook_cache import WorkbookSnapshotCache
+from job_journal import JobJournal, job_fingerprint, CHECKPOINT_ROWS
+from bulk_fill import (
+    FillPayload, WpsMacroExecutor, PptxPayloadExecutor, BulkFillUnavailable, row_writes, BULK_FILL_CHUNK_ROWS
+)
+
+# 增量模式下使用的固定文件名
+INCREMENTAL_FILENAME = "小红书图文.pptx"
+
+# WPS填充时打开、另存和保存大文件的期限（秒），超过时结束WPS，任务以超时失败
+SAVE_TIMEOUT = 300
+
+logger = get_logger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """生成任务被用户取消"""
+
+
+class GenerationJob:
+    """一次生成任务的全部参数"""
+
+    def __init__(self, template_path, excel_path, save_dir, width=1242, height=1660,
+                 first_image_font_size="45", empty_value=" ", render_workers=None,
+                 incremental=False, output_name=None, batch_size=50, renderer_backend='auto',
+                 auto_fit=True, extra_sizes=None, fit_mode=None, render_cache=True, resume=True,
+                 render_timeout=None, bulk_fill=False, excel_cache=True):
+        self.template_path = template_path
+        self.excel_path = excel_path
+        self.save_dir = save_dir
+        self.width = int(width)
+        self.height = int(height)
+        self.first_image_font_size = first_image_font_size
+        self.empty_value = empty_value
+        self.render_workers = render_workers if render_workers is not None else default_worker_count()
+        self.incremental = incremental
+        self.output_name = output_name
+        self.batch_size = batch_size
+        self.renderer_backend = renderer_backend
+        # 内容放不下时按字体度量自动缩小字号
+        self.auto_fit = auto_fit
+        # 同时输出的其他尺寸 [(宽, 高)]，只导出一次，再缩放为每种尺寸
+        self.extra_sizes = [(int(w), int(h)) for w, h in (extra_sizes or [])]
+        # 比例与幻灯片不同时的处理方式，None 表示只有一种尺寸时拉伸（与原来一致），多种尺寸时居中裁剪
+        self.fit_mode = fit_mode
+        # 使用跨任务的渲染缓存（内容相同的页面直接复制以前导出的图片）
+        self.render_cache = render_cache
+        # 同一个任务上次中断时从断点继续（沿用输出文件名和已导出的图片）
+        self.resume = resume
+        # 导出一页的期限（秒），超过时重启渲染子进程并重试该页
+        self.render_timeout = render_timeout or EXPORT_TIMEOUT
+        # WPS填充时把数据打包交给WPS进程内的宏一次写入多行，代替逐个形状的COM调用
+        self.bulk_fill = bulk_fill
+        # 使用解析后的表格快照（同一个表格再次运行时不必重新解析Excel）
+        self.excel_cache = excel_cache
+
+    def output_sizes(self):
+        """全部输出尺寸（去重），第一个为主尺寸"""
+        sizes = []
+        for size in [(self.width, self.height)] + self.extra_sizes:
+            if size not in sizes:
+                sizes.append(size)
+        return sizes
+
+    def effective_fit_mode(self):
+        if self.fit_mode is not None:
+            return self.fit_mode
+        return 'crop' if len(self.output_sizes()) > 1 else 'stretch'
+
+    def image_outputs(self, ppt_path):
+        """返回 (图片文件夹, ImageOutput 列表)：图片文件夹与PPT同名，多种尺寸时每种尺寸一个子文件夹"""
+        base_name = os.path.splitext(os.path.basename(ppt_path))[0]
+        images_dir = os.path.join(os.path.dirname(ppt_path), base_name)
+        fit_mode = self.effective_fit_mode()
+        subdirs = self.size_subdirs()
+        if subdirs is None:
+            return images_dir, [ImageOutput(images_dir, self.width, self.height, fit_mode)]
+        return images_dir, [
+            ImageOutput(os.path.join(images_dir, subdir), w, h, fit_mode)
+            for subdir, (w, h) in zip(subdirs, self.output_sizes())
+        ]
+
+    def size_subdirs(self):
+        """多种尺寸时每种尺寸的子文件夹名（如 1242x1660），只有一种尺寸时为 None（直接保存在图片文件夹中）"""
+        sizes = self.output_sizes()
+        if len(sizes) == 1:
+            return None
+        return [f"{w}x{h}" for w, h in sizes]
+
+    def validate(self):
+        """检查文件路径，有问题时抛出 ValueError"""
+        if not self.template_path:
+            raise ValueError("请选择PPT模板文件")
+        if not self.excel_path:
+            raise ValueError("请选择Excel数据文件")
+        if not self.save_dir:
+            raise ValueError("请选择保存位置")
+        if not os.path.exists(self.template_path):
+            raise ValueError("PPT模板文件不存在")
+        if not os.path.exists(self.excel_path):
+            raise ValueError("Excel数据文件不存在")
+        if not os.path.exists(self.save_dir):
+            raise ValueError("保存文件夹不存在")
+
+    def output_path(self):
+        """生成完整的保存路径（添加文件名）"""
+        if self.output_name:
+            save_filename = self.output_name
+            if not save_filename.lower().endswith('.pptx'):
+                save_filename += '.pptx'
+        elif self.incremental:
+            # 增量模式使用固定文件名，下次运行时才能与上次的结果对比
+            save_filename = INCREMENTAL_FILENAME
+        else:
+            current_time = time.strftime("%Y%m%d_%H%M%S")
+            save_filename = f"小红书图文_{current_time}.pptx"
+
+        full_save_path = os.path.join(self.save_dir, save_filename)
+        if self.incremental:
+            return full_save_path
+
+        # 非增量模式不覆盖已有文件（同一秒内连续生成多个任务时文件名会相同）
+        stem, ext = os.path.splitext(full_save_path)
+        suffix = 2
+        while os.path.exists(full_save_path):
+            full_save_path = f"{stem}_{suffix}{ext}"
+            suffix += 1
+        return full_save_path
+
+
+def duplicate_slides(presentation, count, template_slides=1):
+    """通过WPS把演示文稿扩充到至少 count 页，返回调用 Duplicate 的次数
+
+    只复制第1页（写入数据的模板页），模板的其余页面（第2到 template_slides 页）不复制：
+    第一份副本移到文档末尾，之后每次复制末尾的全部副本（副本插在这段页面之后，即文档末尾），
+    副本数每次最多翻倍，N 页只需要 O(log N) 次调用，不经过剪贴板，也不需要切换窗口中显示的页面。
+    复制出的页面保留原页面的背景和所有形状。
+    """
+    slides = presentation.Slides
+    existing = slides.Count
+    calls = 0
+    if existing < count and existing <= template_slides:
+        slides.Range([1]).Duplicate().MoveTo(existing + 1)
+        existing += 1
+        calls += 1
+    while existing < count:
+        step = min(existing - template_slides, count - existing)
+        slides.Range(list(range(existing - step + 1, existing + 1))).Duplicate()
+        existing += step
+        calls += 1
+    return calls
+
+
+def delete_trailing_slides(presentation, count):
+    """删除第 count 页之后的多余页面（一次调用）"""
+    slides = presentation.Slides
+    existing = slides.Count
+    if existing > count:
+        slides.Range(list(range(count + 1, existing + 1))).Delete()
+
+
+class CachePlan:
+    """一次转换中渲染缓存和页面合并的安排：to_render 中的页面导出后加入缓存，duplicates 中的页面从同内容的页面复制"""
+
+    def __init__(self, cache, keys, outputs, backend, base_name):
+        self.cache = cache
+        self.keys = keys
+        self.outputs = outputs
+        self.backend = backend
+        self.base_name = base_name
+        self.to_render = []
+        # 从渲染缓存复制的页码
+        self.cached = []
+        # [(页码, 内容相同的已有页码)]
+        self.duplicates = []
+        self._copied = set()
+
+    def image_keys(self, page):
+        return [
+            image_key(self.keys[page - 1], self.backend, output.width, output.height)
+            for output in self.outputs
+        ]
+
+    def image_paths(self, page):
+        return [slide_image_path(output.images_dir, self.base_name, page) for output in self.outputs]
+
+    def copy_duplicates(self, sources):
+        """复制内容与 sources 中页面相同、尚未复制的页面，返回复制的页码"""
+        sources = set(sources)
+        copied = []
+        for page, source_page in self.duplicates:
+            if source_page not in sources or page in self._copied:
+                continue
+            for source_path, dest_path in zip(self.image_paths(source_page), self.image_paths(page)):
+                shutil.copyfile(source_path, dest_path)
+            self._copied.add(page)
+            copied.append(page)
+        return copied
+
+    def finish(self, failures=None):
+        """导出完成后：把新导出的页面加入缓存，复制还没有复制的相同页面，缓存超过上限时淘汰
+
+        failures 为导出失败的页面 {页码: 原因}，内容与失败页面相同的页面同样记为失败，返回合并后的失败列表。
+        """
+        failures = dict(failures or {})
+        rendered = [page for page in self.to_render if page not in failures]
+        if self.cache is not None:
+            for page in rendered:
+                self.cache.store(self.image_keys(page), self.image_paths(page))
+        for page, source_page in self.duplicates:
+            if source_page in failures:
+                failures[page] = f"与第{source_page}页内容相同，该页导出失败"
+        self.copy_duplicates(page for page in rendered + self.cached)
+        if self.cache is not None and rendered:
+            self.cache.evict()
+        return failures
+
+
+class GenerationResult:
+    """生成结果"""
+
+    def __init__(self, ppt_path, images_dir, slide_count, rendered_count, timings=None, counters=None,
+                 failed_slides=None):
+        self.ppt_path = ppt_path
+        self.images_dir = images_dir
+        self.slide_count = slide_count
+        self.rendered_count = rendered_count
+        # 各阶段耗时，格式同 StageTimer.as_dict()
+        self.timings = timings or {}
+        # 任务计数，同 PPTGenerator.counters
+        self.counters = counters or {}
+        # 多次重试后仍然导出失败的页面 {页码: 原因}，其余页面照常导出
+        self.failed_slides = failed_slides or {}
+
+
+def select_backend(ppt_path, backend, template=None):
+    """auto：模板能用原生渲染器导出时使用原生渲染器，否则使用WPS
+
+    传入模板编译结果时直接使用其中保存的检查结果，不再编译生成的PPT。
+    """
+    if backend != 'auto':
+        return backend
+    try:
+        from native_renderer import unsupported_reason, missing_font_reason
+        if template is not None:
+            reason = template.native_reason or missing_font_reason()
+        else:
+            reason = unsupported_reason(ppt_path)
+    except Exception as e:
+        reason = str(e)
+    if reason is None:
+        logger.info("使用原生渲染器导出图片")
+        return 'native'
+    logger.info("模板不支持原生渲染，改用WPS导出图片: %s", reason)
+    return 'wps'
+
+
+class PPTGenerator:
+    """不依赖界面的生成流程：读取Excel、填充模板、保存PPT、转换图片
+
+    progress_callback(value, message) 用于汇报进度（0-100）。
+    cancel_event（threading.Event）被设置后，在下一次汇报进度时抛出 GenerationCancelled。
+    同一个生成器执行多个任务时复用常驻的渲染器（WPS实例和渲染子进程），用完后调用 close()。
+    """
+
+    def __init__(self, progress_callback=None, cancel_event=None, max_documents=50, template_cache=None,
+                 render_cache=None, workbook_snapshots=None):
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.max_documents = max_documents
+        # 模板编译结果按模板内容缓存在磁盘上，多个任务和多次运行共用
+        self.templates = template_cache or TemplateCache()
+        # 渲染结果按页面内容缓存，跨任务共用
+        self.render_cache = render_cache or RenderCache()
+        # 解析后的表格按文件内容保存快照，跨任务共用
+        self.workbook_snapshots = workbook_snapshots or WorkbookSnapshotCache()
+        self._pools = {}
+        self._supervisors = {}
+        # 当前任务的计数（行数、导出页数、沿用页数、出错的形状数等），代替逐项输出，任务结束时汇总一次
+        self.counters = Counter()
+
+    def renderer_pool(self, backend):
+        """当前线程中常驻的渲染会话池"""
+        if backend not in self._pools:
+            self._pools[backend] = RendererPool(backend, self.max_documents)
+        return self._pools[backend]
+
+    def render_supervisor(self, backend, workers):
+        """常驻的受监督渲染子进程，进程数变化时重建"""
+        supervisor = self._supervisors.get(backend)
+        if supervisor is not None and supervisor.worker_count != workers:
+            supervisor.close()
+            supervisor = None
+        if supervisor is None:
+            supervisor = RenderSupervisor(backend, workers, self.max_documents)
+            self._supervisors[backend] = supervisor
+        return supervisor
+
+    def close(self):
+        """退出所有常驻的渲染器"""
+        for supervisor in self._supervisors.values():
+            supervisor.close()
+        self._supervisors.clear()
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+        self.render_cache.close()
+
+    def update_progress(self, value, message):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise GenerationCancelled("已取消生成")
+        if self.progress_callback:
+            self.progress_callback(value, message)
+
+    def run(self, job):
+        """执行一次生成任务，返回 GenerationResult"""
+        self.update_progress(0, "开始处理...")
+        job.validate()
+        # 设置了 PPT_COM_TRACE 时记录本任务的COM调用，结束时输出汇总
+        com_trace.enable_from_env()
+        timer = StageTimer()
+        self.counters = Counter()
+
+        self.update_progress(10, "加载PPT模板...")
+        # 优先使用python-pptx在进程内填充数据，模板无法解析时再退回WPS填充
+        try:
+            with timer.stage('load_template'):
+                filler = SlideFiller(job.template_path)
+        except Exception as load_error:
+            logger.warning("python-pptx无法读取模板，改用WPS填充: %s", load_error)
+            filler = None
+
+        # 只依赖模板内容的信息（形状、字号、文字区域、能否原生渲染）按模板哈希缓存，
+        # 同一模板的后续任务直接读取编译结果
+        template = None
+        if filler is not None:
+            try:
+                with timer.stage('compile_template'):
+                    template = self.templates.get(job.template_path, filler.prs)
+            except Exception as compile_error:
+                logger.warning("编译模板失败，直接使用模板页: %s", compile_error, exc_info=True)
+
+        # 逐行读取Excel，只保留与模板形状同名的列，不把整张表读入内存；
+        # 第一次完整读取时保存解析结果的快照，表格没有变化时之后直接从快照读取
+        self.update_progress(20, "读取Excel文件...")
+        if template is not None:
+            columns = template.text_shape_names()
+        else:
+            columns = filler.text_shape_names() if filler is not None else None
+        source = ExcelRowSource(
+            job.excel_path, columns=columns, snapshots=self.workbook_snapshots if job.excel_cache else None
+        )
+        logger.info("预计行数: %s，使用的列: %s", source.estimated_rows, source.selected_columns())
+
+        # 按行内容、模板和尺寸字体设置计算每页的键：增量模式与上次的清单对比，
+        # 转换图片时用来合并内容相同的页面和查找渲染缓存
+        template_digest = template.digest if template is not None else file_digest(job.template_path)
+        settings = settings_digest(
+            template_digest, job.width, job.height,
+            job.first_image_font_size, job.empty_value, job.auto_fit,
+            job.output_sizes(), job.effective_fit_mode(),
+            fill_engine='pptx' if filler is not None else 'wps', bulk_fill=job.bulk_fill,
+            fit=fit_signature() if job.auto_fit else None
+        )
+        bound_columns = source.selected_columns()
+        # 第一行写入模板第1页，模板的其余页面原样保留在第2页到第 template_slides 页，之后每行追加一页
+        template_slides = package_slide_count(job.template_path)
+
+        # 同一个任务（设置、表格内容、文件名都相同）上次没有完成时，沿用上次的输出文件从断点继续
+        fingerprint = job_fingerprint(settings, source.content_digest or file_digest(job.excel_path), job)
+        journal = JobJournal.find(job.save_dir, fingerprint) if job.resume else None
+        if journal is not None:
+            full_save_path = journal.ppt_path
+            logger.info("继续上次未完成的任务: %s", os.path.basename(full_save_path))
+        else:
+            full_save_path = job.output_path()
+            journal = JobJournal(full_save_path, fingerprint)
+
+        manifest = None
+        keys = None
+        if job.incremental:
+            # 先单独读一遍表格计算键（只保留键，不保留行数据）
+            with timer.stage('row_keys'):
+                row_keys = [row_key(row, bound_columns, settings) for row in source]
+            # 清单按页码记录，与生成的PPT中的页面一一对应
+            keys = slide_keys(row_keys, template_slides, settings)
+            manifest = RenderManifest(full_save_path, job.size_subdirs())
+
+        if manifest is not None and manifest.is_up_to_date(keys):
+            self.update_progress(90, "内容没有变化，沿用上次生成的文件...")
+            self.counters.update(rows=len(row_keys), reused=len(keys))
+            journal.complete()
+            return self._finish(job, full_save_path, manifest.images_dir, len(keys), 0, timer)
+
+        if journal.can_resume_render() and (keys is None or keys == journal.keys):
+            # 上次已经保存了完整的PPT，跳过填充
+            keys = journal.keys
+            total_rows = journal.filled_rows
+            self.counters['resumed'] = 1
+        else:
+            # 非增量模式在填充时顺便计算每行的键
+            rows = source if keys is not None else RowKeyRecorder(source, bound_columns, settings)
+            journal.save()
+            if filler is not None:
+                total_rows = self.fill_with_pptx(filler, template, rows, full_save_path, job, timer)
+            else:
+                total_rows = self.fill_with_wps(rows, full_save_path, job, timer, journal)
+            if keys is None:
+                keys = slide_keys(rows.keys, template_slides, settings)
+            journal.fill_done(keys, total_rows)
+        self.counters['rows'] = total_rows
+        # 生成的PPT的页数：模板有多页时，除第1页外的模板页也会导出
+        slide_count = len(keys)
+
+        images_dir, outputs = job.image_outputs(full_save_path)
+        base_name = os.path.splitext(os.path.basename(full_save_path))[0]
+
+        def image_paths(page):
+            return [slide_image_path(output.images_dir, base_name, page) for output in outputs]
+
+        # 增量模式只重新导出键发生变化的页面，其余页面沿用已有图片（清单在每批导出后更新，中断后同样沿用）；
+        # 非增量模式续做时跳过日志中已导出且图片完整的页面
+        slide_indices = None
+        if manifest is not None:
+            slide_indices = manifest.reuse_images(keys)
+            self.counters['reused'] = slide_count - len(slide_indices)
+        else:
+            done = journal.verified_pages(image_paths)
+            if done:
+                slide_indices = [page for page in range(1, slide_count + 1) if page not in done]
+                self.counters['reused'] = len(done)
+
+        def on_batch(batch):
+            journal.record_exported(batch)
+            if manifest is not None:
+                manifest.mark_rendered(batch, keys)
+
+        # WPS只负责把生成的PPT转换为图片
+        self.update_progress(70, "转换为图片...")
+        images_dir, rendered_count, failures = self.convert_ppt_to_images(
+            full_save_path, job, slide_indices=slide_indices, timer=timer, template=template, keys=keys,
+            on_batch=on_batch
+        )
+
+        if failures:
+            # 删除失败页面的旧图片（增量模式下是上次的内容），清单和日志不记录这些页面，
+            # 再次运行同一个任务时只重新导出它们
+            for page in failures:
+                for path in image_paths(page):
+                    if os.path.exists(path):
+                        os.remove(path)
+            logger.error(
+                "%d 页导出失败（再次运行同一个任务时只重新导出这些页面）: %s", len(failures),
+                "; ".join(f"第{page}页 {reason}" for page, reason in sorted(failures.items()))
+            )
+            self.counters['failed'] = len(failures)
+        if manifest is not None:
+            manifest.save([None if page in failures else key for page, key in enumerate(keys, start=1)])
+        if not failures:
+            journal.complete()
+
+        self.counters['rendered'] = rendered_count
+        return self._finish(job, full_save_path, images_dir, slide_count, rendered_count, timer, failures)
+
+    def _finish(self, job, full_save_path, images_dir, slide_count, rendered_count, timer, failures=None):
+        """输出本任务的计数汇总（以及COM调用统计），返回 GenerationResult"""
+        logger.info(
+            "任务统计 %s: %s",
+            os.path.basename(full_save_path),
+            ", ".join(f"{name}={value}" for name, value in sorted(self.counters.items())),
+        )
+        com_trace.write_report(os.path.basename(full_save_path), timer.as_dict())
+        return GenerationResult(
+            full_save_path, images_dir, slide_count, rendered_count, timer.as_dict(), dict(self.counters), failures
+        )
+
+    def update_fill_progress(self, source, i):
+        """填充阶段的进度（20-60），总行数按表格尺寸估算"""
+        total_rows = max(source.estimated_rows, i + 1)
+        progress = 20 + (i / total_rows * 40)
+        self.update_progress(progress, f"正在处理第 {i + 1} 行数据...")
+
+    def fill_with_pptx(self, filler, template, source, save_path, job, timer):
+        """使用python-pptx引擎逐行填充模板并保存，返回处理的行数
+
+        template 是模板编译结果，为 None 时直接从模板页计算绑定计划和文字区域。
+        """
+        # 绑定计划只在加载模板后计算一次，每行只访问绑定的形状
+        columns = set(source.selected_columns())
+        first_image_font_size = int(job.first_image_font_size)
+        fitter = None
+        if template is not None:
+            bindings = template.binding_plan(columns)
+            if job.auto_fit:
+                fitter = template.text_fitter(bindings)
+        else:
+            bindings = filler.binding_plan(columns)
+            # 在填充任何数据之前按模板页量取各形状的文字区域
+            if job.auto_fit:
+                fitter = fitter_for_slide(filler.prs, filler.template_slide, bindings)
+
+        if job.bulk_fill:
+            total_rows = self._fill_pptx_bulk(filler, source, bindings, fitter, job, timer)
+        else:
+            # 遍历Excel的每一行数据（包括第一行），第一行写入模板页，其余行复制模板页后写入
+            total_rows = 0
+            for i, row in enumerate(timer.iterate('read_excel', source)):
+                self.update_fill_progress(source, i)
+
+                font_sizes = None
+                if fitter is not None:
+                    with timer.stage('fit'):
+                        font_sizes = fitter.row_sizes(row, bindings, job.empty_value, first_image_font_size)
+
+                with timer.stage('fill'):
+                    slide = filler.template_slide if i == 0 else filler.clone_template_slide()
+                    filler.fill_slide(slide, row, bindings, job.empty_value, first_image_font_size, font_sizes)
+                total_rows += 1
+
+        if fitter is not None:
+            logger.info(fitter.report())
+
+        self.update_progress(60, "保存PPT文件...")
+        with timer.stage('save'):
+            filler.save(save_path)
+        return total_rows
+
+    def _fill_pptx_bulk(self, filler, source, bindings, fitter, job, timer):
+        """批量填充的本地版本：与交给WPS宏相同的填充数据由 PptxPayloadExecutor 写入，返回处理的行数
+
+        没有WPS的环境中 --bulk-fill 走这里，可以直接核对批量填充的结果。
+        """
+        template_slides = len(filler.prs.slides)
+        executor = PptxPayloadExecutor(filler.prs)
+        total_rows = 0
+        for total_rows, payload in self.fill_payloads(source, bindings, fitter, job, timer,
+                                                      template_slides=template_slides):
+            if not payload:
+                continue
+            with timer.stage('duplicate'):
+                while len(filler.prs.slides) < deck_slide_count(total_rows, template_slides):
+                    filler.clone_template_slide()
+            with timer.stage('fill'):
+                self.counters['shape_errors'] += executor.run(payload)
+            self.counters['bulk_fill_calls'] += 1
+        return total_rows
+
+    def fill_with_wps(self, source, full_save_path, job, timer, journal=None):
+        """通过WPS批量复制模板页并填充（python-pptx无法读取模板时使用），返回处理的行数
+
+        传入任务日志时每 CHECKPOINT_ROWS 行（批量填充时每批）保存一次PPT并记录进度，
+        上次中断时保存过中间结果的话打开它，从记录的行之后继续填充。
+        """
+        import win32gui
+        import win32con
+
+        columns = set(source.selected_columns())
+        resume_rows = journal.filled_rows if journal is not None and journal.can_resume_fill() else 0
+        # 从会话池取出常驻的WPS实例，填充完成后归还，转换图片时可以继续使用
+        pool = self.renderer_pool('wps')
+        renderer = pool.acquire()
+        failed = True
+        try:
+            wps = renderer.start()
+
+            # 最小化 WPS 窗口
+            time.sleep(1)
+
+            # 查找 WPS 窗口并最小化
+            def callback(hwnd, extra):
+                if win32gui.IsWindowVisible(hwnd):
+                    title = win32gui.GetWindowText(hwnd)
+                    if 'WPS' in title or 'Presentation' in title:
+                        win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
+
+            win32gui.EnumWindows(callback, None)
+
+            # WPS弹出对话框或卡死时 Open、SaveAs、Save 会一直不返回，超过期限时由看门狗结束WPS
+            def watchdog(name):
+                return Watchdog(SAVE_TIMEOUT, renderer.kill, name)
+
+            with timer.stage('load_template'), watchdog("打开PPT模板"):
+                # 打开PPT文件
+                ppt = wps.Presentations
+                template = ppt.Open(os.path.abspath(job.template_path))
+
+            # 绑定计划：在处理数据之前遍历一次模板页，记录绑定形状的序号和原始字号，
+            # 之后每行只按序号访问这些形状，减少COM调用次数。
+            # 在模板文件上计算，续做时输出文件的第一页已经写入了数据
+            bindings = []
+            fit_boxes = {}
+            with timer.stage('bind'):
+                template_slides = template.Slides.Count
+                slide_height = template.PageSetup.SlideHeight
+                for index, shape in enumerate(template.Slides(1).Shapes):
+                    try:
+                        if shape.HasTextFrame and shape.Name in columns:
+                            bindings.append(ShapeBinding(index, shape.Name, shape.TextFrame.TextRange.Font.Size))
+                            if job.auto_fit:
+                                fit_boxes[shape.Name] = fit_box_from_com(shape, slide_height)
+                    except Exception as shape_error:
+                        logger.debug("读取模板形状 %s 时出错: %s", index, shape_error)
+                        continue
+            logger.info("绑定的形状: %s", [binding.column for binding in bindings])
+            fitter = TextFitter(fit_boxes) if job.auto_fit else None
+
+            with timer.stage('load_template'), watchdog("复制PPT模板"):
+                if resume_rows:
+                    logger.info("从第 %d 行之后继续填充", resume_rows)
+                    template.Close()
+                else:
+                    # 复制整个模板文件到新位置
+                    template.SaveAs(full_save_path)
+                    template.Close()  # 关闭模板文件
+
+                # 打开新保存的文件进行编辑
+                new_ppt = ppt.Open(full_save_path)
+
+            # 填充之前按预计行数一次性复制出所有页面（页数翻倍，不经过剪贴板），
+            # 填充阶段只写文字；所有绑定的形状每行都会重写文字和字号
+            with timer.stage('duplicate'):
+                calls = duplicate_slides(
+                    new_ppt, deck_slide_count(source.estimated_rows, template_slides), template_slides
+                )
+            self.counters['duplicate_calls'] += calls
+
+            # 批量填充：数据打包后由WPS进程内的宏写入；WPS不能运行宏时逐个形状写入
+            total_rows = None
+            if job.bulk_fill:
+                total_rows = self._fill_rows_bulk(
+                    wps, new_ppt, template_slides, source, bindings, fitter, job, timer, journal, resume_rows,
+                    watchdog
+                )
+            if total_rows is None:
+                total_rows = self._fill_rows_com(
+                    new_ppt, template_slides, source, bindings, fitter, job, timer, journal, resume_rows, watchdog
+                )
+
+            if fitter is not None:
+                logger.info(fitter.report())
+
+            # 预计行数偏多（例如表格末尾有空行）时删除多余的页面
+            delete_trailing_slides(new_ppt, deck_slide_count(total_rows, template_slides))
+
+            self.update_progress(60, "保存PPT文件...")
+            # 保存新的PPT文件
+            with timer.stage('save'), watchdog("保存PPT文件"):
+                new_ppt.SaveAs(full_save_path)
+            failed = False
+            return total_rows
+
+        finally:
+            # 关闭文件，WPS实例归还会话池（出错时由会话池退出并重建）
+            try:
+                if 'new_ppt' in locals():
+                    new_ppt.Close()
+            except Exception as close_error:
+                logger.warning("关闭PPT文件失败: %s", close_error)
+            pool.release(renderer, failed=failed)
+
+    def _fill_rows_com(self, new_ppt, template_slides, source, bindings, fitter, job, timer, journal, resume_rows,
+                       watchdog):
+        """逐个形状通过COM写入每一行（每个形状两次跨进程调用），返回处理的行数"""
+        total_rows = 0
+        # 遍历Excel的每一行数据（包括第一行）
+        for i, row in enumerate(timer.iterate('read_excel', source)):
+            self.update_fill_progress(source, i)
+            total_rows += 1
+            if i < resume_rows:
+                # 上次已经填充并保存过
+                continue
+
+            # 定期保存，中断后可以从这里继续
+            if journal is not None and i and i % CHECKPOINT_ROWS == 0:
+                with timer.stage('checkpoint'), watchdog("保存PPT文件"):
+                    new_ppt.Save()
+                    journal.record_fill(i)
+
+            # 实际行数超过预计时再翻倍扩充（复制已填充的页面也可以，绑定的形状会被重写）
+            slide_index = row_slide_index(i, template_slides)
+            if slide_index > new_ppt.Slides.Count:
+                with timer.stage('duplicate'):
+                    self.counters['duplicate_calls'] += duplicate_slides(
+                        new_ppt, max(slide_index, new_ppt.Slides.Count * 2), template_slides
+                    )
+
+            font_sizes = {}
+            if fitter is not None:
+                with timer.stage('fit'):
+                    font_sizes = fitter.row_sizes(
+                        row, bindings, job.empty_value, int(job.first_image_font_size)
+                    )
+
+            # 按绑定计划更新文本内容
+            with timer.stage('fill'):
+                shapes = new_ppt.Slides(slide_index).Shapes
+                for binding in bindings:
+                    try:
+                        content, first_image = cell_content(row, binding.column, job.empty_value)
+                        # 绑定计划中的序号从0开始，COM中的形状序号从1开始
+                        text_range = shapes(binding.index + 1).TextFrame.TextRange
+
+                        # 自动缩小计算出的字号优先；否则首图使用界面上设置的字号，其他内容使用模板中的原始字号
+                        if font_sizes.get(binding.column) is not None:
+                            text_range.Font.Size = font_sizes[binding.column]
+                        elif first_image:
+                            text_range.Font.Size = int(job.first_image_font_size)
+                        else:
+                            text_range.Font.Size = binding.font_size
+
+                        # 设置文本内容
+                        text_range.Text = content
+                    except Exception as shape_error:
+                        # 只计数，细节在 DEBUG 级别记录（参数在级别开启时才格式化）
+                        self.counters['shape_errors'] += 1
+                        logger.debug("第 %d 行处理形状 %s 时出错: %s", i + 1, binding.column, shape_error)
+                        continue
+        return total_rows
+
+    def _fill_rows_bulk(self, wps, new_ppt, template_slides, source, bindings, fitter, job, timer, journal,
+                        resume_rows, watchdog):
+        """把每 BULK_FILL_CHUNK_ROWS 行的数据打包，交给WPS进程内的宏一次写入，返回处理的行数
+
+        WPS不能运行宏时返回 None（由调用方改为逐个形状写入）。每批写入后保存PPT并记录断点。
+        """
+        try:
+            executor = WpsMacroExecutor(wps, new_ppt).start()
+        except BulkFillUnavailable as e:
+            logger.warning("%s，改为逐个形状写入", e)
+            return None
+        total_rows = 0
+        try:
+            payloads = self.fill_payloads(source, bindings, fitter, job, timer, resume_rows, template_slides)
+            for total_rows, payload in payloads:
+                if not payload:
+                    continue
+                # 实际行数超过预计时先扩充页面
+                needed = deck_slide_count(total_rows, template_slides)
+                if needed > new_ppt.Slides.Count:
+                    with timer.stage('duplicate'):
+                        self.counters['duplicate_calls'] += duplicate_slides(
+                            new_ppt, max(needed, new_ppt.Slides.Count * 2), template_slides
+                        )
+                with timer.stage('fill'), watchdog("批量填充"):
+                    self.counters['shape_errors'] += executor.run(payload)
+                self.counters['bulk_fill_calls'] += 1
+                if journal is not None:
+                    with timer.stage('checkpoint'), watchdog("保存PPT文件"):
+                        new_ppt.Save()
+                        journal.record_fill(total_rows)
+        finally:
+            executor.close()
+        return total_rows
+
+    def fill_payloads(self, source, bindings, fitter, job, timer, resume_rows=0, template_slides=1,
+                      chunk_rows=BULK_FILL_CHUNK_ROWS):
+        """逐行计算要写入的字号和文字，每 chunk_rows 行产生一次 (已处理的行数, FillPayload)，最后一批可能为空
+
+        跳过上次已经填充的前 resume_rows 行；各行的页码按 row_slide_index 计算（模板有 template_slides 页）。
+        与WPS无关，本地可以用 PptxPayloadExecutor 执行。
+        """
+        payload = FillPayload()
+        total_rows = 0
+        for i, row in enumerate(timer.iterate('read_excel', source)):
+            self.update_fill_progress(source, i)
+            total_rows += 1
+            if i < resume_rows:
+                continue
+
+            font_sizes = None
+            if fitter is not None:
+                with timer.stage('fit'):
+                    font_sizes = fitter.row_sizes(row, bindings, job.empty_value, int(job.first_image_font_size))
+            try:
+                payload.add_row(row_slide_index(i, template_slides), row_writes(
+                    row, bindings, job.empty_value, int(job.first_image_font_size), font_sizes
+                ))
+            except Exception as row_error:
+                self.counters['shape_errors'] += 1
+                logger.debug("第 %d 行生成填充数据时出错: %s", i + 1, row_error)
+
+            if payload.rows >= chunk_rows:
+                yield total_rows, payload
+                payload = FillPayload()
+        yield total_rows, payload
+
+    def plan_cached_pages(self, keys, slide_indices, outputs, backend, base_name, job):
+        """从渲染缓存复制已有的页面，合并内容相同的页面，返回 CachePlan（其中 to_render 为需要导出的页码）"""
+        cache = self.render_cache if job.render_cache and self.render_cache.enabled else None
+        plan = CachePlan(cache, keys, outputs, backend, base_name)
+        for output in outputs:
+            os.makedirs(output.images_dir, exist_ok=True)
+        pages = slide_indices if slide_indices is not None else range(1, len(keys) + 1)
+        first_page = {}
+        for page in pages:
+            key = keys[page - 1]
+            if key in first_page:
+                plan.duplicates.append((page, first_page[key]))
+            elif cache is not None and cache.fetch(plan.image_keys(page), plan.image_paths(page)):
+                first_page[key] = page
+                plan.cached.append(page)
+                self.counters['cache_hits'] += 1
+            else:
+                first_page[key] = page
+                plan.to_render.append(page)
+        self.counters['deduplicated'] += len(plan.duplicates)
+        return plan
+
+    def _cached_batch_callback(self, cache_plan, on_batch):
+        """先记录从缓存复制的页面，返回导出每批页面后复制相同页面并一起记录的回调"""
+        cached = cache_plan.cached + cache_plan.copy_duplicates(cache_plan.cached)
+        if cached and on_batch:
+            on_batch(cached)
+
+        def batch_callback(batch):
+            pages = list(batch) + cache_plan.copy_duplicates(batch)
+            if on_batch:
+                on_batch(pages)
+
+        return batch_callback
+
+    def convert_ppt_to_images(self, ppt_path, job, slide_indices=None, timer=None, template=None, keys=None,
+                              on_batch=None):
+        """把PPT每一页转换为图片，返回 (图片文件夹, 导出页数, {导出失败的页码: 原因})
+
+        传入 timer 时把转换各阶段的耗时合并进去；传入模板编译结果时按其选择渲染后端。
+        传入每页的键时，内容相同的页面只导出一次再复制，渲染缓存中已有的页面直接复制，不经过渲染器。
+        on_batch(batch) 在每批页面导出完成后调用（只包含导出成功的页面）；从缓存复制和与已导出页面相同的页面
+        复制后同样通过 on_batch 记录。
+        """
+        try:
+            # 获取文件名（不含扩展名）作为文件夹名
+            base_name = os.path.splitext(os.path.basename(ppt_path))[0]
+
+            # 创建与PPT同名的文件夹，每种尺寸保存到各自的子文件夹，所有尺寸共用一次导出
+            images_dir, outputs = job.image_outputs(ppt_path)
+            if not os.path.exists(images_dir):
+                os.makedirs(images_dir)
+
+            def on_progress(done, total):
+                self.update_progress(70 + done / total * 20, f"已转换 {done}/{total} 页图片...")
+
+            # 按页码分批交给多个进程并行导出，每个进程使用自己的渲染器实例；
+            # 渲染器在多个任务之间常驻复用。WPS可能卡住，总是放在受监督的子进程中，
+            # 超时时重启子进程重试该页；单进程的原生渲染器不会卡住，直接在当前进程中导出
+            backend = select_backend(ppt_path, job.renderer_backend, template)
+            supervised = job.render_workers > 1 or backend != 'native'
+
+            render_timer = StageTimer()
+            cache_plan = None
+            if keys is not None:
+                with render_timer.stage('render_cache'):
+                    cache_plan = self.plan_cached_pages(keys, slide_indices, outputs, backend, base_name, job)
+                    batch_callback = self._cached_batch_callback(cache_plan, on_batch)
+                slide_indices = cache_plan.to_render
+            else:
+                batch_callback = on_batch
+            failures = {}
+            if supervised:
+                supervisor = self.render_supervisor(backend, job.render_workers)
+                rendered_count, failures = supervisor.render(
+                    ppt_path, base_name, outputs, outputs_export_size(ppt_path, outputs),
+                    slide_indices=slide_indices, batch_size=job.batch_size,
+                    progress_callback=on_progress, batch_callback=batch_callback, timer=render_timer,
+                    open_timeout=max(OPEN_TIMEOUT, job.render_timeout), export_timeout=job.render_timeout
+                )
+            else:
+                rendered_count = render_slides(
+                    ppt_path, images_dir, base_name, job.width, job.height,
+                    batch_size=job.batch_size,
+                    backend=backend, progress_callback=on_progress, timer=render_timer,
+                    slide_indices=slide_indices, pool=self.renderer_pool(backend), outputs=outputs,
+                    batch_callback=batch_callback
+                )
+            if cache_plan is not None:
+                with render_timer.stage('render_cache'):
+                    failures = cache_plan.finish(failures)
+            logger.info(render_timer.report("转换图片各阶段耗时"))
+            if timer is not None:
+                timer.merge(render_timer)
+            return images_dir, rendered_count, failures
+
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"转换图片时出错: {str(e)}")
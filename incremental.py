@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import hashlib
+
+from slide_renderer import slide_image_path
+from slide_filler import row_slide_index, deck_slide_count
+
+# 清单格式版本，导出方式或键的算法变化时递增，使旧清单全部失效
+MANIFEST_VERSION = 6
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_digest(template_digest, width, height, first_image_font_size, empty_value, auto_fit=True,
+                    sizes=None, fit_mode='stretch', fill_engine='pptx', bulk_fill=False, fit=None):
+    """模板文件内容摘要、图片尺寸和字体等设置的摘要，任何一项变化都会使所有页面失效
+
+    fill_engine 为填充方式（pptx 或 wps），fit 为自动缩小字号使用的参数（见 text_fit.fit_signature）。
+    """
+    payload = json.dumps(
+        [MANIFEST_VERSION, template_digest, width, height,
+         first_image_font_size, empty_value, auto_fit, sizes, fit_mode, fill_engine, bulk_fill, fit],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def row_key(row, columns, settings):
+    """单页的键：设置摘要加上该行在各绑定列中的值"""
+    values = [[column, str(row[column])] for column in columns]
+    payload = json.dumps([settings, values], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def template_slide_key(settings, index):
+    """模板中第 index 页（不填充数据的页面）的键：只取决于设置摘要（其中包含模板内容摘要）"""
+    payload = json.dumps([settings, 'template', index])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def slide_keys(row_keys, template_slides, settings):
+    """按生成的PPT中的页面顺序排列每页的键：数据行的页面用行的键，模板的其余页面用模板页的键"""
+    keys = [
+        template_slide_key(settings, index)
+        for index in range(1, deck_slide_count(len(row_keys), template_slides) + 1)
+    ]
+    for i, key in enumerate(row_keys):
+        keys[row_slide_index(i, template_slides) - 1] = key
+    return keys
+
+
+class RowKeyRecorder:
+    """逐行产出 source 的行，同时记录每行的键（填充时顺便计算，不必再读一遍表格）"""
+
+    def __init__(self, source, columns, settings):
+        self.source = source
+        self.columns = columns
+        self.settings = settings
+        self.keys = []
+
+    def __getattr__(self, name):
+        # estimated_rows、selected_columns() 等直接使用 source 的
+        return getattr(self.source, name)
+
+    def __iter__(self):
+        for row in self.source:
+            self.keys.append(row_key(row, self.columns, self.settings))
+            yield row
+
+
+class RenderManifest:
+    """增量生成清单，按页码记录输出文件夹中每一页图片对应的键（slide_keys 的结果，包括模板的其余页面）
+
+    同时输出多种尺寸时，subdirs 为输出文件夹下每种尺寸的子文件夹名，每一页在所有子文件夹中都有图片才算完整。
+    """
+
+    def __init__(self, ppt_path, subdirs=None):
+        self.ppt_path = ppt_path
+        self.base_name = os.path.splitext(os.path.basename(ppt_path))[0]
+        self.images_dir = os.path.join(os.path.dirname(ppt_path), self.base_name)
+        if subdirs:
+            self.image_dirs = [os.path.join(self.images_dir, subdir) for subdir in subdirs]
+        else:
+            self.image_dirs = [self.images_dir]
+        # 清单放在输出文件夹旁边
+        self.path = os.path.join(os.path.dirname(ppt_path), f"{self.base_name}.manifest.json")
+        self.slides = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                return []
+            return data.get('slides', [])
+        except (OSError, ValueError):
+            return []
+
+    def save(self, keys):
+        """写入清单，尚未导出的页面键为 None"""
+        self.slides = list(keys)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'slides': self.slides}, f)
+        os.replace(temp_path, self.path)
+
+    def mark_rendered(self, pages, keys):
+        """记录已导出的页面（每批导出完成后调用），中断后再次运行时这些页面可以沿用"""
+        for page in pages:
+            self.slides[page - 1] = keys[page - 1]
+        self.save(self.slides)
+
+    def _image_path(self, images_dir, index):
+        return slide_image_path(images_dir, self.base_name, index)
+
+    def _has_images(self, index):
+        return all(os.path.exists(self._image_path(images_dir, index)) for images_dir in self.image_dirs)
+
+    def is_up_to_date(self, keys):
+        """所有页面的键都未变化且图片都存在"""
+        return (
+            os.path.exists(self.ppt_path)
+            and list(keys) == self.slides
+            and all(self._has_images(i + 1) for i in range(len(self.slides)))
+        )
+
+    def reuse_images(self, keys):
+        """把键未变化的旧图片移动（或复制）到新页码上，返回需要重新导出的页码列表（从1开始）
+
+        行被插入或删除时，内容相同的页面仍然能按键找到旧图片。
+        """
+        # 旧清单中每个键对应的、图片仍然存在的页码
+        old_pages = {}
+        for index, key in enumerate(self.slides, start=1):
+            if key is not None and key not in old_pages and self._has_images(index):
+                old_pages[key] = index
+
+        for images_dir in self.image_dirs:
+            self._reuse_in_dir(images_dir, keys, old_pages)
+
+        changed = [index for index, key in enumerate(keys, start=1) if key not in old_pages]
+
+        # 记录当前状态：复用的页面已就绪，其余等待导出
+        pending = set(changed)
+        self.save([None if index in pending else key for index, key in enumerate(keys, start=1)])
+        return changed
+
+    def _reuse_in_dir(self, images_dir, keys, old_pages):
+        if not os.path.exists(images_dir):
+            os.makedirs(images_dir)
+
+        # 清理上次中断时残留的临时文件
+        for name in os.listdir(images_dir):
+            if name.startswith('.reuse_'):
+                os.remove(os.path.join(images_dir, name))
+
+        # 先把要复用的旧图片挪到临时名称，避免页码移动时互相覆盖
+        staged = {}
+        for key in set(keys):
+            if key in old_pages:
+                staged_path = os.path.join(images_dir, f".reuse_{key}.jpg")
+                os.replace(self._image_path(images_dir, old_pages[key]), staged_path)
+                staged[key] = staged_path
+
+        # 删除剩下的旧图片
+        for index in range(1, len(self.slides) + 1):
+            if os.path.exists(self._image_path(images_dir, index)):
+                os.remove(self._image_path(images_dir, index))
+
+        placed = {}
+        for index, key in enumerate(keys, start=1):
+            if key not in staged:
+                continue
+            if key in placed:
+                # 同一批中内容相同的页面直接复制
+                shutil.copyfile(placed[key], self._image_path(images_dir, index))
+            else:
+                os.replace(staged[key], self._image_path(images_dir, index))
+                placed[key] = self._image_path(images_dir, index)
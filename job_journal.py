@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+
+from app_logging import get_logger
+
+# 日志格式版本，格式变化时递增，旧日志不再用于续做
+JOURNAL_VERSION = 2
+
+# WPS填充时每填充多少行保存一次PPT和进度
+CHECKPOINT_ROWS = 100
+
+JOURNAL_SUFFIX = '.journal.json'
+
+logger = get_logger(__name__)
+
+
+def job_fingerprint(settings, excel_digest, job):
+    """判断两次运行是否是同一个任务：模板和尺寸字体等设置、表格内容、输出文件名和是否增量"""
+    payload = json.dumps(
+        [JOURNAL_VERSION, settings, excel_digest, job.output_name, job.incremental],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def verify_image(path):
+    """图片文件完整：非空且以JPG结束标记结尾（导出中途崩溃时文件可能只写了一半）"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < 2:
+                return False
+            f.seek(-2, os.SEEK_END)
+            return f.read() == b'\xff\xd9'
+    except OSError:
+        return False
+
+
+class JobJournal:
+    """任务日志：记录填充和导出已完成的步骤，任务中断后再次运行同一个任务时从断点继续
+
+    日志保存在输出PPT旁边（{文件名}.journal.json），任务成功完成后删除。
+    phase 为 fill（正在填充，filled_rows 为WPS填充已保存的行数）或 render（PPT已保存，
+    keys 为生成的PPT中每页的键，filled_rows 为行数，exported 为已导出的页码）。
+    """
+
+    def __init__(self, ppt_path, fingerprint, data=None):
+        data = data or {}
+        self.ppt_path = ppt_path
+        self.fingerprint = fingerprint
+        self.phase = data.get('phase', 'fill')
+        self.filled_rows = data.get('filled_rows', 0)
+        self.keys = data.get('keys')
+        self.exported = set(data.get('exported', []))
+
+    @staticmethod
+    def journal_path(ppt_path):
+        return os.path.splitext(ppt_path)[0] + JOURNAL_SUFFIX
+
+    @property
+    def path(self):
+        return self.journal_path(self.ppt_path)
+
+    @classmethod
+    def find(cls, save_dir, fingerprint):
+        """在保存文件夹中查找同一个任务未完成的日志，没有时返回 None"""
+        try:
+            names = [name for name in os.listdir(save_dir) if name.endswith(JOURNAL_SUFFIX)]
+        except OSError:
+            return None
+        for name in names:
+            try:
+                with open(os.path.join(save_dir, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get('version') != JOURNAL_VERSION or data.get('fingerprint') != fingerprint:
+                continue
+            ppt_path = os.path.join(save_dir, data['ppt_name'])
+            return cls(ppt_path, fingerprint, data)
+        return None
+
+    def save(self):
+        data = {
+            'version': JOURNAL_VERSION,
+            'fingerprint': self.fingerprint,
+            'ppt_name': os.path.basename(self.ppt_path),
+            'phase': self.phase,
+            'filled_rows': self.filled_rows,
+            'keys': self.keys,
+            'exported': sorted(self.exported),
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    def can_resume_render(self):
+        """PPT已经完整保存，可以跳过填充直接继续导出"""
+        return self.phase == 'render' and self.keys is not None and os.path.exists(self.ppt_path)
+
+    def can_resume_fill(self):
+        """WPS填充保存过中间结果，可以从第 filled_rows 行之后继续"""
+        return self.phase == 'fill' and self.filled_rows > 0 and os.path.exists(self.ppt_path)
+
+    def record_fill(self, filled_rows):
+        self.filled_rows = filled_rows
+        self.save()
+
+    def fill_done(self, keys, rows):
+        self.phase = 'render'
+        self.filled_rows = rows
+        self.keys = list(keys)
+        self.exported = set()
+        self.save()
+
+    def record_exported(self, pages):
+        self.exported.update(pages)
+        self.save()
+
+    def verified_pages(self, image_paths):
+        """已记录导出、且所有尺寸的图片都完整的页码；image_paths(page) 返回该页的图片路径列表"""
+        return {
+            page for page in self.exported
+            if all(verify_image(path) for path in image_paths(page))
+        }
+
+    def complete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
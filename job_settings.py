@@ -0,0 +1,52 @@
+import os
+
+# 任务参数的预设值和解析、应用数据目录，只依赖标准库，界面启动时可以直接导入，不会拖慢窗口出现
+
+# 应用数据文件夹名称（缓存等放在系统缓存目录下的这个文件夹中）
+APP_DIR_NAME = '小红书图文批量制作工具'
+
+# 预设图片尺寸（界面下拉框和命令行共用）
+SIZE_PRESETS = {
+    "自定义尺寸": None,
+    "小红书封面（竖版）- 1080×1440": (1080, 1440),
+    "小红书封面（横版）- 1440×1080": (1440, 1080),
+    "小红书封面（方版）- 1080×1080": (1080, 1080),
+    "小红书图文封面（竖版）- 1242×1660": (1242, 1660),
+    "小红书图文封面（方版）- 1080×1080": (1080, 1080),
+    "小红书图文封面（横版）- 2560×1440": (2560, 1440),
+    "抖音视频封面 - 1080×1920": (1080, 1920),
+    "抖音预览封面 - 1080×1464": (1080, 1464),
+    "抖音个人主页背景 - 1125×633": (1125, 633)
+}
+
+DEFAULT_SIZE_PRESET = "小红书图文封面（竖版）- 1242×1660"
+
+# 输出尺寸与幻灯片比例不同时的处理方式：拉伸、居中裁剪、两侧留白（界面下拉框显示的名称）
+FIT_MODES = {
+    'stretch': "拉伸",
+    'crop': "居中裁剪",
+    'letterbox': "留白",
+}
+
+
+def default_worker_count():
+    """默认并行进程数：CPU核心数的一半，最多4个"""
+    return max(1, min(4, (os.cpu_count() or 1) // 2))
+
+
+def parse_size(value):
+    """把预设名称或 "宽x高" 形式的字符串解析为 (宽, 高)"""
+    if value in SIZE_PRESETS and SIZE_PRESETS[value] is not None:
+        return SIZE_PRESETS[value]
+    normalized = value.lower().replace('×', 'x').replace('*', 'x')
+    try:
+        width, height = normalized.split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise ValueError(f"无法识别的图片尺寸: {value}")
+
+
+def app_cache_dir(*parts):
+    """应用缓存目录：Windows 为 %LOCALAPPDATA% 下的应用文件夹，其他系统为 ~/.cache 下"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, APP_DIR_NAME, *parts)
@@ -0,0 +1,1400 @@
+import io
+import os
+import math
+import colorsys
+import hashlib
+import re
+from collections import OrderedDict
+
+from lxml import etree
+from PIL import Image, ImageDraw
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+from font_library import fonts, is_east_asian, is_emoji
+from slide_renderer import BaseRenderer, RENDERER_BACKENDS
+
+# 1磅对应的EMU数
+EMU_PER_POINT = 12700
+
+# 文本框默认内边距（左、上、右、下，EMU）
+DEFAULT_INSETS = (91440, 45720, 91440, 45720)
+
+# 没有设置字号时使用的默认字号（磅）
+DEFAULT_FONT_SIZE = 18
+
+# 单倍行距约为字号的1.2倍
+LINE_HEIGHT_RATIO = 1.2
+
+# 支持的预设形状
+SUPPORTED_GEOMETRY = {'rect', 'roundRect', 'ellipse', 'line', 'straightConnector1'}
+
+# 不支持的填充和效果（遇到时交给WPS渲染）
+UNSUPPORTED_FILLS = {'gradFill', 'pattFill', 'grpFill'}
+
+# 关系属性（r:embed 等）
+_REL_ATTR = re.compile(r'(r:(?:embed|link|id))="([^"]*)"')
+
+# 不绘制的零宽字符（变体选择符、连接符）
+_ZERO_WIDTH = {'\ufe0e', '\ufe0f', '\u200d', '\u200b'}
+
+
+class UnsupportedTemplate(Exception):
+    """模板中有原生渲染器不支持的内容"""
+
+
+def _local(element):
+    return etree.QName(element).localname
+
+
+def _child(element, name):
+    return element.find(qn(name)) if element is not None else None
+
+
+def _emu(element, name, default=0):
+    value = element.get(name) if element is not None else None
+    return int(value) if value is not None else default
+
+
+class _Theme:
+    """主题中的配色、字体和格式方案，以及母版的配色映射"""
+
+    def __init__(self, master):
+        theme_xml = etree.fromstring(master.part.part_related_by(RT.THEME).blob)
+        elements = theme_xml.find(qn('a:themeElements'))
+        self.colors = {}
+        for color in elements.find(qn('a:clrScheme')):
+            value = color[0]
+            if _local(value) == 'srgbClr':
+                self.colors[_local(color)] = value.get('val')
+            elif _local(value) == 'sysClr':
+                self.colors[_local(color)] = value.get('lastClr', '000000')
+
+        font_scheme = elements.find(qn('a:fontScheme'))
+        self.fonts = {}
+        for prefix, name in (('mj', 'a:majorFont'), ('mn', 'a:minorFont')):
+            font = font_scheme.find(qn(name))
+            for script, tag in (('lt', 'a:latin'), ('ea', 'a:ea')):
+                node = font.find(qn(tag))
+                self.fonts[f"+{prefix}-{script}"] = node.get('typeface') if node is not None else ''
+
+        fmt = elements.find(qn('a:fmtScheme'))
+        self.fill_styles = list(fmt.find(qn('a:fillStyleLst')))
+        self.line_styles = list(fmt.find(qn('a:lnStyleLst')))
+        self.effect_styles = list(fmt.find(qn('a:effectStyleLst')))
+        self.bg_fill_styles = list(fmt.find(qn('a:bgFillStyleLst')))
+
+        color_map = master._element.find(qn('p:clrMap'))
+        self.color_map = dict(color_map.attrib) if color_map is not None else {}
+
+    def typeface(self, name):
+        if name and name.startswith('+'):
+            return self.fonts.get(name, '')
+        return name
+
+
+def _apply_color_modifiers(rgb, modifiers):
+    r, g, b = (value / 255 for value in rgb)
+    alpha = 1.0
+    for modifier in modifiers:
+        name = _local(modifier)
+        value = int(modifier.get('val', '100000')) / 100000
+        if name == 'alpha':
+            alpha = value
+        elif name in ('lumMod', 'lumOff'):
+            h, l, s = colorsys.rgb_to_hls(r, g, b)
+            l = l * value if name == 'lumMod' else l + value
+            r, g, b = colorsys.hls_to_rgb(h, min(max(l, 0), 1), s)
+        elif name == 'shade':
+            r, g, b = r * value, g * value, b * value
+        elif name == 'tint':
+            r, g, b = (c + (1 - c) * (1 - value) for c in (r, g, b))
+        elif name in ('satMod', 'satOff', 'hueMod', 'hueOff', 'alphaMod', 'alphaOff'):
+            # 主题中常见的细微调整，忽略影响很小
+            continue
+        else:
+            raise UnsupportedTemplate(f"不支持的颜色调整: {name}")
+    return tuple(int(round(min(max(c, 0), 1) * 255)) for c in (r, g, b)) + (int(round(alpha * 255)),)
+
+
+def _resolve_color(container, theme, placeholder=None):
+    """解析颜色元素（srgbClr、schemeClr、sysClr、prstClr），返回 RGBA"""
+    color = None
+    for node in container:
+        if _local(node) in ('srgbClr', 'schemeClr', 'sysClr', 'prstClr', 'scrgbClr', 'hslClr'):
+            color = node
+            break
+    if color is None:
+        return None
+    kind = _local(color)
+    if kind == 'srgbClr':
+        hex_value = color.get('val')
+    elif kind == 'sysClr':
+        hex_value = color.get('lastClr', '000000')
+    elif kind == 'prstClr':
+        hex_value = {'black': '000000', 'white': 'FFFFFF', 'red': 'FF0000'}.get(color.get('val'))
+        if hex_value is None:
+            raise UnsupportedTemplate(f"不支持的预设颜色: {color.get('val')}")
+    elif kind == 'schemeClr':
+        name = color.get('val')
+        if name == 'phClr':
+            # 主题样式中的占位颜色，由引用它的形状样式提供
+            if placeholder is None:
+                raise UnsupportedTemplate("缺少主题样式颜色")
+            rgba = _apply_color_modifiers(placeholder[:3], list(color))
+            return rgba[:3] + (rgba[3] * placeholder[3] // 255,)
+        name = theme.color_map.get(name, name)
+        hex_value = theme.colors.get(name)
+        if hex_value is None:
+            raise UnsupportedTemplate(f"主题中没有颜色: {name}")
+    else:
+        raise UnsupportedTemplate(f"不支持的颜色类型: {kind}")
+    rgb = tuple(int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+    return _apply_color_modifiers(rgb, list(color))
+
+
+def _check_effects(element, theme, style):
+    """形状带有阴影、倒影、三维等效果时不支持"""
+    effect_list = _child(element, 'a:effectLst')
+    if effect_list is not None and len(effect_list):
+        raise UnsupportedTemplate("不支持形状效果（阴影、发光等）")
+    for tag in ('a:effectDag', 'a:scene3d', 'a:sp3d'):
+        if _child(element, tag) is not None:
+            raise UnsupportedTemplate("不支持三维或组合效果")
+    if style is not None:
+        effect_ref = _child(style, 'a:effectRef')
+        idx = _emu(effect_ref, 'idx')
+        if idx > 0 and idx <= len(theme.effect_styles):
+            effect_list = theme.effect_styles[idx - 1].find(qn('a:effectLst'))
+            if effect_list is not None and len(effect_list):
+                raise UnsupportedTemplate("不支持主题中的形状效果")
+
+
+class _Transform:
+    """EMU坐标到幻灯片EMU坐标的变换（组合中的形状使用子坐标系）"""
+
+    def __init__(self, scale_x=1.0, offset_x=0.0, scale_y=1.0, offset_y=0.0):
+        self.scale_x = scale_x
+        self.offset_x = offset_x
+        self.scale_y = scale_y
+        self.offset_y = offset_y
+
+    def box(self, xfrm):
+        off = _child(xfrm, 'a:off')
+        ext = _child(xfrm, 'a:ext')
+        x = _emu(off, 'x') * self.scale_x + self.offset_x
+        y = _emu(off, 'y') * self.scale_y + self.offset_y
+        return x, y, x + _emu(ext, 'cx') * self.scale_x, y + _emu(ext, 'cy') * self.scale_y
+
+    def child(self, xfrm):
+        """组合内部的子坐标系"""
+        x0, y0, x1, y1 = self.box(xfrm)
+        ch_off = _child(xfrm, 'a:chOff')
+        ch_ext = _child(xfrm, 'a:chExt')
+        ch_cx, ch_cy = _emu(ch_ext, 'cx'), _emu(ch_ext, 'cy')
+        scale_x = (x1 - x0) / ch_cx if ch_cx else self.scale_x
+        scale_y = (y1 - y0) / ch_cy if ch_cy else self.scale_y
+        return _Transform(scale_x, x0 - _emu(ch_off, 'x') * scale_x,
+                          scale_y, y0 - _emu(ch_off, 'y') * scale_y)
+
+
+def _pixel_box(box, scale):
+    sx, sy = scale
+    return (int(round(box[0] * sx)), int(round(box[1] * sy)),
+            int(round(box[2] * sx)), int(round(box[3] * sy)))
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class _Context:
+    """编译一页时共用的信息：主题、所在部件（用于查找图片）、默认文本样式"""
+
+    def __init__(self, theme, part, text_defaults):
+        self.theme = theme
+        self.part = part
+        self.text_defaults = text_defaults
+
+    def related_image(self, rid):
+        image_part = self.part.related_part(rid)
+        if not image_part.content_type.startswith('image/') or image_part.content_type in (
+                'image/x-emf', 'image/x-wmf', 'image/svg+xml'):
+            raise UnsupportedTemplate(f"不支持的图片格式: {image_part.content_type}")
+        return str(image_part.partname), image_part.blob
+
+    def element_key(self, element):
+        """元素的缓存键：XML中的关系ID替换为目标部件名称，复制出的页面键相同"""
+        xml = etree.tostring(element, encoding='unicode')
+
+        def replace(match):
+            rid = match.group(2)
+            if rid in self.part.rels:
+                rel = self.part.rels[rid]
+                target = rel.target_ref if rel.is_external else str(rel.target_part.partname)
+                return f'{match.group(1)}="{target}"'
+            return match.group(0)
+
+        return _REL_ATTR.sub(replace, xml)
+
+
+class _Fill:
+    """形状填充：纯色或图片"""
+
+    def __init__(self, color=None, image=None):
+        self.color = color
+        self.image = image
+
+
+def _parse_fill(sp_pr, style, ctx):
+    """解析形状填充，返回 _Fill 或 None（无填充）"""
+    for node in sp_pr:
+        name = _local(node)
+        if name == 'noFill':
+            return None
+        if name == 'solidFill':
+            return _Fill(color=_resolve_color(node, ctx.theme))
+        if name == 'blipFill':
+            return _Fill(image=_parse_blip_fill(node, ctx))
+        if name in UNSUPPORTED_FILLS:
+            raise UnsupportedTemplate(f"不支持的填充方式: {name}")
+    # 没有直接设置时使用主题样式
+    fill_ref = _child(style, 'a:fillRef')
+    idx = _emu(fill_ref, 'idx')
+    if idx == 0 or fill_ref is None:
+        return None
+    style_fill = ctx.theme.fill_styles[idx - 1] if idx <= len(ctx.theme.fill_styles) else None
+    if style_fill is None or _local(style_fill) != 'solidFill':
+        raise UnsupportedTemplate("不支持主题中的渐变或图案填充")
+    return _Fill(color=_resolve_color(style_fill, ctx.theme, _resolve_color(fill_ref, ctx.theme)))
+
+
+def _parse_line(sp_pr, style, ctx):
+    """解析线条，返回 (RGBA, 宽度EMU) 或 None"""
+    ln = _child(sp_pr, 'a:ln')
+    color = None
+    width = None
+    has_fill = False
+    if ln is not None:
+        for node in ln:
+            name = _local(node)
+            if name == 'noFill':
+                return None
+            if name == 'solidFill':
+                color = _resolve_color(node, ctx.theme)
+                has_fill = True
+            elif name in UNSUPPORTED_FILLS:
+                raise UnsupportedTemplate("不支持渐变线条")
+            elif name == 'prstDash' and node.get('val') not in (None, 'solid'):
+                raise UnsupportedTemplate("不支持虚线")
+            elif name in ('headEnd', 'tailEnd') and node.get('type') not in (None, 'none'):
+                raise UnsupportedTemplate("不支持箭头")
+            elif name == 'custDash':
+                raise UnsupportedTemplate("不支持虚线")
+        if ln.get('w') is not None:
+            width = int(ln.get('w'))
+
+    line_ref = _child(style, 'a:lnRef')
+    idx = _emu(line_ref, 'idx')
+    if not has_fill:
+        if line_ref is None or idx == 0:
+            return None
+        style_line = ctx.theme.line_styles[idx - 1] if idx <= len(ctx.theme.line_styles) else None
+        style_fill = _child(style_line, 'a:solidFill')
+        if style_fill is None:
+            raise UnsupportedTemplate("不支持主题中的线条样式")
+        color = _resolve_color(style_fill, ctx.theme, _resolve_color(line_ref, ctx.theme))
+    if width is None:
+        style_line = ctx.theme.line_styles[idx - 1] if 0 < idx <= len(ctx.theme.line_styles) else None
+        width = _emu(style_line, 'w', 9525)
+    return color, width
+
+
+def _parse_blip_fill(blip_fill, ctx):
+    """解析图片填充，返回 (部件名称, 图片数据, 裁剪比例)"""
+    blip = _child(blip_fill, 'a:blip')
+    rid = blip.get(qn('r:embed')) if blip is not None else None
+    if not rid:
+        raise UnsupportedTemplate("不支持链接的图片")
+    for node in blip:
+        if _local(node) not in ('extLst',):
+            raise UnsupportedTemplate(f"不支持图片效果: {_local(node)}")
+    if _child(blip_fill, 'a:tile') is not None:
+        raise UnsupportedTemplate("不支持平铺图片")
+    fill_rect = _child(_child(blip_fill, 'a:stretch'), 'a:fillRect')
+    if fill_rect is not None and any(fill_rect.get(side) for side in ('l', 't', 'r', 'b')):
+        raise UnsupportedTemplate("不支持图片偏移")
+    crop = (0, 0, 0, 0)
+    src_rect = _child(blip_fill, 'a:srcRect')
+    if src_rect is not None:
+        crop = tuple(int(src_rect.get(side, '0')) / 100000 for side in ('l', 't', 'r', 'b'))
+        if any(value < 0 for value in crop):
+            raise UnsupportedTemplate("不支持负的图片裁剪")
+    partname, blob = ctx.related_image(rid)
+    return partname, blob, crop
+
+
+class _Item:
+    """一页中的一个绘制对象"""
+
+    has_text = False
+
+    def __init__(self, box, key):
+        self.box = box
+        self.key = key
+
+    def draw(self, canvas, scale, images):
+        raise NotImplementedError
+
+
+def _rotation(xfrm):
+    return _emu(xfrm, 'rot') / 60000 if xfrm is not None else 0
+
+
+def _paste_layer(canvas, layer, box_px, rotation):
+    """把形状图层贴到画布上，需要时绕中心旋转"""
+    if rotation:
+        center = ((box_px[0] + box_px[2]) / 2, (box_px[1] + box_px[3]) / 2)
+        layer = layer.rotate(-rotation, resample=Image.Resampling.BICUBIC, expand=True)
+        position = (int(round(center[0] - layer.width / 2)), int(round(center[1] - layer.height / 2)))
+    else:
+        position = (box_px[0], box_px[1])
+    canvas.paste(layer, position, layer)
+
+
+def _picture_layer(images, source, size, flip_h=False, flip_v=False):
+    """解码、裁剪并缩放图片，结果按参数缓存"""
+    partname, blob, crop = source
+    key = (partname, crop, size, flip_h, flip_v)
+    layer = images.get(key)
+    if layer is None:
+        img = Image.open(io.BytesIO(blob))
+        if not any(crop):
+            # JPEG可以直接按接近目标的尺寸解码
+            img.draft('RGB', size)
+        img.load()
+        img = img.convert('RGBA')
+        if any(crop):
+            w, h = img.size
+            img = img.crop((int(round(w * crop[0])), int(round(h * crop[1])),
+                            int(round(w * (1 - crop[2]))), int(round(h * (1 - crop[3])))))
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if flip_h:
+            img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        if flip_v:
+            img = img.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        images.put(key, img)
+        layer = img
+    return layer
+
+
+class _PictureItem(_Item):
+
+    def __init__(self, box, key, source, xfrm, line):
+        super().__init__(box, key)
+        self.source = source
+        self.rotation = _rotation(xfrm)
+        self.flip_h = xfrm.get('flipH') == '1'
+        self.flip_v = xfrm.get('flipV') == '1'
+        self.line = line
+
+    def draw(self, canvas, scale, images):
+        box_px = _pixel_box(self.box, scale)
+        size = (max(box_px[2] - box_px[0], 1), max(box_px[3] - box_px[1], 1))
+        layer = _picture_layer(images, self.source, size, self.flip_h, self.flip_v)
+        if self.line is not None:
+            layer = layer.copy()
+            color, width = self.line
+            ImageDraw.Draw(layer, 'RGBA').rectangle(
+                (0, 0, size[0] - 1, size[1] - 1), outline=color,
+                width=max(1, int(round(width * scale[1])))
+            )
+        _paste_layer(canvas, layer, box_px, self.rotation)
+
+
+class _LineItem(_Item):
+    """直线和直线连接符"""
+
+    def __init__(self, box, key, xfrm, line):
+        super().__init__(box, key)
+        self.rotation = _rotation(xfrm)
+        self.flip_h = xfrm.get('flipH') == '1'
+        self.flip_v = xfrm.get('flipV') == '1'
+        self.line = line
+
+    def draw(self, canvas, scale, images):
+        if self.line is None:
+            return
+        x0, y0, x1, y1 = (self.box[0] * scale[0], self.box[1] * scale[1],
+                          self.box[2] * scale[0], self.box[3] * scale[1])
+        if self.flip_h:
+            x0, x1 = x1, x0
+        if self.flip_v:
+            y0, y1 = y1, y0
+        if self.rotation:
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            angle = math.radians(self.rotation)
+            cos, sin = math.cos(angle), math.sin(angle)
+
+            def rotate(x, y):
+                return (cx + (x - cx) * cos - (y - cy) * sin, cy + (x - cx) * sin + (y - cy) * cos)
+
+            (x0, y0), (x1, y1) = rotate(x0, y0), rotate(x1, y1)
+        color, width = self.line
+        ImageDraw.Draw(canvas, 'RGBA').line(
+            (x0, y0, x1, y1), fill=color, width=max(1, int(round(width * scale[1])))
+        )
+
+
+class _GroupItem(_Item):
+
+    def __init__(self, box, key, children):
+        super().__init__(box, key)
+        self.children = children
+        self.has_text = any(child.has_text for child in children)
+
+    def draw(self, canvas, scale, images):
+        for child in self.children:
+            child.draw(canvas, scale, images)
+
+
+class _TextStyle:
+    """一段文字的格式"""
+
+    def __init__(self, size, bold, italic, underline, color, latin, ea, spacing):
+        self.size = size
+        self.bold = bold
+        self.italic = italic
+        self.underline = underline
+        self.color = color
+        self.latin = latin
+        self.ea = ea
+        self.spacing = spacing
+
+
+class _Paragraph:
+
+    def __init__(self, align, line_spacing, space_before, space_after, margin_left, indent, chars, end_style):
+        self.align = align
+        # 行距：('pct', 比例) 或 ('pts', 磅)
+        self.line_spacing = line_spacing
+        self.space_before = space_before
+        self.space_after = space_after
+        self.margin_left = margin_left
+        self.indent = indent
+        # [(字符, _TextStyle)]，换行符 '\n' 表示 <a:br/>
+        self.chars = chars
+        self.end_style = end_style
+
+
+_RUN_PROPERTY_CHILDREN_OK = {'solidFill', 'latin', 'ea', 'cs', 'sym', 'hlinkClick', 'hlinkMouseOver', 'extLst', 'rtl'}
+
+
+def _check_run_properties(rPr):
+    if rPr is None:
+        return
+    for node in rPr:
+        name = _local(node)
+        if name == 'ln':
+            if _child(node, 'a:noFill') is None:
+                raise UnsupportedTemplate("不支持文字轮廓")
+        elif name == 'effectLst':
+            if len(node):
+                raise UnsupportedTemplate("不支持文字效果")
+        elif name == 'noFill':
+            continue
+        elif name not in _RUN_PROPERTY_CHILDREN_OK:
+            raise UnsupportedTemplate(f"不支持的文字格式: {name}")
+    if rPr.get('baseline') not in (None, '0'):
+        raise UnsupportedTemplate("不支持上标或下标")
+
+
+def _level_properties(list_style, level):
+    return _child(list_style, f'a:lvl{level + 1}pPr') if list_style is not None else None
+
+
+def _text_style(rPr_chain, font_ref, theme):
+    """按继承顺序（文字块、段落默认、文本框样式、形状样式、母版默认）合并文字格式"""
+    size = bold = italic = underline = color = latin = ea = spacing = None
+    for rPr in rPr_chain:
+        if rPr is None:
+            continue
+        if rPr is font_ref:
+            # 形状样式中的字体和颜色优先于母版默认值
+            if color is None:
+                color = _resolve_color(font_ref, theme)
+            if font_ref.get('idx') in ('major', 'minor'):
+                prefix = '+mj' if font_ref.get('idx') == 'major' else '+mn'
+                latin = latin or theme.typeface(f"{prefix}-lt")
+                ea = ea or theme.typeface(f"{prefix}-ea")
+            continue
+        if size is None and rPr.get('sz') is not None:
+            size = int(rPr.get('sz')) / 100
+        if bold is None and rPr.get('b') is not None:
+            bold = rPr.get('b') in ('1', 'true')
+        if italic is None and rPr.get('i') is not None:
+            italic = rPr.get('i') in ('1', 'true')
+        if underline is None and rPr.get('u') is not None:
+            underline = rPr.get('u') != 'none'
+        if spacing is None and rPr.get('spc') is not None:
+            spacing = int(rPr.get('spc')) / 100
+        if color is None:
+            if _child(rPr, 'a:noFill') is not None:
+                color = (0, 0, 0, 0)
+            else:
+                fill = _child(rPr, 'a:solidFill')
+                if fill is not None:
+                    color = _resolve_color(fill, theme)
+        if latin is None and _child(rPr, 'a:latin') is not None:
+            latin = theme.typeface(_child(rPr, 'a:latin').get('typeface'))
+        if ea is None and _child(rPr, 'a:ea') is not None:
+            ea = theme.typeface(_child(rPr, 'a:ea').get('typeface'))
+    return _TextStyle(
+        size or DEFAULT_FONT_SIZE, bool(bold), bool(italic), bool(underline), color or (0, 0, 0, 255),
+        latin or theme.typeface('+mn-lt'), ea or theme.typeface('+mn-ea'), spacing or 0,
+    )
+
+
+def _paragraph_spacing(pPr_chain, tag):
+    """按继承顺序取段前、段后间距或行距：('pts', 磅) 或 ('pct', 比例)，都没有设置时返回 None"""
+    for node in pPr_chain:
+        spacing = _child(node, tag)
+        if spacing is not None:
+            if _child(spacing, 'a:spcPts') is not None:
+                return 'pts', int(_child(spacing, 'a:spcPts').get('val')) / 100
+            return 'pct', int(_child(spacing, 'a:spcPct').get('val')) / 100000
+    return None
+
+
+def _autofit(body_pr):
+    """文本框“溢出时缩小文字”保存的 (字号比例, 行距减少量)"""
+    autofit = _child(body_pr, 'a:normAutofit')
+    if autofit is None:
+        return 1.0, 0.0
+    return int(autofit.get('fontScale', '100000')) / 100000, int(autofit.get('lnSpcReduction', '0')) / 100000
+
+
+def _reduce_line_spacing(line_spacing, reduction):
+    """按比例的行距减去自动缩小的行距减少量"""
+    if line_spacing[0] == 'pct':
+        return 'pct', max(line_spacing[1] - reduction, 0.1)
+    return line_spacing
+
+
+def _paragraph_chain(pPr, list_styles):
+    """段落格式的继承顺序：段落自身、各级列表样式（文本框、版式和母版占位符、母版文本样式、演示文稿默认值）"""
+    level = int(pPr.get('lvl', '0')) if pPr is not None else 0
+    return [pPr] + [_level_properties(list_style, level) for list_style in list_styles]
+
+
+def _run_style(rPr, pPr_chain, font_ref, theme):
+    """文字块的格式：依次继承段落、文本框列表样式、形状样式、占位符和母版的默认格式"""
+    defRPr_chain = [_child(node, 'a:defRPr') for node in pPr_chain]
+    return _text_style([rPr] + defRPr_chain[:2] + [font_ref] + defRPr_chain[2:], font_ref, theme)
+
+
+def _paragraph_format(pPr_chain, spacing_reduction):
+    """段落的对齐、行距、段前段后间距、左边距和首行缩进（EMU）"""
+
+    def value(attribute, default):
+        for node in pPr_chain:
+            if node is not None and node.get(attribute) is not None:
+                return node.get(attribute)
+        return default
+
+    line_spacing = _paragraph_spacing(pPr_chain, 'a:lnSpc') or ('pct', 1.0)
+    return {
+        'align': value('algn', 'l'),
+        'line_spacing': _reduce_line_spacing(line_spacing, spacing_reduction),
+        'space_before': _paragraph_spacing(pPr_chain, 'a:spcBef'),
+        'space_after': _paragraph_spacing(pPr_chain, 'a:spcAft'),
+        'margin_left': int(value('marL', '0')),
+        'indent': int(value('indent', '0')),
+    }
+
+
+def _body_properties(body_prs):
+    """按继承顺序（文本框、版式占位符、母版占位符）合并 bodyPr：折行、垂直对齐、内边距和自动调整"""
+
+    def value(attribute):
+        for node in body_prs:
+            if node is not None and node.get(attribute) is not None:
+                return node.get(attribute)
+        return None
+
+    # 自动调整方式取第一个设置了的 bodyPr
+    autofit_owner = next(
+        (node for node in body_prs if node is not None and any(
+            _child(node, tag) is not None for tag in ('a:normAutofit', 'a:spAutoFit', 'a:noAutofit'))),
+        None
+    )
+    font_scale, spacing_reduction = _autofit(autofit_owner)
+    return {
+        'wrap': value('wrap') != 'none',
+        'anchor': value('anchor') or 't',
+        'insets': tuple(
+            int(value(name)) if value(name) is not None else default
+            for name, default in zip(('lIns', 'tIns', 'rIns', 'bIns'), DEFAULT_INSETS)
+        ),
+        'font_scale': font_scale,
+        'spacing_reduction': spacing_reduction,
+        # 形状随文字调整大小
+        'auto_grow': _child(autofit_owner, 'a:spAutoFit') is not None,
+    }
+
+
+def _flat_text_3d(body_pr):
+    """文字的三维设置是否看起来与平面文字相同：正前方的正交视角，没有棱台和轮廓（挤出的厚度从正前方看不到）"""
+    scene = _child(body_pr, 'a:scene3d')
+    if scene is not None:
+        camera = _child(scene, 'a:camera')
+        if camera is None or camera.get('prst') != 'orthographicFront' or _child(camera, 'a:rot') is not None:
+            return False
+    shape_3d = _child(body_pr, 'a:sp3d')
+    if shape_3d is not None:
+        if _child(shape_3d, 'a:bevelT') is not None or _child(shape_3d, 'a:bevelB') is not None:
+            return False
+        if _emu(shape_3d, 'contourW') > 0 or (scene is None and _emu(shape_3d, 'extrusionH') > 0):
+            return False
+    return True
+
+
+def _parse_text_body(tx_body, style, ctx):
+    """解析文本框，返回 (bodyPr信息, 段落列表)"""
+    body_pr = _child(tx_body, 'a:bodyPr')
+    if body_pr is not None:
+        if body_pr.get('vert') not in (None, 'horz'):
+            raise UnsupportedTemplate("不支持竖排文字")
+        if body_pr.get('rot') not in (None, '0') or body_pr.get('numCol') not in (None, '1'):
+            raise UnsupportedTemplate("不支持旋转或分栏的文本框")
+        warp = _child(body_pr, 'a:prstTxWarp')
+        if warp is not None and warp.get('prst') != 'textNoShape':
+            raise UnsupportedTemplate("不支持艺术字变形")
+        if not _flat_text_3d(body_pr):
+            raise UnsupportedTemplate("不支持三维艺术字效果")
+    font_ref = _child(style, 'a:fontRef')
+    list_styles = [_child(tx_body, 'a:lstStyle')] + list(ctx.text_defaults)
+    body = _body_properties([body_pr])
+    font_scale = body['font_scale']
+
+    paragraphs = []
+    for p in tx_body.findall(qn('a:p')):
+        pPr_chain = _paragraph_chain(_child(p, 'a:pPr'), list_styles)
+        for node in pPr_chain[:2]:
+            if node is None:
+                continue
+            for tag in ('a:buChar', 'a:buAutoNum', 'a:buBlip'):
+                if _child(node, tag) is not None:
+                    raise UnsupportedTemplate("不支持项目符号")
+
+        def style_for(rPr):
+            text_style = _run_style(rPr, pPr_chain, font_ref, ctx.theme)
+            text_style.size *= font_scale
+            return text_style
+
+        chars = []
+        for node in p:
+            name = _local(node)
+            if name in ('r', 'fld'):
+                rPr = _child(node, 'a:rPr')
+                _check_run_properties(rPr)
+                text_style = style_for(rPr)
+                text = (_child(node, 'a:t').text if _child(node, 'a:t') is not None else '') or ''
+                chars.extend((ch, text_style) for ch in text.replace('\r', '').replace('\v', '\n')
+                             if ch not in _ZERO_WIDTH)
+            elif name == 'br':
+                chars.append(('\n', style_for(_child(node, 'a:rPr'))))
+        end_style = style_for(_child(p, 'a:endParaRPr'))
+
+        paragraphs.append(_Paragraph(
+            chars=chars, end_style=end_style, **_paragraph_format(pPr_chain, body['spacing_reduction'])
+        ))
+    return body, paragraphs
+
+
+def _char_font(ch, style, size_px):
+    """按字符类别选择字体：中文用东亚字体，emoji用emoji字体，其他用西文字体；缺失时使用后备字体"""
+    face = None
+    fake_bold = style.bold
+    if is_emoji(ch):
+        face = fonts.emoji()
+    if face is None:
+        typeface = style.ea if is_east_asian(ch) else style.latin
+        face = fonts.find(typeface, style.bold)
+    if face is None:
+        face = fonts.fallback()
+    if face is None:
+        raise UnsupportedTemplate("没有找到可用的中文字体")
+    if face[2]:
+        fake_bold = False
+    return fonts.font(face, size_px), fake_bold
+
+
+class _TextLayout:
+    """把段落排版为若干行：[(行顶部, 基线, 行宽, 对齐, [(x偏移, 字符, 字体, 格式, 假粗体)])]"""
+
+    def __init__(self, paragraphs, width, scale_y, wrap):
+        self.lines = []
+        self.height = 0
+        y = 0.0
+        first_paragraph = True
+        # 同一格式的相同字符只查找一次字体和字宽（排版时逐字查找是主要开销）
+        measured = {}
+        for paragraph in paragraphs:
+            if paragraph.space_before is not None and not first_paragraph:
+                y += self._spacing(paragraph.space_before, paragraph, scale_y)
+            first_paragraph = False
+            left = paragraph.margin_left * scale_y
+            lines = self._break_lines(paragraph, width - left, paragraph.indent * scale_y, scale_y, wrap, measured)
+            for index, (glyphs, line_width, ascent, descent, size_px) in enumerate(lines):
+                # 字形在行内垂直居中
+                if paragraph.line_spacing[0] == 'pct':
+                    line_height = size_px * LINE_HEIGHT_RATIO * paragraph.line_spacing[1]
+                else:
+                    line_height = paragraph.line_spacing[1] * EMU_PER_POINT * scale_y
+                baseline = y + (line_height - ascent - descent) / 2 + ascent
+                last = index == len(lines) - 1
+                offset = left + (paragraph.indent * scale_y if index == 0 else 0)
+                self.lines.append((baseline, offset, width - offset, line_width, paragraph.align, last, glyphs))
+                y += line_height
+            if paragraph.space_after is not None:
+                y += self._spacing(paragraph.space_after, paragraph, scale_y)
+        self.height = y
+
+    @staticmethod
+    def _spacing(value, paragraph, scale_y):
+        kind, amount = value
+        if kind == 'pts':
+            return amount * EMU_PER_POINT * scale_y
+        return paragraph.end_style.size * EMU_PER_POINT * scale_y * LINE_HEIGHT_RATIO * amount
+
+    @staticmethod
+    def _break_lines(paragraph, width, first_indent, scale_y, wrap, measured):
+        """按宽度折行：中文可以在任意字符间断开，西文在空格处断开"""
+        lines = []
+        glyphs = []
+        x = 0.0
+        last_break = 0
+        limit = width - first_indent
+
+        def finish(items):
+            if items:
+                ascent = max(item[5] for item in items)
+                descent = max(item[6] for item in items)
+                size_px = max(item[2].size for item in items)
+            else:
+                size_px = _size_px(paragraph.end_style, scale_y)
+                font, _ = _char_font(' ', paragraph.end_style, size_px)
+                ascent, descent = font.getmetrics()
+            # 行尾空格不计入宽度
+            width_used = 0.0
+            for item in reversed(items):
+                if item[1] != ' ':
+                    width_used = item[0] + item[7]
+                    break
+            lines.append(([item[:5] for item in items], width_used, ascent, descent, size_px))
+
+        for ch, style in paragraph.chars:
+            if ch == '\n':
+                finish(glyphs)
+                glyphs, x, last_break, limit = [], 0.0, 0, width
+                continue
+            entry = measured.get((ch, style))
+            if entry is None:
+                font, fake_bold = _char_font(ch, style, _size_px(style, scale_y))
+                advance = fonts.width(font, ch) + style.spacing * EMU_PER_POINT * scale_y
+                breakable = ch == ' ' or is_east_asian(ch) or is_emoji(ch)
+                entry = measured[(ch, style)] = (font, fake_bold, advance, breakable) + font.getmetrics()
+            font, fake_bold, advance, breakable, ascent, descent = entry
+            if wrap and glyphs and x + advance > limit and ch != ' ':
+                split = last_break if last_break > 0 else len(glyphs)
+                carried = glyphs[split:]
+                finish(glyphs[:split])
+                # 续行从断开处重新计算横坐标
+                shift = carried[0][0] if carried else 0
+                glyphs = [(item[0] - shift,) + item[1:] for item in carried]
+                x = x - shift if carried else 0.0
+                last_break = 0
+                limit = width
+            glyphs.append((x, ch, font, style, fake_bold, ascent, descent, advance))
+            x += advance
+            if breakable:
+                last_break = len(glyphs)
+        finish(glyphs)
+        return lines
+
+
+def _size_px(style, scale_y):
+    return max(1, int(round(style.size * EMU_PER_POINT * scale_y)))
+
+
+class _ShapeItem(_Item):
+    """矩形、圆角矩形、椭圆等形状，可以带文字"""
+
+    def __init__(self, box, key, geometry, adjust, xfrm, fill, line, text):
+        super().__init__(box, key)
+        self.geometry = geometry
+        self.adjust = adjust
+        self.rotation = _rotation(xfrm)
+        self.fill = fill
+        self.line = line
+        self.text = text
+        self.has_text = text is not None and any(p.chars for p in text[1])
+
+    def draw(self, canvas, scale, images):
+        box_px = _pixel_box(self.box, scale)
+        size = (max(box_px[2] - box_px[0], 1), max(box_px[3] - box_px[1], 1))
+        if self.fill is not None or self.line is not None:
+            if self.fill is not None and self.fill.image is not None:
+                layer = _picture_layer(images, self.fill.image, size).copy()
+            else:
+                layer = Image.new('RGBA', size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(layer, 'RGBA')
+            fill_color = self.fill.color if self.fill is not None else None
+            outline = self.line[0] if self.line is not None else None
+            width = max(1, int(round(self.line[1] * scale[1]))) if self.line is not None else 0
+            rect = (0, 0, size[0] - 1, size[1] - 1)
+            if self.geometry == 'ellipse':
+                draw.ellipse(rect, fill=fill_color, outline=outline, width=width)
+            elif self.geometry == 'roundRect':
+                radius = int(min(size) * self.adjust)
+                draw.rounded_rectangle(rect, radius=radius, fill=fill_color, outline=outline, width=width)
+            else:
+                draw.rectangle(rect, fill=fill_color, outline=outline, width=width)
+            _paste_layer(canvas, layer, box_px, self.rotation)
+        if self.has_text:
+            self._draw_text(canvas, box_px, scale)
+
+    def _draw_text(self, canvas, box_px, scale):
+        body, paragraphs = self.text
+        left, top, right, bottom = (value * (scale[0] if i % 2 == 0 else scale[1])
+                                    for i, value in enumerate(body['insets']))
+        x0 = box_px[0] + left
+        y0 = box_px[1] + top
+        width = box_px[2] - box_px[0] - left - right
+        height = box_px[3] - box_px[1] - top - bottom
+        layout = _TextLayout(paragraphs, width, scale[1], body['wrap'])
+        if body['anchor'] == 'ctr':
+            y0 += (height - layout.height) / 2
+        elif body['anchor'] == 'b':
+            y0 += height - layout.height
+
+        draw = ImageDraw.Draw(canvas, 'RGBA')
+        for baseline, offset, available, line_width, align, last, glyphs in layout.lines:
+            extra = available - line_width
+            gap = 0.0
+            start = x0 + offset
+            if align == 'ctr':
+                start += extra / 2
+            elif align == 'r':
+                start += extra
+            elif align in ('just', 'dist') and len(glyphs) > 1 and extra > 0 and (align == 'dist' or not last):
+                # 两端对齐：多出的宽度平均分配到字符之间
+                gap = extra / (len(glyphs) - 1)
+            elif align == 'dist' and len(glyphs) == 1:
+                start += extra / 2
+            for x, text, font, style, fake_bold, advance in _segments(glyphs, gap):
+                if not text.strip() or style.color[3] == 0:
+                    continue
+                position = (start + x, y0 + baseline)
+                options = {}
+                if fake_bold:
+                    options = {'stroke_width': max(1, font.size // 36), 'stroke_fill': style.color}
+                if is_emoji(text[0]):
+                    options['embedded_color'] = True
+                try:
+                    draw.text(position, text, font=font, fill=style.color, anchor='ls', **options)
+                except Exception:
+                    options.pop('embedded_color', None)
+                    draw.text(position, text, font=font, fill=style.color, anchor='ls', **options)
+                if style.underline:
+                    underline_y = position[1] + max(1, font.size // 10)
+                    draw.line((position[0], underline_y, position[0] + advance, underline_y),
+                              fill=style.color, width=max(1, font.size // 18))
+
+
+def _segments(glyphs, gap):
+    """把同一字体和格式的相邻字符合并为一段，减少绘制调用；两端对齐时逐字绘制"""
+    segments = []
+    for index, (x, ch, font, style, fake_bold) in enumerate(glyphs):
+        x += gap * index
+        advance = fonts.width(font, ch)
+        last = segments[-1] if segments else None
+        if (last is not None and gap == 0 and style.spacing == 0 and last[2] is font and last[3] is style
+                and last[4] == fake_bold and not is_emoji(ch) and not is_emoji(last[1][0])):
+            segments[-1] = (last[0], last[1] + ch, font, style, fake_bold, x + advance - last[0])
+        else:
+            segments.append((x, ch, font, style, fake_bold, advance))
+    return segments
+
+
+def _compile_shapes(parent, transform, ctx, skip_placeholders):
+    """把形状树编译为绘制对象列表"""
+    items = []
+    for element in parent:
+        name = _local(element)
+        if name in ('nvGrpSpPr', 'grpSpPr', 'extLst'):
+            continue
+        if name == 'sp':
+            item = _compile_sp(element, transform, ctx, skip_placeholders)
+        elif name == 'pic':
+            item = _compile_pic(element, transform, ctx)
+        elif name == 'cxnSp':
+            item = _compile_connector(element, transform, ctx)
+        elif name == 'grpSp':
+            item = _compile_group(element, transform, ctx, skip_placeholders)
+        else:
+            raise UnsupportedTemplate(f"不支持的对象: {name}")
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def _placeholder(element):
+    """形状的占位符节点 <p:ph>，不是占位符时返回 None"""
+    for nv in element:
+        if _local(nv).startswith('nv'):
+            return _child(_child(nv, 'p:nvPr'), 'p:ph')
+    return None
+
+
+def _is_placeholder(element):
+    return _placeholder(element) is not None
+
+
+# 版式占位符继承的母版占位符类型（与 python-pptx 一致），其余类型都继承母版的正文占位符
+_MASTER_PLACEHOLDER_TYPES = {'title': 'title', 'ctrTitle': 'title', 'dt': 'dt', 'ftr': 'ftr', 'sldNum': 'sldNum'}
+
+# 母版占位符类型对应的母版文本样式
+_MASTER_TEXT_STYLES = {'title': 'p:titleStyle', 'body': 'p:bodyStyle'}
+
+
+def _find_placeholder(owner, ph_type, idx=None):
+    """在版式或母版的形状树中查找占位符：给出 idx 时按序号查找，找不到或没有给出时按类型查找"""
+    candidates = []
+    for element in owner.find(qn('p:cSld')).find(qn('p:spTree')).iter(qn('p:sp')):
+        ph = _placeholder(element)
+        if ph is not None:
+            candidates.append((ph, element))
+    if idx is not None:
+        for ph, element in candidates:
+            if ph.get('idx', '0') == idx:
+                return element
+    for ph, element in candidates:
+        if ph.get('type', 'obj') == ph_type:
+            return element
+    return None
+
+
+def _text_defaults(master, presentation, style_name='p:otherStyle'):
+    """母版文本样式和演示文稿默认文本样式（最后继承的两级列表样式）"""
+    return [_child(master.find(qn('p:txStyles')), style_name), presentation.find(qn('p:defaultTextStyle'))]
+
+
+def _inherited_text(element, layout, master, presentation):
+    """页面上的形状继承的 (bodyPr列表, 列表样式列表)，不含形状自身
+
+    占位符依次继承版式中的同一占位符、母版中的对应占位符和母版的标题或正文样式，其他形状继承母版的其他样式。
+    """
+    ph = _placeholder(element)
+    if ph is None:
+        return [], _text_defaults(master, presentation)
+    ph_type = ph.get('type', 'obj')
+    layout_sp = _find_placeholder(layout, ph_type, ph.get('idx', '0'))
+    master_type = _MASTER_PLACEHOLDER_TYPES.get(
+        layout_sp is not None and _placeholder(layout_sp).get('type', 'obj') or ph_type, 'body'
+    )
+    master_sp = _find_placeholder(master, master_type)
+    body_prs, list_styles = [], []
+    for inherited in (layout_sp, master_sp):
+        tx_body = _child(inherited, 'p:txBody')
+        body_prs.append(_child(tx_body, 'a:bodyPr'))
+        list_styles.append(_child(tx_body, 'a:lstStyle'))
+    style_name = _MASTER_TEXT_STYLES.get(master_type, 'p:otherStyle')
+    return body_prs, list_styles + _text_defaults(master, presentation, style_name)
+
+
+def _compile_sp(element, transform, ctx, skip_placeholders):
+    sp_pr = _child(element, 'p:spPr')
+    style = _child(element, 'p:style')
+    tx_body = _child(element, 'p:txBody')
+    xfrm = _child(sp_pr, 'a:xfrm')
+    if _is_placeholder(element):
+        has_text = tx_body is not None and ''.join(tx_body.itertext()).strip()
+        if skip_placeholders or (not has_text and xfrm is None):
+            # 母版和版式中的占位符、页面上的空占位符不会显示
+            return None
+        raise UnsupportedTemplate("不支持占位符文本")
+    if xfrm is None:
+        raise UnsupportedTemplate("形状缺少位置信息")
+    if _child(sp_pr, 'a:custGeom') is not None:
+        raise UnsupportedTemplate("不支持自定义形状")
+    geometry_node = _child(sp_pr, 'a:prstGeom')
+    geometry = geometry_node.get('prst') if geometry_node is not None else 'rect'
+    if geometry not in SUPPORTED_GEOMETRY:
+        raise UnsupportedTemplate(f"不支持的形状: {geometry}")
+    _check_effects(sp_pr, ctx.theme, style)
+
+    box = transform.box(xfrm)
+    line = _parse_line(sp_pr, style, ctx)
+    if geometry in ('line', 'straightConnector1'):
+        return _LineItem(box, ctx.element_key(element), xfrm, line)
+
+    adjust = 0.16667
+    guide = _child(_child(geometry_node, 'a:avLst'), 'a:gd')
+    if guide is not None and guide.get('fmla', '').startswith('val '):
+        adjust = int(guide.get('fmla')[4:]) / 100000
+
+    fill = _parse_fill(sp_pr, style, ctx)
+    if fill is not None and fill.image is not None and geometry != 'rect':
+        raise UnsupportedTemplate("只支持矩形的图片填充")
+
+    text = None
+    if tx_body is not None:
+        text = _parse_text_body(tx_body, style, ctx)
+        if _rotation(xfrm) and any(p.chars for p in text[1]):
+            raise UnsupportedTemplate("不支持旋转的文本框")
+    return _ShapeItem(box, ctx.element_key(element), geometry, adjust, xfrm, fill, line, text)
+
+
+def _compile_pic(element, transform, ctx):
+    sp_pr = _child(element, 'p:spPr')
+    xfrm = _child(sp_pr, 'a:xfrm')
+    if xfrm is None:
+        raise UnsupportedTemplate("图片缺少位置信息")
+    geometry_node = _child(sp_pr, 'a:prstGeom')
+    if geometry_node is not None and geometry_node.get('prst') != 'rect':
+        raise UnsupportedTemplate("不支持非矩形的图片裁剪")
+    style = _child(element, 'p:style')
+    _check_effects(sp_pr, ctx.theme, style)
+    source = _parse_blip_fill(_child(element, 'p:blipFill'), ctx)
+    line = _parse_line(sp_pr, style, ctx)
+    return _PictureItem(transform.box(xfrm), ctx.element_key(element), source, xfrm, line)
+
+
+def _compile_connector(element, transform, ctx):
+    sp_pr = _child(element, 'p:spPr')
+    xfrm = _child(sp_pr, 'a:xfrm')
+    geometry_node = _child(sp_pr, 'a:prstGeom')
+    if xfrm is None or geometry_node is None or geometry_node.get('prst') not in ('line', 'straightConnector1'):
+        raise UnsupportedTemplate("只支持直线连接符")
+    style = _child(element, 'p:style')
+    _check_effects(sp_pr, ctx.theme, style)
+    return _LineItem(transform.box(xfrm), ctx.element_key(element), xfrm,
+                     _parse_line(sp_pr, style, ctx))
+
+
+def _compile_group(element, transform, ctx, skip_placeholders):
+    grp_sp_pr = _child(element, 'p:grpSpPr')
+    xfrm = _child(grp_sp_pr, 'a:xfrm')
+    if xfrm is None:
+        raise UnsupportedTemplate("组合缺少位置信息")
+    if _rotation(xfrm) or xfrm.get('flipH') == '1' or xfrm.get('flipV') == '1':
+        raise UnsupportedTemplate("不支持旋转或翻转的组合")
+    _check_effects(grp_sp_pr, ctx.theme, None)
+    for node in grp_sp_pr:
+        if _local(node) in UNSUPPORTED_FILLS or _local(node) in ('solidFill', 'blipFill'):
+            raise UnsupportedTemplate("不支持组合填充")
+    children = _compile_shapes(element, transform.child(xfrm), ctx, skip_placeholders)
+    return _GroupItem(transform.box(xfrm), ctx.element_key(element), children)
+
+
+def _background(owners, theme):
+    """沿页面、版式、母版查找背景，返回 ('color', RGBA) 或 ('image', 图片来源)"""
+    for element, ctx in owners:
+        bg = element.find(qn('p:cSld')).find(qn('p:bg'))
+        if bg is None:
+            continue
+        bg_pr = _child(bg, 'p:bgPr')
+        if bg_pr is not None:
+            _check_effects(bg_pr, theme, None)
+            for node in bg_pr:
+                name = _local(node)
+                if name == 'solidFill':
+                    return 'color', _resolve_color(node, theme)
+                if name == 'blipFill':
+                    return 'image', _parse_blip_fill(node, ctx)
+                if name == 'noFill':
+                    return 'color', (255, 255, 255, 255)
+                if name in UNSUPPORTED_FILLS:
+                    raise UnsupportedTemplate(f"不支持的背景填充: {name}")
+        bg_ref = _child(bg, 'p:bgRef')
+        if bg_ref is not None:
+            idx = int(bg_ref.get('idx', '0'))
+            styles = theme.bg_fill_styles if idx >= 1001 else theme.fill_styles
+            position = idx - 1001 if idx >= 1001 else idx - 1
+            if idx == 0 or idx == 1000:
+                return 'color', (255, 255, 255, 255)
+            style_fill = styles[position] if 0 <= position < len(styles) else None
+            if style_fill is None or _local(style_fill) != 'solidFill':
+                raise UnsupportedTemplate("不支持主题中的渐变或图片背景")
+            return 'color', _resolve_color(style_fill, theme, _resolve_color(bg_ref, theme))
+    return 'color', (255, 255, 255, 255)
+
+
+class _Scene:
+    """编译后的一页：背景、静态图层（不含文字、与文字不重叠的形状）和逐页绘制的对象"""
+
+    def __init__(self, background, static_items, dynamic_items):
+        self.background = background
+        self.static_items = static_items
+        self.dynamic_items = dynamic_items
+        digest = hashlib.sha1()
+        digest.update(repr(background[0]).encode('utf-8'))
+        if background[0] == 'image':
+            digest.update(background[1][0].encode('utf-8') + repr(background[1][2]).encode('utf-8'))
+        else:
+            digest.update(repr(background[1]).encode('utf-8'))
+        for item in static_items:
+            digest.update(item.key.encode('utf-8'))
+        self.static_key = digest.hexdigest()
+
+
+def _split_layers(items):
+    """文字对象逐页绘制；不含文字的对象只要不与更靠下的文字重叠，就可以放进静态图层"""
+    static_items = []
+    dynamic_items = []
+    text_boxes = []
+    for item in items:
+        if item.has_text:
+            dynamic_items.append(item)
+            text_boxes.append(item.box)
+        elif any(_overlaps(item.box, box) for box in text_boxes):
+            dynamic_items.append(item)
+        else:
+            static_items.append(item)
+    return static_items, dynamic_items
+
+
+class _ImageCache:
+    """解码缩放后的图片缓存，按使用顺序淘汰"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+class NativeRenderer(BaseRenderer):
+    """不依赖办公软件的渲染器：用python-pptx读取页面结构，用Pillow绘制背景、图片、线条和文字
+
+    只支持纯色或图片背景、矩形/圆角矩形/椭圆/直线、图片和横排文字，
+    遇到渐变、阴影、三维、占位符文本、表格图表等内容时抛出 UnsupportedTemplate。
+    静态图层（背景以及不含文字的形状）按内容缓存，复制出的页面只绘制一次。
+    """
+
+    # 导出为BMP，省去PNG压缩（后处理阶段会重新编码为JPG）
+    export_format = "BMP"
+
+    def __init__(self):
+        super().__init__()
+        self.prs = None
+        self._document = None
+        self._scenes = []
+        self._themes = {}
+        self._layers = _ImageCache(8)
+        self._images = _ImageCache(64)
+
+    def open(self, ppt_path):
+        """打开并编译演示文稿；同一文件未修改时复用上次的编译结果"""
+        stat = os.stat(ppt_path)
+        document = (os.path.abspath(ppt_path), stat.st_mtime, stat.st_size)
+        if document != self._document:
+            self._document = None
+            self.prs = Presentation(ppt_path)
+            self._themes = {}
+            self._scenes = [self._compile(slide) for slide in self.prs.slides]
+            self._document = document
+        self.documents_opened += 1
+
+    def _compile(self, slide):
+        layout = slide.slide_layout
+        master = layout.slide_master
+        theme_key = str(master.part.partname)
+        if theme_key not in self._themes:
+            self._themes[theme_key] = _Theme(master)
+        theme = self._themes[theme_key]
+        defaults = _text_defaults(master._element, self.prs.part._element)
+        contexts = [_Context(theme, owner.part, defaults) for owner in (slide, layout, master)]
+
+        items = []
+        show_master = slide._element.get('showMasterSp') != '0'
+        if show_master and layout._element.get('showMasterSp') != '0':
+            items += _compile_shapes(master._element.find(qn('p:cSld')).find(qn('p:spTree')),
+                                     _Transform(), contexts[2], True)
+        if show_master:
+            items += _compile_shapes(layout._element.find(qn('p:cSld')).find(qn('p:spTree')),
+                                     _Transform(), contexts[1], True)
+        items += _compile_shapes(slide._element.find(qn('p:cSld')).find(qn('p:spTree')),
+                                 _Transform(), contexts[0], False)
+
+        background = _background(
+            [(slide._element, contexts[0]), (layout._element, contexts[1]), (master._element, contexts[2])],
+            theme
+        )
+        static_items, dynamic_items = _split_layers(items)
+        return _Scene(background, static_items, dynamic_items)
+
+    def slide_count(self):
+        return len(self._scenes)
+
+    def _static_layer(self, scene, size, scale):
+        key = (scene.static_key, size)
+        layer = self._layers.get(key)
+        if layer is None:
+            kind, value = scene.background
+            if kind == 'color':
+                layer = Image.new('RGBA', size, value[:3] + (255,))
+            else:
+                layer = _picture_layer(self._images, value, size).copy()
+            for item in scene.static_items:
+                item.draw(layer, scale, self._images)
+            self._layers.put(key, layer)
+        return layer
+
+    def render(self, index, width, height):
+        """绘制第 index 页（从1开始），返回RGB图片"""
+        if not 1 <= index <= len(self._scenes):
+            raise IndexError(f"幻灯片序号超出范围: {index}")
+        scene = self._scenes[index - 1]
+        scale = (width / self.prs.slide_width, height / self.prs.slide_height)
+        canvas = self._static_layer(scene, (width, height), scale).copy()
+        for item in scene.dynamic_items:
+            item.draw(canvas, scale, self._images)
+        return canvas.convert('RGB')
+
+    def export_slide(self, index, output_path, width, height, filter_name="JPG"):
+        image_format = "JPEG" if filter_name.upper() in ("JPG", "JPEG") else filter_name.upper()
+        self.render(index, width, height).save(output_path, image_format)
+
+    def close_document(self):
+        # 编译结果保留在 _document 中，同一文件再次打开时直接复用
+        pass
+
+    def close(self):
+        self.prs = None
+        self._document = None
+        self._scenes = []
+
+
+def missing_font_reason():
+    """本机没有可用的中文字体时返回原因（与模板内容无关）"""
+    if fonts.fallback() is None:
+        return "没有找到可用的中文字体"
+    return None
+
+
+def unsupported_reason(ppt_path, check_fonts=True):
+    """检查演示文稿能否用原生渲染器导出，可以时返回 None，否则返回原因
+
+    check_fonts=False 时只检查模板内容，结果可以按模板缓存。
+    """
+    renderer = NativeRenderer()
+    try:
+        renderer.open(ppt_path)
+        # 页面中的字体需要能找到（至少有后备中文字体）
+        return missing_font_reason() if check_fonts else None
+    except UnsupportedTemplate as e:
+        return str(e)
+    finally:
+        renderer.close()
+
+
+class TextFormat:
+    """文本框第一段文字的格式（已按占位符、版式、母版逐级继承），自动缩小字号时用来量取文字
+
+    字号、字间距、左边距和首行缩进为磅，内边距为EMU；填充时每行文字都复制第一段的格式。
+    """
+
+    def __init__(self, size, latin, ea, bold=False, char_spacing=0.0, line_spacing=('pct', 1.0),
+                 space_before=None, space_after=None, margin_left=0.0, indent=0.0, font_scale=1.0,
+                 wrap=True, insets=DEFAULT_INSETS, auto_grow=False):
+        self.size = size
+        self.latin = latin
+        self.ea = ea
+        self.bold = bold
+        self.char_spacing = char_spacing
+        self.line_spacing = tuple(line_spacing)
+        self.space_before = tuple(space_before) if space_before else None
+        self.space_after = tuple(space_after) if space_after else None
+        self.margin_left = margin_left
+        self.indent = indent
+        # 文本框“溢出时缩小文字”的字号比例
+        self.font_scale = font_scale
+        self.wrap = wrap
+        self.insets = tuple(insets)
+        self.auto_grow = auto_grow
+
+    def layout(self, paragraphs, size, width, scale_y, wrap=None):
+        """按 size 磅排版 split_paragraphs 得到的段落，与渲染时的折行和行高一致
+
+        width 为可用宽度（像素），scale_y 为每EMU对应的像素数；返回的排版结果有 lines 和 height。
+        """
+        style = _TextStyle(
+            size * self.font_scale, self.bold, False, False, None, self.latin, self.ea, self.char_spacing
+        )
+        return _TextLayout(
+            [
+                _Paragraph('l', self.line_spacing, self.space_before, self.space_after,
+                           self.margin_left * EMU_PER_POINT, self.indent * EMU_PER_POINT,
+                           [(ch, style) for ch in chars], style)
+                for chars in paragraphs
+            ],
+            width, scale_y, self.wrap if wrap is None else wrap,
+        )
+
+
+def split_paragraphs(text):
+    """把填充的文本拆成段落（每行一段）的字符列表，去掉渲染时不绘制的零宽字符"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return [
+        [ch for ch in line.replace('\v', '\n') if ch not in _ZERO_WIDTH]
+        for line in text.split('\n')
+    ]
+
+
+def first_paragraph_format(slide, element):
+    """python-pptx页面上形状（p:sp 元素）第一段文字的 TextFormat
+
+    继承顺序与原生渲染器相同：文字块、段落、文本框列表样式、形状样式，占位符再依次继承版式和母版中的占位符、
+    母版的标题或正文样式，最后是演示文稿默认值。
+    """
+    layout = slide.slide_layout
+    master = layout.slide_master
+    presentation = slide.part.package.presentation_part._element
+    theme = _Theme(master)
+    body_prs, inherited_styles = _inherited_text(element, layout._element, master._element, presentation)
+
+    tx_body = _child(element, 'p:txBody')
+    body = _body_properties([_child(tx_body, 'a:bodyPr')] + body_prs)
+    list_styles = [_child(tx_body, 'a:lstStyle')] + inherited_styles
+    first_p = _child(tx_body, 'a:p')
+    pPr_chain = _paragraph_chain(_child(first_p, 'a:pPr'), list_styles)
+    # 与填充时一样取第一个文字块的格式，没有文字块时取段尾格式
+    rPr = _child(_child(first_p, 'a:r'), 'a:rPr')
+    if rPr is None:
+        rPr = _child(first_p, 'a:endParaRPr')
+    style = _run_style(rPr, pPr_chain, _child(_child(element, 'p:style'), 'a:fontRef'), theme)
+    paragraph = _paragraph_format(pPr_chain, body['spacing_reduction'])
+    return TextFormat(
+        style.size, style.latin, style.ea, bold=style.bold, char_spacing=style.spacing,
+        line_spacing=paragraph['line_spacing'], space_before=paragraph['space_before'],
+        space_after=paragraph['space_after'], margin_left=paragraph['margin_left'] / EMU_PER_POINT,
+        indent=paragraph['indent'] / EMU_PER_POINT, font_scale=body['font_scale'], wrap=body['wrap'],
+        insets=body['insets'], auto_grow=body['auto_grow'],
+    )
+
+
+RENDERER_BACKENDS['native'] = NativeRenderer
@@ -1,15 +1,27 @@
+# 最先导入：设置了 PPT_STARTUP_REPORT 时记录之后每个模块的导入耗时
+import startup_profile
+startup_profile.enable_from_env()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 import os
-import time
+import multiprocessing
+import queue
+import threading
 import traceback
-from copy import deepcopy
-from PIL import Image
-import comtypes.client
-import requests
-import win32gui
-import win32con
+# 启动时只导入标准库和轻量的设置模块；python-pptx、Pillow、requests、comtypes 等
+# 在窗口出现之后或第一次生成时才导入
+from job_settings import default_worker_count, SIZE_PRESETS, DEFAULT_SIZE_PRESET, FIT_MODES
+from template_hint import HintCache
+from app_logging import get_logger, setup_logging
+
+# 后台生成时界面刷新进度的间隔（毫秒）
+PROGRESS_POLL_INTERVAL = 100
+
+# 检查AI提问模板后台刷新结果的间隔（毫秒）
+HINT_POLL_INTERVAL = 200
+
+logger = get_logger(__name__)
 
 class ModernButton(tk.Button):
     def __init__(self, master, **kwargs):
@@ -56,6 +68,18 @@ class PPTGeneratorApp:
         center_y = int(screen_height/2 - window_height/2)
         self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
         
+        # 后台生成线程的状态：任务队列、进度队列和当前任务的取消标志
+        self.worker_thread = None
+        self.job_queue = queue.Queue()
+        self.progress_queue = queue.Queue()
+        self.cancel_event = None
+        self.generating = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # AI提问模板的本地缓存，后台刷新的结果通过队列交给界面线程
+        self.hint_cache = HintCache()
+        self.hint_queue = queue.Queue()
+        
         # 设置小红书风格主题（浅粉色背景）
         self.root.configure(bg='#FFF0F5')
         
@@ -362,15 +386,68 @@ class PPTGeneratorApp:
         )
         self.empty_value_entry.pack(padx=1, pady=1)
 
+        # 转换图片的并行进程数
+        workers_container = tk.Frame(settings_frame, bg='#FFFFFF')
+        workers_container.grid(row=3, column=0, columnspan=2, sticky='ew', pady=(0, 10))
+
+        tk.Label(
+            workers_container,
+            text="转换进程数：",
+            font=('Microsoft YaHei UI', 10),
+            fg='#333333',
+            bg='#FFFFFF',
+            anchor='w'
+        ).pack(side=tk.LEFT, padx=(0, 10))
+
+        workers_entry_container = tk.Frame(workers_container, bg='#E0E0E0', padx=1, pady=1)
+        workers_entry_container.pack(side=tk.LEFT)
+
+        self.render_workers_var = tk.StringVar(value=str(default_worker_count()))
+        tk.Entry(
+            workers_entry_container,
+            textvariable=self.render_workers_var,
+            font=('Microsoft YaHei UI', 10),
+            width=5,
+            relief='flat',
+            justify='center',
+            bg='#FFFFFF'
+        ).pack(padx=1, pady=1)
+
+        # 增量生成：只重新生成内容有变化的行
+        self.incremental_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            workers_container,
+            text="增量生成（只重新生成改动过的行）",
+            variable=self.incremental_var,
+            font=('Microsoft YaHei UI', 10),
+            fg='#333333',
+            bg='#FFFFFF',
+            activebackground='#FFE4E8',
+            selectcolor='#FFFFFF'
+        ).pack(side=tk.LEFT, padx=(20, 0))
+
+        # 自动缩小：内容超出文本框时缩小字号
+        self.auto_fit_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            workers_container,
+            text="自动缩小字号",
+            variable=self.auto_fit_var,
+            font=('Microsoft YaHei UI', 10),
+            fg='#333333',
+            bg='#FFFFFF',
+            activebackground='#FFE4E8',
+            selectcolor='#FFFFFF'
+        ).pack(side=tk.LEFT, padx=(20, 0))
+
         # 提示说明
         tip_label = tk.Label(
             settings_frame,
-            text='提示：内容中包含"#我的首图#"的文本会自动调整为上方设置的字体大小',
+            text='提示：内容中包含"#我的首图#"的文本使用上方设置的字体大小；内容放不下时会自动缩小字号',
             font=('Microsoft YaHei UI', 9),
             fg='#666666',
             bg='#FFFFFF'
         )
-        tip_label.grid(row=3, column=0, columnspan=2, sticky='w', pady=(10, 0))
+        tip_label.grid(row=4, column=0, columnspan=2, sticky='w', pady=(10, 0))
 
     def create_scale_frame(self):
         scale_frame = tk.LabelFrame(
@@ -390,32 +467,10 @@ class PPTGeneratorApp:
         container.pack(expand=True, fill=tk.X, padx=15)
         
         # 预设尺寸选项
-        size_options = [
-            "自定义尺寸",
-            "小红书封面（竖版）- 1080×1440",
-            "小红书封面（横版）- 1440×1080",
-            "小红书封面（方版）- 1080×1080",
-            "小红书图文封面（竖版）- 1242×1660",
-            "小红书图文封面（方版）- 1080×1080",
-            "小红书图文封面（横版）- 2560×1440",
-            "抖音视频封面 - 1080×1920",
-            "抖音预览封面 - 1080×1464",
-            "抖音个人主页背景 - 1125×633"
-        ]
+        size_options = list(SIZE_PRESETS)
         
         # 尺寸映射字典
-        self.size_mapping = {
-            "自定义尺寸": None,
-            "小红书封面（竖版）- 1080×1440": (1080, 1440),
-            "小红书封面（横版）- 1440×1080": (1440, 1080),
-            "小红书封面（方版）- 1080×1080": (1080, 1080),
-            "小红书图文封面（竖版）- 1242×1660": (1242, 1660),
-            "小红书图文封面（方版）- 1080×1080": (1080, 1080),
-            "小红书图文封面（横版）- 2560×1440": (2560, 1440),
-            "抖音视频封面 - 1080×1920": (1080, 1920),
-            "抖音预览封面 - 1080×1464": (1080, 1464),
-            "抖音个人主页背景 - 1125×633": (1125, 633)
-        }
+        self.size_mapping = SIZE_PRESETS
         
         # 创建居中容器
         center_frame = tk.Frame(container, bg='#FFFFFF')
@@ -449,7 +504,7 @@ class PPTGeneratorApp:
             padding=8
         )
         
-        self.size_var = tk.StringVar(value="小红书图文封面（竖版）- 1242×1660")
+        self.size_var = tk.StringVar(value=DEFAULT_SIZE_PRESET)
         size_combo = ttk.Combobox(
             combo_container,
             textvariable=self.size_var,
@@ -558,6 +613,67 @@ class PPTGeneratorApp:
         self.width_entry.config(state='disabled')
         self.height_entry.config(state='disabled')
 
+        # 第三行：同时输出的其他尺寸（多选）和比例不同时的处理方式
+        extra_center_frame = tk.Frame(container, bg='#FFFFFF')
+        extra_center_frame.pack(anchor='center', pady=(10, 0))
+
+        extra_frame = tk.Frame(extra_center_frame, bg='#FFFFFF')
+        extra_frame.pack(side=tk.LEFT, padx=(0, 30))
+
+        tk.Label(
+            extra_frame,
+            text="同时输出其他尺寸:",
+            font=('Microsoft YaHei UI', 10),
+            fg='#333333',
+            bg='#FFFFFF'
+        ).pack(side=tk.LEFT, anchor='n', padx=(0, 8))
+
+        extra_list_container = tk.Frame(extra_frame, bg='#E0E0E0', padx=1, pady=1)
+        extra_list_container.pack(side=tk.LEFT)
+
+        self.extra_size_names = [name for name, size in SIZE_PRESETS.items() if size is not None]
+        self.extra_size_list = tk.Listbox(
+            extra_list_container,
+            listvariable=tk.StringVar(value=self.extra_size_names),
+            selectmode=tk.MULTIPLE,
+            exportselection=False,
+            height=4,
+            width=32,
+            font=('Microsoft YaHei UI', 9),
+            relief='flat',
+            bg='#FFFFFF',
+            selectbackground='#FF2442'
+        )
+        self.extra_size_list.pack(padx=1, pady=1)
+
+        fit_frame = tk.Frame(extra_center_frame, bg='#FFFFFF')
+        fit_frame.pack(side=tk.LEFT, anchor='n')
+
+        tk.Label(
+            fit_frame,
+            text="比例不同时:",
+            font=('Microsoft YaHei UI', 10),
+            fg='#333333',
+            bg='#FFFFFF'
+        ).pack(side=tk.LEFT, padx=(0, 8))
+
+        fit_combo_container = tk.Frame(fit_frame, bg='#E0E0E0', padx=1, pady=1)
+        fit_combo_container.pack(side=tk.LEFT)
+
+        # 默认：只输出一种尺寸时拉伸（与原来一致），同时输出多种尺寸时居中裁剪
+        self.fit_options = {"自动": None}
+        self.fit_options.update({label: mode for mode, label in FIT_MODES.items()})
+        self.fit_var = tk.StringVar(value="自动")
+        ttk.Combobox(
+            fit_combo_container,
+            textvariable=self.fit_var,
+            values=list(self.fit_options),
+            state='readonly',
+            width=8,
+            font=('Microsoft YaHei UI', 10),
+            style='Rounded.TCombobox'
+        ).pack(padx=1, pady=1)
+
     def on_size_selected(self, event):
         """处理尺寸选择事件"""
         selected = self.size_var.get()
@@ -688,26 +804,13 @@ class PPTGeneratorApp:
         )
         template_text.pack(fill=tk.X, expand=True)
         
-        # 获取模板内容
-        try:
-            response = requests.get('https://webapi.mymaskking.us.kg/get_ai_template_hint', timeout=5)  # 添加5秒超时
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 200:
-                    template_content = data['data']['templates']
-                else:
-                    raise Exception('API返回状态错误')
-            else:
-                raise Exception('HTTP请求失败')
-        except requests.Timeout:
-            print("获取模板内容超时")
-            template_content = """请帮我查找关于"今日的科技新闻"的内容，生成的格式为表格，有三列：标题，内容,并且帮我生成150字的小红书爆文，要求爆文标题和爆文内容足够吸引人眼球，里面可以插入一些表情"""
-        except Exception as e:
-            print(f"获取模板内容失败: {str(e)}")
-            template_content = """请帮我查找关于"今日的科技新闻"的内容，生成的格式为表格，有三列：标题，内容,并且帮我生成150字的小红书爆文，要求爆文标题和爆文内容足够吸引人眼球，里面可以插入一些表情"""
-        
-        template_text.insert('1.0', template_content)
+        # 先显示本地缓存的模板内容（没有缓存时显示默认模板），不等待网络；
+        # 缓存过期时在后台线程重新验证，有新内容时再更新文本框
+        template_text.insert('1.0', self.hint_cache.content())
         template_text.config(state='disabled')
+        self.template_text = template_text
+        self.hint_thread = self.hint_cache.refresh_in_background(self.hint_queue.put)
+        self.root.after(HINT_POLL_INTERVAL, self._poll_hint_queue)
 
         # 创建复制按钮
         copy_button = tk.Label(
@@ -740,6 +843,21 @@ class PPTGeneratorApp:
         copy_button.bind('<Enter>', on_enter)
         copy_button.bind('<Leave>', on_leave)
 
+    def _poll_hint_queue(self):
+        """后台刷新得到新的模板内容时原地更新文本框，刷新结束后停止轮询"""
+        # 先检查线程是否还在运行再取队列：线程结束前放入的内容一定能在这次取到
+        alive = self.hint_thread.is_alive()
+        try:
+            content = self.hint_queue.get_nowait()
+        except queue.Empty:
+            if alive:
+                self.root.after(HINT_POLL_INTERVAL, self._poll_hint_queue)
+            return
+        self.template_text.config(state='normal')
+        self.template_text.delete('1.0', tk.END)
+        self.template_text.insert('1.0', content)
+        self.template_text.config(state='disabled')
+
     def copy_template(self, text_widget):
         """复制文本框内容到剪贴板"""
         self.root.clipboard_clear()
@@ -785,281 +903,166 @@ class PPTGeneratorApp:
             # 只设置文件夹路径
             self.save_path.set(dirname)
 
-    def convert_ppt_to_images(self, ppt_path, batch_size=50):
-        try:
-            # 获取用户设置的尺寸
-            width = int(self.width_var.get())
-            height = int(self.height_var.get())
-            
-            # 获取文件名（不含扩展名）作为文件夹名
-            base_name = os.path.splitext(os.path.basename(ppt_path))[0]
-            
-            # 创建与PPT同名的文件夹
-            ppt_dir = os.path.dirname(ppt_path)
-            images_dir = os.path.join(ppt_dir, base_name)
-            if not os.path.exists(images_dir):
-                os.makedirs(images_dir)
-
-            # 启动 WPS 应用程序
-            wps = comtypes.client.CreateObject("KWPP.Application")
-            wps.Visible = True
-            
-            try:
-                # 打开PPT文件
-                ppt = wps.Presentations
-                presentation = ppt.Open(os.path.abspath(ppt_path))
-                
-                slide_count = presentation.Slides.Count
-                for batch_start in range(0, slide_count, batch_size):
-                    for i in range(batch_start, min(batch_start + batch_size, slide_count)):
-                        slide = presentation.Slides.Item(i + 1)
-                        # 生成输出文件路径
-                        output_path = os.path.join(images_dir, f"{base_name}_第{i+1}页.jpg")
-                        
-                        # 导出当前幻灯片为JPG格式
-                        slide.Export(output_path, "JPG", width, height)  # 添加宽度和高度参数
-                        print(f"已将幻灯片 {i + 1} 保存为 {output_path}")
-                        
-                        # 使用Pillow确保图片质量和尺寸
-                        img = Image.open(output_path)
-                        img = img.resize((width, height), Image.Resampling.LANCZOS)  # 使用高质量的重采样方法
-                        img.save(output_path, "JPEG", quality=95, dpi=(300, 300))
-                    
-                    print(f"已处理第{batch_start + 1}到{min(batch_start + batch_size, slide_count)}张幻灯片")
-                
-                return images_dir
-                
-            finally:
-                # 清理资源
-                try:
-                    if 'presentation' in locals():
-                        presentation.Close()
-                    if 'wps' in locals():
-                        wps.Quit()
-                except:
-                    pass
-                
-        except Exception as e:
-            raise Exception(f"转换图片时出错: {str(e)}")
-
     def update_progress(self, value, message):
-        """更新进度条和进度信息"""
+        """更新进度条和进度信息（只能在界面线程中调用）"""
         self.progress_var.set(value)
         self.progress_label.config(text=message)
-        self.root.update()
 
     def generate_ppt(self):
+        # 生成过程中再次点击按钮表示取消
+        if self.generating:
+            self.cancel_generation()
+            return
+
+        from generator import GenerationJob
+
         try:
-            # 初始化进度
-            self.update_progress(0, "开始处理...")
-            
+            job = GenerationJob(
+                template_path=self.ppt_path.get(),
+                excel_path=self.excel_path.get(),
+                save_dir=self.save_path.get(),  # 现在这是文件夹路径
+                width=self.width_var.get(),
+                height=self.height_var.get(),
+                first_image_font_size=self.font_size_var.get(),
+                empty_value=self.empty_value_var.get(),
+                render_workers=int(self.render_workers_var.get()),
+                incremental=self.incremental_var.get(),
+                auto_fit=self.auto_fit_var.get(),
+                extra_sizes=[
+                    SIZE_PRESETS[self.extra_size_names[i]] for i in self.extra_size_list.curselection()
+                ],
+                fit_mode=self.fit_options[self.fit_var.get()]
+            )
+
             # 验证文件路径
-            if not self.ppt_path.get():
-                messagebox.showerror("错误", "请选择PPT模板文件")
-                return
-            if not self.excel_path.get():
-                messagebox.showerror("错误", "请选择Excel数据文件")
-                return
-            if not self.save_path.get():
-                messagebox.showerror("错误", "请选择保存位置")
-                return
-            
-            # 验证文件是否存在
-            if not os.path.exists(self.ppt_path.get()):
-                messagebox.showerror("错误", "PPT模板文件不存在")
-                return
-            if not os.path.exists(self.excel_path.get()):
-                messagebox.showerror("错误", "Excel数据文件不存在")
-                return
-            
-            # 验证保存路径的文件夹是否存在
-            save_dir = self.save_path.get()  # 现在这是文件夹路径
-            if not os.path.exists(save_dir):
-                messagebox.showerror("错误", "保存文件夹不存在")
-                return
-
-            # 生成完整的保存路径（添加文件名）
-            current_time = time.strftime("%Y%m%d_%H%M%S")
-            save_filename = f"小红书图文_{current_time}.pptx"
-            full_save_path = os.path.join(save_dir, save_filename)
-
-            self.update_progress(10, "读取Excel文件...")
-            # 读取Excel文件，跳过空行，将 NA 值替换为空格
-            df = pd.read_excel(self.excel_path.get()).dropna(how='all')
-            # 将所有的 NA 值替换为空格
-            df = df.fillna(' ')
-            
-            # 打印数据行数信息，用于调试
-            print(f"总行数: {len(df)}")
-            print(f"所有数据: {df.values.tolist()}")
-            
-            # 获取数据总行数
-            total_rows = len(df)
-            
-            self.update_progress(20, "加载PPT模板...")
+            job.validate()
+        except ValueError as validate_error:
+            messagebox.showerror("错误", str(validate_error))
+            return
+
+        # 交给后台线程生成，进度通过队列传回界面线程
+        if self.worker_thread is None:
+            self.worker_thread = threading.Thread(target=self._generation_worker, daemon=True)
+            self.worker_thread.start()
+        self.cancel_event = threading.Event()
+        self.generating = True
+        self.generate_button.config(text="取消生成")
+        self.update_progress(0, "开始处理...")
+        self.job_queue.put((job, self.cancel_event))
+        self.root.after(PROGRESS_POLL_INTERVAL, self._poll_progress_queue)
+
+    def cancel_generation(self):
+        """请求取消正在进行的生成任务"""
+        self.cancel_event.set()
+        self.generate_button.config(text="正在取消...")
+
+    def _generation_worker(self):
+        """后台线程：依次执行队列中的生成任务，WPS实例在任务之间常驻复用"""
+        from generator import PPTGenerator, GenerationCancelled
+        from slide_renderer import com_apartment
+
+        def on_progress(value, message):
+            self.progress_queue.put(('progress', value, message))
+
+        with com_apartment():
+            generator = PPTGenerator(progress_callback=on_progress)
             try:
-                # 创建 WPS 实例
-                wps = comtypes.client.CreateObject("KWPP.Application")
-                wps.Visible = True  # 需要保持True，否则可能出错
-                
-                # 最小化 WPS 窗口
-                self.root.after(1000)
-                
-                # 查找 WPS 窗口并最小化
-                def callback(hwnd, extra):
-                    if win32gui.IsWindowVisible(hwnd):
-                        title = win32gui.GetWindowText(hwnd)
-                        if 'WPS' in title or 'Presentation' in title:
-                            win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
-                
-                win32gui.EnumWindows(callback, None)
-                
-                # 打开PPT文件
-                ppt = wps.Presentations
-                template = ppt.Open(os.path.abspath(self.ppt_path.get()))
-                
-                # 复制整个模板文件到新位置
-                template.SaveAs(full_save_path)
-                template.Close()  # 关闭模板文件
-                
-                # 打开新保存的文件进行编辑
-                new_ppt = ppt.Open(full_save_path)
-                
-                # 获取单选按钮的值
-                has_title = self.radio_var1.get() == "option1"
-                unified_title = self.radio_var2.get() == "option2"
-                
-                # 获取第一页作为模板页（不删除它）
-                template_slide = new_ppt.Slides(1)
-                
-                # 获取模板页面的背景属性
-                template_background = template_slide.Background
-                template_fill = template_background.Fill
-                template_fore_color = template_fill.ForeColor.RGB
-                template_back_color = template_fill.BackColor.RGB
-                print(f"模板页面背景色信息:")
-                print(f"- 填充类型: {template_fill.Type}")
-                print(f"- 前景色: {template_fore_color}")
-                print(f"- 背景色: {template_back_color}")
-                old_font_size = None
-                # 在处理每个形状之前，先保存模板页面的字号信息
-                template_font_sizes = {}
-                for shape in template_slide.Shapes:
+                while True:
+                    item = self.job_queue.get()
+                    if item is None:
+                        break
+                    job, generator.cancel_event = item
                     try:
-                        if shape.HasTextFrame:
-                            template_font_sizes[shape.Name] = shape.TextFrame.TextRange.Font.Size
-                    except:
-                        continue
-
-                # 遍历Excel的每一行数据（包括第一行）
-                for i in range(len(df)):
-                    progress = 20 + (i / total_rows * 40)
-                    self.update_progress(progress, f"正在处理第 {i + 1} 行数据...")
-                    
-                    # 获取当前行数据
-                    row = df.iloc[i]
-                    
-                    if i > 0:  # 第一页已经存在，只为后续数据创建新页面
-                        # 复制第一页
-                        new_ppt.Application.ActiveWindow.View.GotoSlide(1)  # 跳转到第一页
-                        template_slide.Copy()  # 复制第一页
-                        new_slide = new_ppt.Slides.Paste()  # 粘贴到末尾
-                        
-                        # 设置新页面的背景色，确保与模板一致
-                        new_background = new_slide.Background
-                        new_fill = new_background.Fill
-                        new_fill.ForeColor.RGB = template_fore_color
-                        new_fill.BackColor.RGB = template_back_color
-                        
-                        # 检查新页面的背景色
-                        try:
-                            print(f"\n第 {i+1} 页背景色信息:")
-                            print(f"- 填充类型: {new_fill.Type}")
-                            print(f"- 前景色: {new_fill.ForeColor.RGB}")
-                            print(f"- 背景色: {new_fill.BackColor.RGB}")
-                        except Exception as bg_error:
-                            print(f"获取新页面背景色信息出错: {str(bg_error)}")
-                    else:
-                        # 使用第一页
-                        new_slide = template_slide
-                    
-                    # 遍历所有形状并更新文本内容
-                    for shape in new_slide.Shapes:
-                        try:
-                            if shape.HasTextFrame:
-                                shape_name = shape.Name
-                                print(f"处理形状: {shape_name}")
-                                
-                                if shape_name in df.columns:
-                                    # 获取内容
-                                    content = str(row[shape_name]).strip()
-                                    if not content or content.lower() == 'nan':
-                                        content = self.empty_value_var.get()
-                                    
-                                    # 从保存的模板中获取原始字号
-                                    original_font_size = template_font_sizes.get(shape_name, shape.TextFrame.TextRange.Font.Size)
-                                    print(f"原始字号: {original_font_size}")
-                                    
-                                    # 只有当内容包含"#我的首图#"时才设置字号
-                                    if "#我的首图#" in content:
-                                        print(f"检测到'#我的首图#'，设置字号为{self.font_size_var.get()}")
-                                        shape.TextFrame.TextRange.Font.Size = int(self.font_size_var.get())
-                                        content = content.replace("#我的首图#", "")
-                                        print(f"已设置字号为{self.font_size_var.get()}，内容: {content}")
-                                    else:
-                                        # 其他内容使用模板中的原始字号
-                                        shape.TextFrame.TextRange.Font.Size = original_font_size
-                                        print(f"普通内容，使用原始字号: {original_font_size}")
-                                    
-                                    # 设置文本内容
-                                    shape.TextFrame.TextRange.Text = content
-                        except Exception as shape_error:
-                            print(f"处理形状时出错: {str(shape_error)}")
-                            continue
-                
-                self.update_progress(60, "保存PPT文件...")
-                # 保存新的PPT文件
-                new_ppt.SaveAs(full_save_path)
-                
-                self.update_progress(70, "转换为图片...")
-                images_dir = self.convert_ppt_to_images(full_save_path)
-                
-                self.update_progress(90, "清理资源...")
-                # 关闭文件和应用程序
-                try:
-                    new_ppt.Close()
-                    wps.Quit()
-                except:
-                    pass
-                
-                self.update_progress(95, "打开生成的文件...")
-                try:
-                    os.startfile(full_save_path)
-                    os.startfile(images_dir)
-                except Exception as open_error:
-                    print(f"打开文件失败: {str(open_error)}")
-                
-                self.update_progress(100, "处理完成！")
-                messagebox.showinfo("成功", "PPT生成完成！图片已保存到images文件夹")
-                
+                        result = generator.run(job)
+                        self.progress_queue.put(('done', result))
+                    except GenerationCancelled:
+                        self.progress_queue.put(('cancelled',))
+                    except Exception as e:
+                        logger.error("生成失败: %s", e, exc_info=True)
+                        self.progress_queue.put(('error', e, traceback.format_exc()))
             finally:
-                # 清理资源
-                try:
-                    if 'new_ppt' in locals():
-                        new_ppt.Close()
-                    if 'wps' in locals():
-                        wps.Quit()
-                except:
-                    pass
-                
-        except Exception as e:
+                generator.close()
+
+    def on_close(self):
+        """关闭窗口：取消正在进行的任务，退出常驻的WPS实例"""
+        if self.worker_thread is not None:
+            if self.cancel_event is not None:
+                self.cancel_event.set()
+            self.job_queue.put(None)
+            self.worker_thread.join(timeout=10)
+        self.root.destroy()
+
+    def _poll_progress_queue(self):
+        """按固定间隔取出队列中的消息，只刷新最新的进度"""
+        latest_progress = None
+        finished = None
+        while True:
+            try:
+                message = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'progress':
+                latest_progress = message
+            else:
+                finished = message
+
+        if latest_progress is not None:
+            self.update_progress(latest_progress[1], latest_progress[2])
+
+        if finished is None:
+            self.root.after(PROGRESS_POLL_INTERVAL, self._poll_progress_queue)
+            return
+
+        self.generating = False
+        self.generate_button.config(text="开始生成")
+
+        if finished[0] == 'done':
+            result = finished[1]
+            self.update_progress(95, "打开生成的文件...")
+            try:
+                os.startfile(result.ppt_path)
+                os.startfile(result.images_dir)
+            except Exception as open_error:
+                logger.warning("打开文件失败: %s", open_error)
+
+            self.update_progress(100, "处理完成！")
+            if result.failed_slides:
+                pages = "、".join(str(page) for page in sorted(result.failed_slides))
+                messagebox.showwarning(
+                    "部分页面导出失败",
+                    f"PPT生成完成，但第 {pages} 页多次导出失败（详见日志），其余图片已保存到images文件夹。\n"
+                    "再次生成同一个任务时只会重新导出这些页面。"
+                )
+            else:
+                messagebox.showinfo("成功", "PPT生成完成！图片已保存到images文件夹")
+        elif finished[0] == 'cancelled':
+            self.update_progress(0, "已取消")
+        else:
             self.update_progress(0, "处理出错")
-            messagebox.showerror("错误", f"生成过程中出现错误：{str(e)}\n{traceback.format_exc()}")
+            messagebox.showerror("错误", f"生成过程中出现错误：{str(finished[1])}\n{finished[2]}")
+
+def preload_generation_modules():
+    """窗口出现后在后台线程导入生成流程用到的模块，第一次点击生成时不必等待"""
+    def load():
+        try:
+            import generator
+        except Exception as e:
+            logger.warning("预先导入生成模块失败: %s", e, exc_info=True)
+
+    threading.Thread(target=load, daemon=True).start()
+
 
 def main():
+    # 打包后的窗口程序没有控制台，日志只写入文件
+    setup_logging()
     root = tk.Tk()
-    app = PPTGeneratorApp(root)
+    PPTGeneratorApp(root)
+    # 窗口绘制完成后输出启动报告（设置了 PPT_STARTUP_REPORT 时），然后在后台预先导入生成模块
+    root.after_idle(startup_profile.write_report)
+    root.after_idle(preload_generation_modules)
     root.mainloop()
 
 if __name__ == "__main__":
+    # 打包后的exe中启动渲染子进程需要
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -14,8 +14,11 @@ a = Analysis(
         'comtypes',
         'win32com',
         'win32com.client',
+        'win32process',
         'pythoncom',
         'openpyxl',
+        'pptx',
+        'lxml',
         'tkinter',
         'tkinter.ttk',
         'tkinter.filedialog',
@@ -0,0 +1,127 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+
+from app_logging import get_logger
+from job_settings import app_cache_dir
+
+# 缓存容量上限（MB），环境变量 PPT_RENDER_CACHE_MB 可以修改，0 表示不使用缓存
+RENDER_CACHE_MB_ENV = 'PPT_RENDER_CACHE_MB'
+DEFAULT_RENDER_CACHE_MB = 1024
+
+# 超过上限时按最近最少使用淘汰到上限的这个比例，避免每次写入都要淘汰
+EVICT_TARGET_RATIO = 0.9
+
+logger = get_logger(__name__)
+
+
+def default_cache_dir():
+    """渲染缓存的保存位置"""
+    return app_cache_dir('renders')
+
+
+def default_max_bytes():
+    try:
+        megabytes = float(os.environ.get(RENDER_CACHE_MB_ENV, DEFAULT_RENDER_CACHE_MB))
+    except ValueError:
+        megabytes = DEFAULT_RENDER_CACHE_MB
+    return int(megabytes * 1024 * 1024)
+
+
+def image_key(row_key, backend, width, height, image_format='jpg'):
+    """一张输出图片的缓存键：页面的键（模板内容、绑定的单元格、字号和尺寸等设置）加上渲染后端和输出尺寸、格式"""
+    payload = f"{row_key}|{backend}|{width}x{height}|{image_format}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """跨任务的渲染结果缓存：图片按内容键保存在本地文件夹，索引（大小、最近使用时间）保存在SQLite中
+
+    总大小超过 max_bytes 时删除最久未使用的图片。只在主进程中使用，渲染子进程不访问缓存。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self._db = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), timeout=30)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._db.commit()
+        return self._db
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def fetch(self, keys, dest_paths):
+        """把 keys 对应的缓存图片复制到 dest_paths；只有全部命中时才复制并返回 True"""
+        db = self._connect()
+        placeholders = ','.join('?' * len(keys))
+        found = {
+            key for (key,) in db.execute(f"SELECT key FROM entries WHERE key IN ({placeholders})", keys)
+        }
+        if len(found) < len(set(keys)) or not all(os.path.exists(self._path(key)) for key in keys):
+            return False
+        for key, dest_path in zip(keys, dest_paths):
+            shutil.copyfile(self._path(key), dest_path)
+        db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(time.time(), key) for key in keys])
+        db.commit()
+        return True
+
+    def store(self, keys, src_paths):
+        """把刚导出的图片加入缓存"""
+        db = self._connect()
+        rows = []
+        for key, src_path in zip(keys, src_paths):
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，中断时不会留下不完整的缓存图片
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            shutil.copyfile(src_path, temp_path)
+            os.replace(temp_path, path)
+            rows.append((key, os.path.getsize(path), time.time()))
+        db.executemany("INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)", rows)
+        db.commit()
+
+    def total_bytes(self):
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """总大小超过上限时按最近最少使用删除，返回删除的图片数"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        db = self._connect()
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        removed = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append((key,))
+        db.executemany("DELETE FROM entries WHERE key = ?", removed)
+        db.commit()
+        logger.info("渲染缓存超过上限，删除了 %d 张最久未使用的图片", len(removed))
+        return len(removed)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,481 @@
+import queue
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import com_trace
+from app_logging import get_logger, setup_logging
+from stage_timer import StageTimer
+from slide_renderer import (
+    RendererPool, POSTPROCESS_THREADS, POSTPROCESS_QUEUE_SIZE, _export, _postprocess,
+    count_slides, split_slide_batches, terminate_process
+)
+
+# 每种操作的期限（秒）：WPS弹出对话框或卡死时调用会一直不返回，超过期限就结束渲染子进程（和它启动的WPS）
+OPEN_TIMEOUT = 120
+EXPORT_TIMEOUT = 60
+
+# 一页最多尝试导出的次数，仍然失败时记入失败列表，不中断其他页面
+MAX_SLIDE_ATTEMPTS = 3
+
+# 结束子进程后等待它退出的时间
+KILL_JOIN_TIMEOUT = 10
+
+logger = get_logger(__name__)
+
+
+class RenderWorkerError(Exception):
+    """渲染子进程中的操作失败"""
+
+
+class RenderTimeout(RenderWorkerError):
+    """操作超过期限没有完成"""
+
+
+class RenderWorkerCrashed(RenderWorkerError):
+    """渲染子进程异常退出"""
+
+
+class Watchdog:
+    """看门狗：with 块超过 timeout 秒还没结束时调用 on_timeout（例如结束WPS进程，让阻塞的COM调用出错返回），
+    之后 with 块以 RenderTimeout 结束
+
+    用于不能放到子进程中的调用（WPS填充时的 Open、SaveAs、Save）。
+    """
+
+    def __init__(self, timeout, on_timeout, name):
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.name = name
+        self.expired = False
+        self._timer = None
+
+    def _expire(self):
+        self.expired = True
+        logger.error("%s 超过 %s 秒没有完成，强制结束", self.name, self.timeout)
+        self.on_timeout()
+
+    def __enter__(self):
+        self._timer = threading.Timer(self.timeout, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._timer.cancel()
+        if self.expired:
+            raise RenderTimeout(f"{self.name} 超过 {self.timeout} 秒没有完成") from exc
+        return False
+
+
+class _WorkerSession:
+    """渲染子进程中的状态：常驻的渲染器、导出用的临时文件夹和后处理线程"""
+
+    def __init__(self, backend, max_documents, postprocess_threads):
+        self.pool = RendererPool(backend, max_documents)
+        self.renderer = None
+        self.temp_dir = tempfile.mkdtemp(prefix="slide_export_")
+        self.postprocess = None
+        if postprocess_threads > 0:
+            self.postprocess = ThreadPoolExecutor(max_workers=postprocess_threads, thread_name_prefix='postprocess')
+        # [(页码, 后处理 future)]
+        self.pending = deque()
+        self.timer = StageTimer()
+        # 后处理失败的页面 {页码: 原因}
+        self.failures = {}
+
+    def open(self, ppt_path):
+        """打开演示文稿，返回 (页数, 渲染器的应用进程号)"""
+        if self.renderer is None:
+            self.renderer = self.pool.acquire()
+        try:
+            with com_trace.stage('open'):
+                self.renderer.open(ppt_path)
+            return self.renderer.slide_count(), self.renderer.process_id
+        except Exception:
+            self.pool.release(self.renderer, failed=True)
+            self.renderer = None
+            raise
+
+    def export(self, index, base_name, outputs, size):
+        """导出一页；后处理交给后台线程，结果在 flush() 时汇总"""
+        if self.renderer is None:
+            raise RenderWorkerError("没有打开演示文稿")
+        export_path = _export(self.renderer, index, size, self.temp_dir, self.timer)
+        if self.postprocess is None:
+            try:
+                self.timer.merge(_postprocess(export_path, index, base_name, outputs))
+            except Exception as e:
+                self.failures[index] = f"后处理失败: {e}"
+            return
+        self.pending.append((index, self.postprocess.submit(_postprocess, export_path, index, base_name, outputs)))
+        # 背压：排队的页面达到上限时等待最早的一页处理完
+        while len(self.pending) >= POSTPROCESS_QUEUE_SIZE:
+            self._wait_oldest()
+
+    def _wait_oldest(self):
+        index, future = self.pending.popleft()
+        try:
+            self.timer.merge(future.result())
+        except Exception as e:
+            self.failures[index] = f"后处理失败: {e}"
+
+    def flush(self):
+        """等待已导出的页面写完，返回 (阶段耗时, 后处理失败的页面, COM调用记录)"""
+        while self.pending:
+            self._wait_oldest()
+        stats, failures = self.timer.as_dict(), self.failures
+        self.timer = StageTimer()
+        self.failures = {}
+        return stats, failures, com_trace.drain()
+
+    def release(self):
+        """任务结束：关闭文档，渲染器留在会话池中给下一个任务"""
+        self.flush()
+        if self.renderer is not None:
+            self.pool.release(self.renderer)
+            self.renderer = None
+
+    def close(self):
+        if self.postprocess is not None:
+            self.postprocess.shutdown(wait=True)
+        if self.renderer is not None:
+            self.pool.release(self.renderer, failed=True)
+            self.renderer = None
+        self.pool.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+def _worker_main(conn, backend, max_documents, postprocess_threads):
+    """渲染子进程的主循环：接收 (命令, 参数...)，回复 ('ok', 结果) 或 ('error', 原因)，收到 None 时退出"""
+    # 子进程只输出到控制台（级别从环境变量读取），日志文件由主进程独占
+    setup_logging(log_file=False)
+    com_trace.enable_from_env()
+    session = _WorkerSession(backend, max_documents, postprocess_threads)
+    handlers = {
+        'open': session.open,
+        'export': session.export,
+        'flush': session.flush,
+        'release': session.release,
+    }
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            command, args = message[0], message[1:]
+            try:
+                result = handlers[command](*args)
+            except Exception as e:
+                logger.debug("渲染子进程执行 %s 出错", command, exc_info=True)
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+            else:
+                conn.send(('ok', result))
+    finally:
+        session.close()
+
+
+class RenderWorker:
+    """主进程中对一个渲染子进程的监督：发送命令并按期限等待回复
+
+    超时或子进程异常退出时结束子进程和它启动的WPS，下次调用时重新启动。
+    同一个 RenderWorker 同一时间只能由一个线程使用。
+    """
+
+    def __init__(self, backend='wps', max_documents=50, postprocess_threads=POSTPROCESS_THREADS):
+        self.backend = backend
+        self.max_documents = max_documents
+        self.postprocess_threads = postprocess_threads
+        self.process = None
+        self.conn = None
+        # 子进程中渲染器的应用进程号（WPS），结束子进程时一起结束
+        self.app_pid = None
+        # 子进程当前打开的演示文稿
+        self.opened_path = None
+        self.restarts = 0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        if self.process is not None:
+            self.kill()
+            self.restarts += 1
+            logger.warning("重新启动渲染子进程（第%d次）", self.restarts)
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.backend, self.max_documents, self.postprocess_threads),
+            name=f"render-{self.backend}",
+            daemon=True,
+        )
+        self.process.start()
+        # 只保留子进程持有的一端，子进程退出时主进程这端能读到 EOF
+        child_conn.close()
+
+    def call(self, message, timeout):
+        """发送一条命令并等待结果；超时或子进程退出时结束子进程并抛出 RenderTimeout / RenderWorkerCrashed"""
+        self.start()
+        try:
+            self.conn.send(message)
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise RenderTimeout(f"{message[0]} 超过 {timeout} 秒没有完成")
+            status, result = self.conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise RenderWorkerCrashed(f"渲染子进程异常退出（退出码 {self.process.exitcode}）")
+        if status == 'error':
+            raise RenderWorkerError(result)
+        return result
+
+    def open(self, ppt_path, timeout=OPEN_TIMEOUT):
+        """确保子进程打开了 ppt_path（重启后重新打开）"""
+        if self.running and self.opened_path == ppt_path:
+            return
+        self.opened_path = None
+        _, self.app_pid = self.call(('open', ppt_path), timeout)
+        self.opened_path = ppt_path
+
+    def release(self, timeout=OPEN_TIMEOUT):
+        """任务结束时关闭文档，子进程和渲染器保留给下一个任务"""
+        if not self.running:
+            return
+        try:
+            self.call(('release',), timeout)
+        except RenderWorkerError as e:
+            logger.warning("关闭渲染子进程中的文档失败: %s", e)
+        self.opened_path = None
+
+    def kill(self):
+        """强制结束子进程和它启动的应用"""
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(KILL_JOIN_TIMEOUT)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.app_pid is not None:
+            terminate_process(self.app_pid)
+            self.app_pid = None
+        self.opened_path = None
+
+    def shutdown(self):
+        """正常退出子进程（关闭渲染器），没有及时退出时强制结束"""
+        if self.running:
+            try:
+                self.conn.send(None)
+                self.process.join(KILL_JOIN_TIMEOUT)
+            except OSError as e:
+                logger.debug("通知渲染子进程退出失败: %s", e)
+        self.kill()
+        self.process = None
+
+
+class _RenderRun:
+    """一次 render() 中各监督线程共享的状态：待导出的页面队列和交给主线程的结果"""
+
+    def __init__(self, pages, max_attempts):
+        self.condition = threading.Condition()
+        # [(页码, 已失败的次数)]
+        self.queue = deque((page, 0) for page in pages)
+        # 还没有结果（成功或最终失败）的页数
+        self.outstanding = len(self.queue)
+        self.max_attempts = max_attempts
+        self.stopped = False
+        # (完成的页码, {失败页码: 原因}, 阶段耗时, COM调用记录)，监督线程出错时为异常对象
+        self.events = queue.Queue()
+
+    def take(self, count):
+        """取出最多 count 页；队列暂时为空但其他线程的页面还可能重试时等待，全部有结果后返回空列表"""
+        with self.condition:
+            while not self.queue and self.outstanding and not self.stopped:
+                self.condition.wait()
+            if self.stopped:
+                return []
+            batch = []
+            while self.queue and len(batch) < count:
+                batch.append(self.queue.popleft())
+            return batch
+
+    def requeue(self, tasks):
+        if tasks:
+            with self.condition:
+                self.queue.extend(tasks)
+                self.condition.notify_all()
+
+    def attempt_failed(self, page, attempts, reason):
+        """一页导出失败：未达到次数上限时重新排队，否则记为最终失败"""
+        attempts += 1
+        if attempts < self.max_attempts:
+            logger.warning("第%d页第%d次导出失败，稍后重试: %s", page, attempts, reason)
+            self.requeue([(page, attempts)])
+        else:
+            logger.error("第%d页导出失败%d次，放弃: %s", page, attempts, reason)
+            self.finish([], {page: reason})
+
+    def finish(self, pages, failures=None, stats=None, calls=None):
+        failures = failures or {}
+        with self.condition:
+            self.outstanding -= len(pages) + len(failures)
+            self.condition.notify_all()
+        self.events.put((pages, failures, stats, calls))
+
+    def abort(self, error):
+        self.stop()
+        self.events.put(error)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+class RenderSupervisor:
+    """在受监督的渲染子进程中导出幻灯片
+
+    每个子进程由主进程中的一个线程驱动：逐页发送导出命令，每批结束时等待图片写完。
+    打开和导出超过期限、或子进程异常退出时结束并重启子进程，该页重新排队（最多 max_attempts 次），
+    仍然失败的页面记入失败列表，其余页面照常导出。子进程和其中的渲染器在多个任务之间常驻复用。
+    """
+
+    def __init__(self, backend='wps', workers=1, max_documents=50, max_attempts=MAX_SLIDE_ATTEMPTS):
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.workers = [RenderWorker(backend, max_documents) for _ in range(max(1, workers))]
+
+    @property
+    def worker_count(self):
+        return len(self.workers)
+
+    def render(self, ppt_path, base_name, outputs, size, slide_indices=None, batch_size=50,
+               progress_callback=None, batch_callback=None, timer=None,
+               open_timeout=OPEN_TIMEOUT, export_timeout=EXPORT_TIMEOUT):
+        """导出 slide_indices（默认全部页面）到 outputs，返回 (导出成功的页数, {失败页码: 原因})
+
+        progress_callback(done, total) 和 batch_callback(batch) 在主线程中调用，batch 只包含成功的页面。
+        """
+        if timer is None:
+            timer = StageTimer()
+        if slide_indices is None:
+            slide_indices = range(1, count_slides(ppt_path, self.backend) + 1)
+        pages = list(slide_indices)
+        if not pages:
+            return 0, {}
+
+        run = _RenderRun(pages, self.max_attempts)
+        # 页数少时不必启动所有子进程，每个子进程至少分到一批
+        active = self.workers[:max(1, min(len(self.workers), len(split_slide_batches(pages, batch_size))))]
+        threads = [
+            threading.Thread(
+                target=self._drive, name=f"render-supervisor-{i}",
+                args=(worker, run, ppt_path, base_name, outputs, size, batch_size, open_timeout, export_timeout),
+                daemon=True,
+            )
+            for i, worker in enumerate(active, start=1)
+        ]
+        for thread in threads:
+            thread.start()
+
+        total = len(pages)
+        done = 0
+        failures = {}
+        try:
+            while done < total:
+                event = run.events.get()
+                if isinstance(event, BaseException):
+                    raise event
+                finished, failed, stats, calls = event
+                if stats:
+                    timer.merge(stats)
+                com_trace.merge(calls)
+                failures.update(failed)
+                done += len(finished) + len(failed)
+                if finished:
+                    logger.debug("已处理 %d 张幻灯片: %s", len(finished), finished)
+                    if batch_callback:
+                        batch_callback(finished)
+                if progress_callback:
+                    progress_callback(done, total)
+        finally:
+            # 出错或被取消时不再开始新的页面，正在导出的页面结束后线程退出
+            run.stop()
+            for thread in threads:
+                thread.join()
+        return total - len(failures), failures
+
+    def _drive(self, worker, run, ppt_path, base_name, outputs, size, batch_size, open_timeout, export_timeout):
+        """监督线程：从队列取页面交给 worker 导出，直到所有页面都有结果"""
+        try:
+            open_failures = 0
+            while True:
+                batch = run.take(batch_size)
+                if not batch:
+                    break
+                if self._render_batch(worker, run, batch, ppt_path, base_name, outputs, size,
+                                      open_timeout, export_timeout):
+                    open_failures = 0
+                else:
+                    open_failures += 1
+                    if open_failures >= self.max_attempts:
+                        # 演示文稿本身打不开时逐页重试没有意义
+                        raise RenderWorkerError(f"渲染子进程连续 {open_failures} 次无法打开 {ppt_path}")
+            worker.release(open_timeout)
+        except BaseException as e:
+            run.abort(e)
+
+    def _render_batch(self, worker, run, batch, ppt_path, base_name, outputs, size, open_timeout, export_timeout):
+        """导出一批页面并等待写完，返回能否打开演示文稿"""
+        try:
+            worker.open(ppt_path, open_timeout)
+        except RenderWorkerError as e:
+            logger.warning("渲染子进程打开演示文稿失败: %s", e)
+            run.requeue(batch)
+            return False
+
+        # [(页码, 已失败的次数)]，已导出、等待后处理的页面
+        exported = []
+        for page, attempts in batch:
+            if run.stopped:
+                return True
+            try:
+                worker.open(ppt_path, open_timeout)
+                worker.call(('export', page, base_name, outputs, size), export_timeout)
+            except RenderWorkerError as e:
+                if not worker.running:
+                    # 子进程已被结束，之前导出但还没写完的页面重新排队（不算失败）
+                    run.requeue(exported)
+                    exported = []
+                run.attempt_failed(page, attempts, str(e))
+                continue
+            exported.append((page, attempts))
+
+        if not exported:
+            return True
+        try:
+            stats, failed, calls = worker.call(('flush',), export_timeout * len(exported))
+        except RenderWorkerError as e:
+            for page, attempts in exported:
+                run.attempt_failed(page, attempts, str(e))
+            return True
+        attempts_by_page = dict(exported)
+        for page, reason in failed.items():
+            run.attempt_failed(page, attempts_by_page[page], reason)
+        run.finish([page for page, _ in exported if page not in failed], stats=stats, calls=calls)
+        return True
+
+    def close(self):
+        """退出所有渲染子进程"""
+        for worker in self.workers:
+            worker.shutdown()
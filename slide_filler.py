@@ -0,0 +1,207 @@
+import re
+from copy import deepcopy
+
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+# 首图标记：内容中包含该标记时使用界面上设置的首图字体大小
+FIRST_IMAGE_MARK = "#我的首图#"
+
+# 关系属性（r:embed、r:id、r:link 等）所在的命名空间
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# XML 不允许的控制字符（保留制表符）
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b-\x1f]')
+
+
+class ShapeBinding:
+    """绑定计划中的一项：模板页第 index 个形状写入 column 列的数据
+
+    index 从0开始（python-pptx 的形状列表）；通过COM访问时用 index + 1，批量填充数据由 row_writes 换算。
+    """
+
+    def __init__(self, index, column, font_size=None):
+        self.index = index
+        self.column = column
+        # 模板中的原始字号（WPS填充时用于恢复字号）
+        self.font_size = font_size
+
+
+def cell_content(row, column, empty_value=' '):
+    """取出单元格要写入的文本，返回 (内容, 是否首图)"""
+    content = str(row[column]).strip()
+    if not content or content.lower() == 'nan':
+        content = empty_value
+
+    # 只有当内容包含"#我的首图#"时才设置字号，其他内容保持模板字号
+    if FIRST_IMAGE_MARK in content:
+        return content.replace(FIRST_IMAGE_MARK, ""), True
+    return content, False
+
+
+def row_slide_index(row_index, template_slides=1):
+    """第 row_index 行（从0开始）在生成的PPT中的页码（从1开始）
+
+    第一行写入模板第1页，模板的其余页面（不填充数据）保持在第2到 template_slides 页，之后的行依次追加在末尾。
+    """
+    return 1 if row_index == 0 else template_slides + row_index
+
+
+def deck_slide_count(rows, template_slides=1):
+    """填充 rows 行后生成的PPT的页数（没有数据时只有模板页）"""
+    return max(rows, 1) + template_slides - 1
+
+
+class SlideFiller:
+    """基于python-pptx的幻灯片填充引擎，在进程内复制模板页XML并写入数据，不经过WPS"""
+
+    def __init__(self, template_path):
+        self.prs = Presentation(template_path)
+        self.template_slide = self.prs.slides[0]
+
+        # 在写入任何数据之前保存模板页的原始XML和关系，后续页面都从这份快照复制
+        self._template_xml = deepcopy(self.template_slide._element)
+        self._template_rels = [
+            rel for rel in self.template_slide.part.rels.values()
+            if rel.reltype not in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE)
+        ]
+
+    def text_shape_names(self):
+        """模板页中带文本框的形状名称"""
+        return {shape.name for shape in self.template_slide.shapes if shape.has_text_frame}
+
+    def binding_plan(self, columns):
+        """加载模板时计算一次：哪些形状（按序号）对应哪些列，复制出的页面形状顺序相同"""
+        return [
+            ShapeBinding(index, shape.name)
+            for index, shape in enumerate(self.template_slide.shapes)
+            if shape.has_text_frame and shape.name in columns
+        ]
+
+    def clone_template_slide(self):
+        """复制模板页并追加到演示文稿末尾，返回新页面"""
+        new_slide = self.prs.slides.add_slide(self.template_slide.slide_layout)
+        new_part = new_slide.part
+
+        # 复制图片、超链接等关系，并记录旧rId到新rId的映射
+        rid_map = {}
+        for rel in self._template_rels:
+            if rel.is_external:
+                rid_map[rel.rId] = new_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                rid_map[rel.rId] = new_part.relate_to(rel.target_part, rel.reltype)
+
+        # 用模板页的XML替换新页面的内容（包括背景、形状、配色映射和动画）
+        # 新页面的 sld/cSld/spTree 节点本身保留，python-pptx 的形状集合会引用它们
+        new_element = new_slide._element
+        new_cSld = new_element.cSld
+        new_spTree = new_cSld.spTree
+        for parent, keep in ((new_element, new_cSld), (new_cSld, new_spTree), (new_spTree, None)):
+            for child in list(parent):
+                if child is not keep:
+                    parent.remove(child)
+
+        template_cSld = self._template_xml.cSld
+        for target, source in ((new_element, self._template_xml), (new_cSld, template_cSld),
+                               (new_spTree, template_cSld.spTree)):
+            for key, value in source.attrib.items():
+                target.set(key, value)
+
+        before_spTree = True
+        for child in template_cSld:
+            if child.tag == qn('p:spTree'):
+                before_spTree = False
+                for shape_element in child:
+                    new_spTree.append(deepcopy(shape_element))
+            elif before_spTree:
+                new_spTree.addprevious(deepcopy(child))
+            else:
+                new_cSld.append(deepcopy(child))
+        for child in self._template_xml:
+            if child.tag != qn('p:cSld'):
+                new_element.append(deepcopy(child))
+
+        # 修正XML中引用的关系ID
+        for node in new_element.iter():
+            for key, value in node.attrib.items():
+                if key.startswith(_REL_NS) and value in rid_map:
+                    node.set(key, rid_map[value])
+
+        return new_slide
+
+    def fill_slide(self, slide, row, bindings, empty_value=' ', first_image_font_size=None, font_sizes=None):
+        """按绑定计划将一行数据写入页面中对应的文本框
+
+        font_sizes 是自动缩小计算出的 {列名: 字号}（None 表示保持模板字号），不传时只有首图设置字号。
+        """
+        shapes = list(slide.shapes)
+        for binding in bindings:
+            content, first_image = cell_content(row, binding.column, empty_value)
+            if font_sizes is not None:
+                font_size = font_sizes.get(binding.column)
+            else:
+                font_size = first_image_font_size if first_image else None
+            set_shape_text(shapes[binding.index].text_frame, content, font_size)
+
+    def save(self, path):
+        """保存演示文稿"""
+        self.prs.save(path)
+
+
+def template_font_size(text_frame):
+    """文本框第一个文字块明确设置的字号（磅），字号从占位符、母版等继承时返回 None
+
+    与 set_shape_text 取格式的方式一致：没有文字块时取第一段的段尾格式。
+    """
+    first_p = text_frame._txBody.find(qn('a:p'))
+    if first_p is None:
+        return None
+    rPr = first_p.find(qn('a:r') + '/' + qn('a:rPr'))
+    if rPr is None:
+        rPr = first_p.find(qn('a:endParaRPr'))
+    if rPr is None or rPr.get('sz') is None:
+        return None
+    return int(rPr.get('sz')) / 100
+
+
+def set_shape_text(text_frame, content, font_size=None):
+    """替换文本框内容，保留第一段和第一个文字块的格式（与WPS中 TextRange.Text 赋值一致）"""
+    txBody = text_frame._txBody
+    paragraphs = txBody.findall(qn('a:p'))
+    first_p = paragraphs[0]
+
+    # 取第一段的段落格式、文字格式和段尾格式作为模板
+    pPr = first_p.find(qn('a:pPr'))
+    end_rPr = first_p.find(qn('a:endParaRPr'))
+    first_r = first_p.find(qn('a:r'))
+    rPr = first_r.find(qn('a:rPr')) if first_r is not None else None
+    if rPr is None and end_rPr is not None:
+        rPr = deepcopy(end_rPr)
+        rPr.tag = qn('a:rPr')
+
+    for p in paragraphs:
+        txBody.remove(p)
+
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    for line in content.split('\n'):
+        p = txBody.makeelement(qn('a:p'), {})
+        if pPr is not None:
+            p.append(deepcopy(pPr))
+        if line:
+            r = p.makeelement(qn('a:r'), {})
+            run_rPr = deepcopy(rPr) if rPr is not None else r.makeelement(qn('a:rPr'), {'lang': 'zh-CN'})
+            if font_size is not None:
+                run_rPr.set('sz', str(int(round(float(font_size) * 100))))
+            r.append(run_rPr)
+            t = r.makeelement(qn('a:t'), {})
+            t.text = _ILLEGAL_XML_CHARS.sub('', line)
+            r.append(t)
+            p.append(r)
+        if end_rPr is not None:
+            end = deepcopy(end_rPr)
+            if font_size is not None:
+                end.set('sz', str(int(round(float(font_size) * 100))))
+            p.append(end)
+        txBody.append(p)
+
@@ -0,0 +1,535 @@
+import os
+import math
+import time
+import signal
+import zipfile
+import tempfile
+from xml.etree import ElementTree
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import com_trace
+from app_logging import get_logger
+from stage_timer import StageTimer
+from job_settings import FIT_MODES
+
+# Office 中 MsoTriState 的“是”
+MSO_TRUE = -1
+
+# 留白部分的颜色
+LETTERBOX_COLOR = (255, 255, 255)
+
+# 后处理（解码、重采样、编码）线程数：渲染器导出下一页时，上一页在这些线程中转换为JPG。
+# Pillow 在这些操作中释放GIL，0 表示在导出线程中依次处理
+POSTPROCESS_THREADS = 2
+
+# 导出后等待后处理的最多页数，达到时导出暂停，限制临时文件和内存中的图片数量
+POSTPROCESS_QUEUE_SIZE = 4
+
+# 测试用的故障注入（只对占位渲染器生效）：PPT_STUB_FAULTS="hang:3,crash:5,error:7"
+# 让导出第3页时卡住、第5页时进程退出、第7页时出错；同时设置 PPT_STUB_FAULT_DIR 时
+# 每个故障只发生一次（在该文件夹中留下标记），用来测试重启后重试成功的情况
+STUB_FAULTS_ENV = 'PPT_STUB_FAULTS'
+STUB_FAULT_DIR_ENV = 'PPT_STUB_FAULT_DIR'
+
+logger = get_logger(__name__)
+
+
+def terminate_process(pid):
+    """强制结束进程（卡住的WPS），进程已经不存在时什么也不做"""
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError as e:
+        logger.debug("结束进程 %s 失败: %s", pid, e)
+
+
+class BaseRenderer:
+    """渲染器接口
+
+    start() 启动应用，open() 打开演示文稿，export_slide() 导出一页，
+    close_document() 只关闭文档（应用保持运行以便复用），close() 关闭文档并退出应用。
+    """
+
+    # 无损导出使用的图片格式，后处理阶段再编码为JPG
+    export_format = "PNG"
+
+    def __init__(self):
+        # 本实例累计打开过的文档数，会话池据此定期回收
+        self.documents_opened = 0
+        # 应用的进程号，调用卡住时据此结束应用；在当前进程内渲染时为 None
+        self.process_id = None
+
+    def start(self):
+        pass
+
+    def open(self, ppt_path):
+        raise NotImplementedError
+
+    def slide_count(self):
+        raise NotImplementedError
+
+    def export_slide(self, index, output_path, width, height, filter_name="JPG"):
+        raise NotImplementedError
+
+    def close_document(self):
+        pass
+
+    def is_alive(self):
+        """健康检查：应用仍能响应调用"""
+        return True
+
+    def kill(self):
+        """强制结束应用（调用卡住时由看门狗使用），让阻塞的调用出错返回"""
+        if self.process_id is not None:
+            terminate_process(self.process_id)
+
+    def close(self):
+        self.close_document()
+
+
+def _window_process_id(app):
+    """WPS主窗口所属的进程号，取不到时返回 None"""
+    try:
+        import win32process
+        return win32process.GetWindowThreadProcessId(app.HWND)[1]
+    except Exception as e:
+        logger.debug("无法取得WPS进程号: %s", e)
+        return None
+
+
+class WPSRenderer(BaseRenderer):
+    """通过WPS演示(KWPP)把幻灯片导出为图片，每个实例独占一个WPS进程"""
+
+    def __init__(self):
+        super().__init__()
+        self.app = None
+        self.presentation = None
+
+    def start(self):
+        """启动WPS（已启动时直接返回）"""
+        import comtypes.client
+
+        if self.app is None:
+            # 开启COM调用统计时返回代理对象，之后经由它取得的所有对象的调用都会被记录
+            self.app = com_trace.wrap(comtypes.client.CreateObject("KWPP.Application"))
+            self.app.Visible = True
+            self.process_id = _window_process_id(self.app)
+        return self.app
+
+    def open(self, ppt_path):
+        """以只读方式打开演示文稿"""
+        self.start()
+        self.close_document()
+        self.presentation = self.app.Presentations.Open(os.path.abspath(ppt_path), MSO_TRUE)
+        self.documents_opened += 1
+
+    def slide_count(self):
+        return self.presentation.Slides.Count
+
+    def export_slide(self, index, output_path, width, height, filter_name="JPG"):
+        """导出第 index 页（从1开始）"""
+        slide = self.presentation.Slides.Item(index)
+        slide.Export(output_path, filter_name, width, height)
+
+    def close_document(self):
+        try:
+            if self.presentation is not None:
+                self.presentation.Close()
+        except Exception as e:
+            logger.warning("关闭演示文稿失败: %s", e)
+        self.presentation = None
+
+    def is_alive(self):
+        if self.app is None:
+            return False
+        try:
+            self.app.Presentations.Count
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        """关闭演示文稿并退出WPS"""
+        self.close_document()
+        try:
+            if self.app is not None:
+                self.app.Quit()
+        except Exception as e:
+            # WPS已经卡死或被结束时退出会失败，确保进程不残留
+            logger.warning("退出WPS失败: %s", e)
+            self.kill()
+        self.app = None
+        self.process_id = None
+
+
+class StubRenderer(BaseRenderer):
+    """不依赖WPS的占位渲染器，按页数输出纯色图片，用于在Linux上测试调度流程"""
+
+    def __init__(self):
+        super().__init__()
+        self.ppt_path = None
+        self._slide_count = 0
+        # 测试时可置为 False，模拟应用失去响应
+        self.alive = True
+        self.faults = _stub_faults()
+
+    def open(self, ppt_path):
+        from pptx import Presentation
+
+        self.ppt_path = ppt_path
+        self._slide_count = len(Presentation(ppt_path).slides)
+        self.documents_opened += 1
+
+    def slide_count(self):
+        return self._slide_count
+
+    def export_slide(self, index, output_path, width, height, filter_name="JPG"):
+        if not 1 <= index <= self._slide_count:
+            raise IndexError(f"幻灯片序号超出范围: {index}")
+        self._inject_fault(index)
+        # 每页使用不同的灰度，便于核对输出顺序
+        shade = (index * 37) % 256
+        from PIL import Image
+
+        image_format = "JPEG" if filter_name.upper() in ("JPG", "JPEG") else filter_name.upper()
+        Image.new("RGB", (width, height), (shade, shade, shade)).save(output_path, image_format)
+
+    def _inject_fault(self, index):
+        kind = self.faults.get(index)
+        if kind is None:
+            return
+        marker_dir = os.environ.get(STUB_FAULT_DIR_ENV)
+        if marker_dir:
+            marker = os.path.join(marker_dir, f"{kind}_{index}")
+            if os.path.exists(marker):
+                return
+            open(marker, 'w').close()
+        if kind == 'hang':
+            time.sleep(3600)
+        elif kind == 'crash':
+            os._exit(3)
+        else:
+            raise RuntimeError(f"注入的导出错误: 第{index}页")
+
+    def close_document(self):
+        self.ppt_path = None
+        self._slide_count = 0
+
+    def is_alive(self):
+        return self.alive
+
+
+def _stub_faults():
+    """读取 PPT_STUB_FAULTS，返回 {页码: 故障类型}"""
+    faults = {}
+    for item in os.environ.get(STUB_FAULTS_ENV, '').split(','):
+        if ':' in item:
+            kind, page = item.split(':', 1)
+            faults[int(page)] = kind.strip()
+    return faults
+
+
+@contextmanager
+def com_apartment():
+    """在当前线程初始化COM，供后台线程调用WPS（没有安装comtypes时什么也不做）"""
+    try:
+        import comtypes
+    except ImportError:
+        yield
+        return
+    comtypes.CoInitialize()
+    try:
+        yield
+    finally:
+        comtypes.CoUninitialize()
+
+
+# 可用的渲染后端
+RENDERER_BACKENDS = {
+    'wps': WPSRenderer,
+    'stub': StubRenderer,
+}
+
+
+def create_renderer(backend):
+    """按名称创建渲染器实例"""
+    if backend == 'native' and backend not in RENDERER_BACKENDS:
+        # 原生渲染器在导入时注册自己
+        import native_renderer
+    if backend not in RENDERER_BACKENDS:
+        raise ValueError(f"未知的渲染后端: {backend}")
+    return RENDERER_BACKENDS[backend]()
+
+
+class RendererPool:
+    """渲染会话池：保持渲染器（WPS实例）常驻，在多个任务之间复用，避免每次冷启动
+
+    取出时做健康检查，出错或累计打开 max_documents 个文档后回收重建。
+    同一个会话池只能在创建它的线程中使用（COM对象不能跨线程）。
+    """
+
+    def __init__(self, backend='wps', max_documents=50):
+        self.backend = backend
+        self.max_documents = max_documents
+        self._idle = []
+
+    def acquire(self):
+        """取出一个可用的渲染器，没有空闲的就新建"""
+        while self._idle:
+            renderer = self._idle.pop()
+            if renderer.is_alive():
+                return renderer
+            logger.warning("渲染器已失去响应，重新启动")
+            renderer.close()
+        renderer = create_renderer(self.backend)
+        renderer.start()
+        return renderer
+
+    def release(self, renderer, failed=False):
+        """归还渲染器：关闭文档，出错或使用次数达到上限时退出应用"""
+        renderer.close_document()
+        if failed or renderer.documents_opened >= self.max_documents:
+            renderer.close()
+            return
+        self._idle.append(renderer)
+
+    @contextmanager
+    def session(self):
+        renderer = self.acquire()
+        try:
+            yield renderer
+        except BaseException:
+            self.release(renderer, failed=True)
+            raise
+        self.release(renderer)
+
+    def close(self):
+        """退出所有空闲的渲染器"""
+        while self._idle:
+            self._idle.pop().close()
+
+
+def slide_image_path(images_dir, base_name, index):
+    """第 index 页（从1开始）对应的图片路径"""
+    return os.path.join(images_dir, f"{base_name}_第{index}页.jpg")
+
+
+def split_slide_batches(slide_indices, batch_size):
+    """把页码列表按 batch_size 切分为若干批"""
+    slide_indices = list(slide_indices)
+    return [
+        slide_indices[start:start + batch_size]
+        for start in range(0, len(slide_indices), batch_size)
+    ]
+
+
+class ImageOutput:
+    """一种输出图片：保存到 images_dir，尺寸为 width×height
+
+    fit 决定比例与幻灯片不同时的处理方式：stretch 拉伸，crop 缩放后居中裁剪，letterbox 缩放后两侧留白。
+    """
+
+    def __init__(self, images_dir, width, height, fit='stretch'):
+        if fit not in FIT_MODES:
+            raise ValueError(f"未知的适配方式: {fit}")
+        self.images_dir = images_dir
+        self.width = int(width)
+        self.height = int(height)
+        self.fit = fit
+
+
+def slide_aspect(ppt_path):
+    """从 presentation.xml 读取幻灯片宽高比，不加载整个演示文稿"""
+    with zipfile.ZipFile(ppt_path) as package:
+        root = ElementTree.fromstring(package.read('ppt/presentation.xml'))
+    size = root.find('{http://schemas.openxmlformats.org/presentationml/2006/main}sldSz')
+    return int(size.get('cx')) / int(size.get('cy'))
+
+
+def package_slide_count(ppt_path):
+    """从 presentation.xml 读取页数，不加载整个演示文稿"""
+    with zipfile.ZipFile(ppt_path) as package:
+        root = ElementTree.fromstring(package.read('ppt/presentation.xml'))
+    slides = root.find('{http://schemas.openxmlformats.org/presentationml/2006/main}sldIdLst')
+    return 0 if slides is None else len(slides)
+
+
+def export_size(outputs, aspect):
+    """所有输出只导出一次时的导出尺寸：按幻灯片比例，能覆盖每种输出的最小分辨率（之后只缩小）
+
+    只有一种拉伸输出时直接按该尺寸导出（与原来的行为一致）。
+    """
+    if len(outputs) == 1 and outputs[0].fit == 'stretch':
+        return outputs[0].width, outputs[0].height
+    width = 0
+    for output in outputs:
+        if output.fit == 'letterbox':
+            needed = min(output.width, output.height * aspect)
+        else:
+            needed = max(output.width, output.height * aspect)
+        width = max(width, needed)
+    width = int(math.ceil(width))
+    return width, max(1, int(round(width / aspect)))
+
+
+def outputs_export_size(ppt_path, outputs):
+    """按演示文稿的比例计算 outputs 共用的导出尺寸，读不到比例时按第一种输出的比例"""
+    try:
+        aspect = slide_aspect(ppt_path)
+    except Exception:
+        aspect = outputs[0].width / outputs[0].height
+    return export_size(outputs, aspect)
+
+
+def fit_image(img, width, height, fit):
+    """把导出的图片转换为 width×height"""
+    from PIL import Image, ImageOps
+
+    if img.size == (width, height):
+        return img
+    if fit == 'crop':
+        return ImageOps.fit(img, (width, height), Image.Resampling.LANCZOS)
+    if fit == 'letterbox':
+        return ImageOps.pad(img, (width, height), Image.Resampling.LANCZOS, color=LETTERBOX_COLOR)
+    return img.resize((width, height), Image.Resampling.LANCZOS)  # 使用高质量的重采样方法
+
+
+def postprocess_slide_image(export_path, targets, timer):
+    """把无损导出的图片转换为各目标尺寸的JPG：只解码一次，每种尺寸只在需要时重采样，只编码一次
+
+    targets 为 [(输出路径, ImageOutput)]。
+    """
+    from PIL import Image
+
+    with timer.stage('decode'):
+        img = Image.open(export_path)
+        img.load()
+
+    # JPG不支持透明通道
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    for output_path, output in targets:
+        if img.size != (output.width, output.height):
+            with timer.stage('resample'):
+                result = fit_image(img, output.width, output.height, output.fit)
+        else:
+            result = img
+        with timer.stage('encode'):
+            result.save(output_path, "JPEG", quality=95, dpi=(300, 300))
+
+
+def _export(renderer, index, size, temp_dir, timer):
+    export_format = renderer.export_format
+    export_path = os.path.join(temp_dir, f"slide_{index}.{export_format.lower()}")
+
+    # 先无损导出（PNG或BMP），避免两次JPG编码；多种输出尺寸共用这一次导出
+    with timer.stage('export'):
+        renderer.export_slide(index, export_path, size[0], size[1], export_format)
+    return export_path
+
+
+def _postprocess(export_path, index, base_name, outputs):
+    """在后处理线程中运行，返回本页各阶段的耗时（StageTimer 不是线程安全的，由调用方合并）"""
+    timer = StageTimer()
+    targets = [(slide_image_path(output.images_dir, base_name, index), output) for output in outputs]
+    postprocess_slide_image(export_path, targets, timer)
+    os.remove(export_path)
+    return timer.as_dict()
+
+
+def _render_batch(renderer, batch, base_name, outputs, size, postprocess_threads=POSTPROCESS_THREADS):
+    """导出一批页面：渲染器导出和后处理线程流水线进行，总耗时接近两者中较慢的一个"""
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(prefix="slide_export_") as temp_dir:
+        if postprocess_threads <= 0:
+            for index in batch:
+                export_path = _export(renderer, index, size, temp_dir, timer)
+                timer.merge(_postprocess(export_path, index, base_name, outputs))
+            return batch, timer.as_dict()
+
+        # 线程池在临时文件夹删除之前退出（出错时也会等正在处理的页面结束）
+        with ThreadPoolExecutor(max_workers=postprocess_threads, thread_name_prefix='postprocess') as pool:
+            pending = deque()
+            for index in batch:
+                export_path = _export(renderer, index, size, temp_dir, timer)
+                pending.append(pool.submit(_postprocess, export_path, index, base_name, outputs))
+                # 背压：排队的页面达到上限时等待最早的一页处理完
+                while len(pending) >= POSTPROCESS_QUEUE_SIZE:
+                    timer.merge(pending.popleft().result())
+            while pending:
+                timer.merge(pending.popleft().result())
+    return batch, timer.as_dict()
+
+
+def count_slides(ppt_path, backend='wps'):
+    """统计演示文稿页数，优先用python-pptx读取，失败时通过渲染器打开"""
+    try:
+        from pptx import Presentation
+        return len(Presentation(ppt_path).slides)
+    except Exception:
+        renderer = create_renderer(backend)
+        try:
+            renderer.open(ppt_path)
+            return renderer.slide_count()
+        finally:
+            renderer.close()
+
+
+def render_slides(ppt_path, images_dir, base_name, width, height,
+                  batch_size=50, backend='wps', progress_callback=None, timer=None,
+                  slide_indices=None, pool=None, outputs=None, batch_callback=None):
+    """在当前进程中把演示文稿的每一页导出为 {base_name}_第{i}页.jpg
+
+    按 batch_size 把页码切分为若干批依次导出，progress_callback(done, total) 在每批完成后调用。
+    多进程导出以及可能卡住的渲染器由 render_supervisor.RenderSupervisor 负责。
+    传入 timer（StageTimer）时累计导出、解码、重采样、编码各阶段的耗时。
+    slide_indices 指定只导出哪些页（从1开始），默认导出全部。
+    传入 pool（RendererPool）时复用其中常驻的渲染器，否则本次调用结束后关闭新启动的渲染器。
+    outputs（ImageOutput 列表）指定多种输出尺寸时忽略 images_dir、width、height，
+    每页只导出一次（按能覆盖所有尺寸的分辨率），再分别缩放保存到各自的文件夹。
+    batch_callback(batch) 在每批图片全部写完后调用（用于记录断点）。
+    返回导出的页数。
+    """
+    if timer is None:
+        timer = StageTimer()
+
+    if outputs is None:
+        outputs = [ImageOutput(images_dir, width, height)]
+        size = (width, height)
+    else:
+        size = outputs_export_size(ppt_path, outputs)
+    for output in outputs:
+        if not os.path.exists(output.images_dir):
+            os.makedirs(output.images_dir)
+
+    if slide_indices is not None and not slide_indices:
+        return 0
+
+    own_pool = pool is None
+    if own_pool:
+        pool = RendererPool(backend)
+    try:
+        with pool.session() as renderer:
+            with com_trace.stage('open'):
+                renderer.open(ppt_path)
+            if slide_indices is None:
+                slide_indices = range(1, renderer.slide_count() + 1)
+            batches = split_slide_batches(slide_indices, batch_size)
+            total = sum(len(batch) for batch in batches)
+            done = 0
+            for batch in batches:
+                _, stats = _render_batch(renderer, batch, base_name, outputs, size)
+                timer.merge(stats)
+                done += len(batch)
+                logger.debug("已处理第%d到%d张幻灯片", batch[0], batch[-1])
+                if batch_callback:
+                    batch_callback(batch)
+                if progress_callback:
+                    progress_callback(done, total)
+    finally:
+        if own_pool:
+            pool.close()
+    return total
+
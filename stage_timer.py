@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+
+import com_trace
+
+
+class StageTimer:
+    """按阶段累计耗时和次数"""
+
+    def __init__(self):
+        self.stats = {}
+
+    @contextmanager
+    def stage(self, name):
+        """统计 with 块内的耗时，计入 name 阶段（开启COM调用统计时块内的调用同样计入该阶段）"""
+        start = time.perf_counter()
+        try:
+            with com_trace.stage(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def iterate(self, name, iterable):
+        """逐个产出 iterable 的元素，取每个元素的耗时计入 name 阶段（用于流式读取）"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start, 0)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def add(self, name, seconds, count=1):
+        total, calls = self.stats.get(name, (0.0, 0))
+        self.stats[name] = (total + seconds, calls + count)
+
+    def merge(self, stats):
+        """合并另一个计时器（或子进程返回的 as_dict() 结果）"""
+        if isinstance(stats, StageTimer):
+            stats = stats.as_dict()
+        for name, item in stats.items():
+            self.add(name, item['seconds'], item['count'])
+
+    def as_dict(self):
+        return {
+            name: {'seconds': total, 'count': calls}
+            for name, (total, calls) in self.stats.items()
+        }
+
+    def report(self, title="各阶段耗时"):
+        """生成可读的耗时汇总"""
+        lines = [f"{title}:"]
+        for name, (total, calls) in self.stats.items():
+            average = total / calls * 1000 if calls else 0
+            lines.append(f"- {name}: {calls} 次, 共 {total:.3f} 秒, 平均 {average:.1f} 毫秒")
+        return "\n".join(lines)
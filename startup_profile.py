@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import builtins
+
+# 环境变量：设置后记录启动过程中每个模块的导入耗时，窗口可以操作时输出报告。
+# 值为 1 时打印到控制台，其他值作为报告文件路径（追加写入，打包后的exe没有控制台时使用）
+STARTUP_REPORT_ENV = 'PPT_STARTUP_REPORT'
+
+# 报告中列出的最慢模块数量
+REPORT_TOP_MODULES = 20
+
+# 本模块第一次被导入的时间，作为启动计时的起点（应在入口文件的第一行导入）
+_started = time.perf_counter()
+
+# [(模块名, 自身耗时, 累计耗时, 层级)]
+_records = []
+_original_import = None
+
+
+def enable():
+    """开始记录此后每个模块第一次导入的耗时（累计耗时包括它导入的其他模块）"""
+    global _original_import
+    if _original_import is not None:
+        return
+    _original_import = builtins.__import__
+    # 正在导入的模块栈，记录每一层中子模块花掉的时间
+    children = []
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return _original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        children.append(0.0)
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            child_time = children.pop()
+            if children:
+                children[-1] += elapsed
+            _records.append((name, elapsed - child_time, elapsed, len(children)))
+
+    builtins.__import__ = timed_import
+
+
+def enable_from_env():
+    """环境变量 PPT_STARTUP_REPORT 设置时开始记录，返回是否已开始"""
+    if os.environ.get(STARTUP_REPORT_ENV):
+        enable()
+        return True
+    return False
+
+
+def disable():
+    global _original_import
+    if _original_import is not None:
+        builtins.__import__ = _original_import
+        _original_import = None
+
+
+def report(label="窗口可以操作"):
+    """启动报告：从入口开始到 label 的时间，以及导入最慢的模块"""
+    elapsed = time.perf_counter() - _started
+    top_level = sum(record[2] for record in _records if record[3] == 0)
+    lines = [
+        f"启动报告 {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"- {label}: {elapsed * 1000:.0f} 毫秒",
+        f"- 导入模块: {len(_records)} 个, 共 {top_level * 1000:.0f} 毫秒",
+        f"- 最慢的 {REPORT_TOP_MODULES} 个模块（累计/自身，毫秒）:",
+    ]
+    slowest = sorted(_records, key=lambda record: record[2], reverse=True)[:REPORT_TOP_MODULES]
+    for name, self_time, total, depth in slowest:
+        lines.append(f"  {total * 1000:8.1f} {self_time * 1000:8.1f}  {'  ' * depth}{name}")
+    return "\n".join(lines)
+
+
+def write_report(label="窗口可以操作"):
+    """按环境变量输出启动报告，并停止记录（之后的延迟导入不计入启动时间）"""
+    target = os.environ.get(STARTUP_REPORT_ENV)
+    if not target or _original_import is None:
+        return
+    disable()
+    text = report(label)
+    if target == '1':
+        print(text)
+        return
+    try:
+        with open(target, 'a', encoding='utf-8') as f:
+            f.write(text + "\n\n")
+    except OSError as e:
+        # 在这里才导入，避免入口第一行导入本模块时提前加载日志模块，影响计时
+        from app_logging import get_logger
+        get_logger(__name__).warning("写入启动报告失败: %s", e)
@@ -0,0 +1,145 @@
+import os
+import json
+
+from app_logging import get_logger
+from incremental import file_digest
+from job_settings import app_cache_dir
+from slide_filler import ShapeBinding, template_font_size
+from text_fit import FitBox, TextFitter, fit_box_from_shape
+
+# 编译结果格式版本，编译内容或格式变化时递增，使旧的缓存全部失效
+TEMPLATE_CACHE_VERSION = 6
+
+logger = get_logger(__name__)
+
+
+def default_cache_dir():
+    """编译结果的保存位置"""
+    return app_cache_dir('templates')
+
+
+def compile_template(template_path, digest, prs):
+    """从已加载的模板（python-pptx演示文稿，尚未写入数据）提取只依赖模板内容的信息"""
+    from native_renderer import unsupported_reason
+
+    slide = prs.slides[0]
+    shapes = []
+    for index, shape in enumerate(slide.shapes):
+        entry = {
+            'index': index,
+            'name': shape.name,
+            'has_text': shape.has_text_frame,
+            'font_size': None,
+            'fit': None,
+        }
+        if shape.has_text_frame:
+            fit_box = fit_box_from_shape(shape, slide, prs.slide_width, prs.slide_height)
+            # 只记录模板中明确设置的字号；继承的字号不写入，整批写入时保持继承
+            entry['font_size'] = template_font_size(shape.text_frame)
+            entry['fit'] = fit_box.settings()
+        shapes.append(entry)
+
+    try:
+        native_reason = unsupported_reason(template_path, check_fonts=False)
+    except Exception as e:
+        native_reason = str(e)
+
+    return CompiledTemplate({
+        'version': TEMPLATE_CACHE_VERSION,
+        'digest': digest,
+        'shapes': shapes,
+        'native_reason': native_reason,
+    })
+
+
+class CompiledTemplate:
+    """模板的编译结果：形状名称和序号、字号、文字区域以及原生渲染器能否使用
+
+    不保存形状位置、背景和静态形状：原生渲染器在渲染子进程中编译生成的PPT，静态图层按内容键缓存，
+    常驻的渲染器在多个任务之间只绘制一次；填充时python-pptx本来就要加载完整的模板。
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.digest = data['digest']
+        self.shapes = data['shapes']
+        # 原生渲染器不支持该模板的原因，None 表示支持（是否有可用字体另外检查）
+        self.native_reason = data['native_reason']
+
+    def text_shape_names(self):
+        """模板页中带文本框的形状名称"""
+        return {shape['name'] for shape in self.shapes if shape['has_text']}
+
+    def binding_plan(self, columns):
+        """与 SlideFiller.binding_plan 相同，但不需要遍历模板页"""
+        return [
+            ShapeBinding(shape['index'], shape['name'], shape['font_size'])
+            for shape in self.shapes
+            if shape['has_text'] and shape['name'] in columns
+        ]
+
+    def text_fitter(self, bindings):
+        """按保存的文字区域创建 TextFitter"""
+        shapes = {shape['index']: shape for shape in self.shapes}
+        return TextFitter({
+            binding.column: FitBox(**shapes[binding.index]['fit']) for binding in bindings
+        })
+
+
+class TemplateCache:
+    """模板编译结果的缓存，按模板文件内容的SHA-256保存为JSON文件
+
+    同一进程内还会记住文件（路径、修改时间、大小）对应的哈希和已加载的编译结果，
+    多个任务使用同一个模板时只计算和读取一次。
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self._digests = {}
+        self._compiled = {}
+
+    def digest(self, template_path):
+        """模板文件内容的哈希"""
+        stat = os.stat(template_path)
+        key = (os.path.abspath(template_path), stat.st_mtime, stat.st_size)
+        if key not in self._digests:
+            self._digests[key] = file_digest(template_path)
+        return self._digests[key]
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load(self, digest):
+        try:
+            with open(self._path(digest), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != TEMPLATE_CACHE_VERSION or data.get('digest') != digest:
+                return None
+            return CompiledTemplate(data)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, compiled):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(compiled.digest)
+            # 先写临时文件再替换，多个进程同时编译同一个模板时不会读到写了一半的文件
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(compiled.data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("保存模板编译结果失败: %s", e)
+
+    def get(self, template_path, prs):
+        """返回模板的编译结果；缓存中没有时从 prs（刚加载、尚未写入数据的模板）编译并保存"""
+        digest = self.digest(template_path)
+        compiled = self._compiled.get(digest)
+        if compiled is None:
+            compiled = self._load(digest)
+            if compiled is None:
+                logger.info("编译模板...")
+                compiled = compile_template(template_path, digest, prs)
+                self._save(compiled)
+            self._compiled[digest] = compiled
+        return compiled
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import threading
+
+from app_logging import get_logger
+from job_settings import app_cache_dir
+
+# AI提问模板的接口地址；环境变量 PPT_HINT_URL 可以改为其他地址（例如本地测试服务器）
+HINT_URL = 'https://webapi.mymaskking.us.kg/get_ai_template_hint'
+HINT_URL_ENV = 'PPT_HINT_URL'
+
+# 缓存的有效期（秒），过期后在后台重新验证
+HINT_TTL = 24 * 3600
+
+# 请求超时（秒）
+REQUEST_TIMEOUT = 5
+
+logger = get_logger(__name__)
+
+# 没有缓存且无法联网时显示的默认模板
+DEFAULT_HINT = """请帮我查找关于"今日的科技新闻"的内容，生成的格式为表格，有三列：标题，内容,并且帮我生成150字的小红书爆文，要求爆文标题和爆文内容足够吸引人眼球，里面可以插入一些表情"""
+
+
+class HintCache:
+    """AI提问模板的本地缓存
+
+    content() 立即返回缓存的内容（没有缓存时返回默认模板），不访问网络；
+    refresh() 在缓存过期时带上 ETag/Last-Modified 发送条件请求，内容未变化（304）时只更新时间。
+    """
+
+    def __init__(self, path=None, url=None, ttl=HINT_TTL, timeout=REQUEST_TIMEOUT):
+        self.path = path or app_cache_dir('ai_template_hint.json')
+        self.url = url or os.environ.get(HINT_URL_ENV) or HINT_URL
+        self.ttl = ttl
+        self.timeout = timeout
+        self._entry = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('url') == self.url and isinstance(entry.get('content'), str):
+                return entry
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save(self, entry):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning("保存AI提问模板缓存失败: %s", e)
+
+    def content(self):
+        return self._entry['content'] if self._entry is not None else DEFAULT_HINT
+
+    def is_stale(self):
+        return self._entry is None or time.time() - self._entry.get('fetched_at', 0) >= self.ttl
+
+    def refresh(self, force=False):
+        """缓存过期（或 force）时向接口重新验证，返回新内容；内容没有变化或请求失败时返回 None"""
+        if not force and not self.is_stale():
+            return None
+        import requests
+
+        headers = {}
+        if self._entry is not None:
+            if self._entry.get('etag'):
+                headers['If-None-Match'] = self._entry['etag']
+            if self._entry.get('last_modified'):
+                headers['If-Modified-Since'] = self._entry['last_modified']
+        try:
+            response = requests.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and self._entry is not None:
+                entry = dict(self._entry, fetched_at=time.time())
+                self._save(entry)
+                self._entry = entry
+                return None
+            if response.status_code != 200:
+                raise Exception('HTTP请求失败')
+            data = response.json()
+            if data.get('status') != 200:
+                raise Exception('API返回状态错误')
+            content = data['data']['templates']
+        except requests.Timeout:
+            logger.warning("获取模板内容超时")
+            return None
+        except Exception as e:
+            logger.warning("获取模板内容失败: %s", e)
+            return None
+
+        changed = content != self.content()
+        entry = {
+            'url': self.url,
+            'content': content,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        self._save(entry)
+        self._entry = entry
+        return content if changed else None
+
+    def refresh_in_background(self, on_update, force=False):
+        """在后台线程中 refresh()，得到新内容时在该线程中调用 on_update(content)，返回线程"""
+        def worker():
+            content = self.refresh(force)
+            if content is not None:
+                on_update(content)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
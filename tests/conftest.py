@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """测试中的缓存都放在临时文件夹，不写入用户的缓存"""
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'appdata'))
@@ -0,0 +1,69 @@
+import openpyxl
+from pptx import Presentation
+from pptx.oxml.ns import qn
+
+from excel_reader import ExcelRowSource
+from generator import PPTGenerator, GenerationJob
+from slide_filler import SlideFiller
+from stage_timer import StageTimer
+from template_cache import TemplateCache
+
+ROWS = ['短标题', '第二行的标题', '#我的首图#首图标题']
+
+
+def _placeholder_template(path):
+    """标题占位符不设置字号，字号从版式和母版继承（默认模板中为44磅）"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    title = slide.shapes.title
+    title.name = '标题'
+    title.text_frame.text = '模板标题'
+    prs.save(path)
+
+
+def _workbook(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(['标题'])
+    for value in ROWS:
+        ws.append([value])
+    wb.save(path)
+
+
+def _fill(tmp_path, bulk_fill):
+    template_path = str(tmp_path / 'template.pptx')
+    excel_path = str(tmp_path / 'data.xlsx')
+    job = GenerationJob(template_path, excel_path, str(tmp_path), bulk_fill=bulk_fill, render_workers=1)
+    generator = PPTGenerator(template_cache=TemplateCache(str(tmp_path / 'templates')))
+    filler = SlideFiller(template_path)
+    template = generator.templates.get(template_path, filler.prs)
+    source = ExcelRowSource(excel_path, columns=template.text_shape_names())
+    save_path = str(tmp_path / f'bulk_{bulk_fill}.pptx')
+    generator.fill_with_pptx(filler, template, source, save_path, job, StageTimer())
+    return save_path
+
+
+def _text_bodies(path):
+    return [
+        shape.text_frame._txBody.xml
+        for slide in Presentation(path).slides
+        for shape in slide.shapes
+        if shape.has_text_frame
+    ]
+
+
+def test_bulk_fill_keeps_inherited_font_size(tmp_path):
+    _placeholder_template(str(tmp_path / 'template.pptx'))
+    _workbook(str(tmp_path / 'data.xlsx'))
+
+    bulk_path = _fill(tmp_path, True)
+    normal = _text_bodies(_fill(tmp_path, False))
+    assert len(normal) == len(ROWS)
+    assert _text_bodies(bulk_path) == normal
+
+    # 只有首图设置了字号，其余页面继续继承占位符的字号
+    sizes = [
+        [rPr.get('sz') for rPr in slide.shapes.title.text_frame._txBody.iter(qn('a:rPr'))]
+        for slide in Presentation(bulk_path).slides
+    ]
+    assert sizes == [[None], [None], ['4500']]
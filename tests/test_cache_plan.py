@@ -0,0 +1,57 @@
+import os
+
+from PIL import Image
+
+from generator import PPTGenerator, GenerationJob
+from render_cache import RenderCache, image_key
+from slide_renderer import ImageOutput, slide_image_path
+
+
+def _write_image(path, color):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', (8, 6), color).save(path)
+
+
+def test_cached_and_duplicate_pages_are_reported(tmp_path):
+    """从缓存复制的页面和相同内容的页面也通过 on_batch 记录，不必等到任务结束"""
+    cache = RenderCache(str(tmp_path / 'renders'), max_bytes=1024 * 1024)
+    generator = PPTGenerator(render_cache=cache)
+    job = GenerationJob('t.pptx', 'd.xlsx', str(tmp_path), 8, 6, render_workers=1)
+    images_dir = str(tmp_path / 'images')
+    outputs = [ImageOutput(images_dir, 8, 6)]
+
+    # 第2页的内容已在缓存中，第3页与第1页相同，第5页与第2页相同
+    keys = ['a', 'b', 'a', 'c', 'b']
+    cached_image = str(tmp_path / 'cached.jpg')
+    _write_image(cached_image, 'red')
+    cache.store([image_key('b', 'native', 8, 6)], [cached_image])
+
+    plan = generator.plan_cached_pages(keys, None, outputs, 'native', 'deck', job)
+    assert plan.to_render == [1, 4]
+    assert plan.cached == [2]
+
+    batches = []
+    batch_callback = generator._cached_batch_callback(plan, batches.append)
+    assert batches == [[2, 5]]
+    assert os.path.exists(slide_image_path(images_dir, 'deck', 5))
+
+    for page in plan.to_render:
+        _write_image(slide_image_path(images_dir, 'deck', page), 'blue')
+        batch_callback([page])
+    assert batches == [[2, 5], [1, 3], [4]]
+    assert plan.finish() == {}
+    assert all(os.path.exists(slide_image_path(images_dir, 'deck', page)) for page in range(1, 6))
+
+
+def test_duplicates_of_failed_pages_fail(tmp_path):
+    cache = RenderCache(str(tmp_path / 'renders'), max_bytes=0)
+    generator = PPTGenerator(render_cache=cache)
+    job = GenerationJob('t.pptx', 'd.xlsx', str(tmp_path), 8, 6, render_workers=1)
+    outputs = [ImageOutput(str(tmp_path / 'images'), 8, 6)]
+
+    plan = generator.plan_cached_pages(['a', 'a'], None, outputs, 'native', 'deck', job)
+    batches = []
+    generator._cached_batch_callback(plan, batches.append)
+    assert plan.to_render == [1]
+    assert batches == []
+    assert set(plan.finish({1: '超时'})) == {1, 2}
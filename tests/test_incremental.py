@@ -0,0 +1,16 @@
+from incremental import settings_digest
+from text_fit import fit_signature
+
+
+def _digest(**options):
+    return settings_digest('template', 1242, 1660, '45', ' ', **options)
+
+
+def test_fill_settings_change_the_digest():
+    """填充方式、整批写入和自动缩小参数不同时导出的图片可能不同，不能共用缓存和清单"""
+    base = _digest(fit=fit_signature())
+    assert base == _digest(fit=fit_signature())
+    assert base != _digest(fit=fit_signature(), fill_engine='wps')
+    assert base != _digest(fit=fit_signature(), bulk_fill=True)
+    assert base != _digest(fit=[8, 1, 4])
+    assert base != _digest(auto_fit=False)
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Inches
+
+from native_renderer import unsupported_reason
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+A = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+
+
+def _wordart_template(path, body_children):
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1))
+    box.text_frame.text = '艺术字'
+    body_pr = box.text_frame._txBody.bodyPr
+    for xml in body_children:
+        body_pr.append(etree.fromstring(f'<a:wrap xmlns:a="{A}">{xml}</a:wrap>')[0])
+    prs.save(path)
+    return path
+
+
+def test_flat_wordart_settings_are_supported(tmp_path):
+    """没有变形、从正前方看与平面文字相同的艺术字设置按平面文字绘制"""
+    path = _wordart_template(str(tmp_path / 'flat.pptx'), [
+        '<a:prstTxWarp prst="textNoShape"><a:avLst/></a:prstTxWarp>',
+        '<a:scene3d><a:camera prst="orthographicFront"/><a:lightRig rig="threePt" dir="t"/></a:scene3d>',
+        '<a:sp3d extrusionH="62696"/>',
+    ])
+    assert unsupported_reason(path, check_fonts=False) is None
+
+
+@pytest.mark.parametrize('children, reason', [
+    (['<a:prstTxWarp prst="textArchUp"><a:avLst/></a:prstTxWarp>'], "不支持艺术字变形"),
+    (['<a:scene3d><a:camera prst="perspectiveFront"/><a:lightRig rig="threePt" dir="t"/></a:scene3d>'],
+     "不支持三维艺术字效果"),
+    (['<a:scene3d><a:camera prst="orthographicFront"/><a:lightRig rig="threePt" dir="t"/></a:scene3d>',
+      '<a:sp3d contourW="3215"><a:contourClr><a:srgbClr val="FECFD5"/></a:contourClr></a:sp3d>'],
+     "不支持三维艺术字效果"),
+])
+def test_visible_wordart_effects_are_reported(tmp_path, children, reason):
+    path = _wordart_template(str(tmp_path / 'wordart.pptx'), children)
+    assert unsupported_reason(path, check_fonts=False) == reason
+
+
+def test_bundled_wordart_template_uses_wps():
+    path = os.path.join(ROOT, '模板文件', '科技黑色竖屏1.pptx')
+    assert unsupported_reason(path, check_fonts=False) is not None
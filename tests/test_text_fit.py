@@ -0,0 +1,40 @@
+import pytest
+from pptx import Presentation
+
+from font_library import fonts
+from slide_filler import ShapeBinding
+from text_fit import fitter_for_slide, fit_box_from_shape
+
+TITLE = '新品发布会现场直击：旗舰手机全系参数、价格与首发优惠一次看懂，' * 3
+
+pytestmark = pytest.mark.skipif(fonts.fallback() is None, reason="没有可用于量取文字的字体")
+
+
+def _title_slide():
+    """默认模板“仅标题”版式：标题占位符的字号从母版标题样式继承（44磅）"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.name = '标题'
+    return prs, slide
+
+
+def test_placeholder_inherits_font_size():
+    prs, slide = _title_slide()
+    box = fit_box_from_shape(slide.shapes.title, slide, prs.slide_width, prs.slide_height)
+    assert box.font_size == 44
+    assert box.measurable
+
+
+def test_long_title_in_placeholder_shrinks():
+    prs, slide = _title_slide()
+    bindings = [ShapeBinding(0, '标题')]
+    fitter = fitter_for_slide(prs, slide, bindings)
+
+    assert fitter.row_sizes({'标题': '短标题'}, bindings) == {'标题': None}
+    size = fitter.row_sizes({'标题': TITLE}, bindings)['标题']
+    assert size is not None and size < 44
+
+    box = fitter.boxes['标题']
+    paragraphs = box.prepare(TITLE)
+    assert not box.fits(paragraphs, 44)
+    assert box.fits(paragraphs, size)
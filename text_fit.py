@@ -0,0 +1,241 @@
+import math
+
+from font_library import fonts
+from native_renderer import EMU_PER_POINT, LINE_HEIGHT_RATIO, TextFormat, split_paragraphs, first_paragraph_format
+from slide_filler import cell_content
+
+# 自动缩小的最小字号（磅），仍然放不下时使用该字号
+MIN_FONT_SIZE = 8
+
+# 字号的最小调整单位（磅），与PowerPoint字号框一致
+FONT_SIZE_STEP = 0.5
+
+# 量取时每磅对应的像素数，避免小字号下字宽取整带来的误差
+MEASURE_SCALE = 4
+
+
+def fit_signature():
+    """影响自动缩小结果的参数，计入页面的键，修改后以前导出的图片不再沿用"""
+    return [MIN_FONT_SIZE, FONT_SIZE_STEP, MEASURE_SCALE]
+
+
+class FitBox:
+    """绑定形状中可以放文字的区域（磅）以及模板第一段文字的格式
+
+    填充时每行文字成为一段，都复制第一段的格式。量取时按这些格式（native_renderer.TextFormat）排版，
+    折行、缩进、段前段后间距、行距和自动缩小比例（font_scale）与原生渲染器一致。
+    """
+
+    def __init__(self, width, height, font_size, latin=None, ea=None, bold=False,
+                 line_spacing=('pct', 1.0), char_spacing=0.0, wrap=True, space_before=None, space_after=None,
+                 margin_left=0.0, indent=0.0, font_scale=1.0):
+        self.width = width
+        self.height = height
+        self.font_size = font_size
+        self.format = TextFormat(
+            font_size, latin, ea, bold=bold, char_spacing=char_spacing, line_spacing=line_spacing,
+            space_before=space_before, space_after=space_after, margin_left=margin_left, indent=indent,
+            font_scale=font_scale, wrap=wrap,
+        )
+        # 模板字体没有安装时排版使用后备中文字体，都没有时无法量取
+        fallback = fonts.fallback()
+        self.measurable = (fonts.find(latin, bold) or fallback) is not None and \
+            (fonts.find(ea, bold) or fallback) is not None
+
+    @property
+    def line_spacing(self):
+        return self.format.line_spacing
+
+    @property
+    def wrap(self):
+        return self.format.wrap
+
+    def settings(self):
+        """构造参数，可以保存为JSON后用 FitBox(**settings) 重建"""
+        fmt = self.format
+        return {
+            'width': self.width, 'height': self.height, 'font_size': self.font_size,
+            'latin': fmt.latin, 'ea': fmt.ea, 'bold': fmt.bold,
+            'line_spacing': list(fmt.line_spacing), 'char_spacing': fmt.char_spacing, 'wrap': fmt.wrap,
+            'space_before': list(fmt.space_before) if fmt.space_before else None,
+            'space_after': list(fmt.space_after) if fmt.space_after else None,
+            'margin_left': fmt.margin_left, 'indent': fmt.indent, 'font_scale': fmt.font_scale,
+        }
+
+    def line_height(self, size):
+        """size 磅时单行的高度（磅）"""
+        kind, value = self.format.line_spacing
+        if kind == 'pts':
+            return value
+        return size * self.format.font_scale * LINE_HEIGHT_RATIO * value
+
+    def prepare(self, text):
+        """把文本拆成段落（与填充时一样每行一段）"""
+        return split_paragraphs(text)
+
+    def layout(self, paragraphs, size, width=None, wrap=None):
+        """按 size 磅排版 prepare 得到的段落，坐标单位为 1/MEASURE_SCALE 磅"""
+        return self.format.layout(
+            paragraphs, size, (self.width if width is None else width) * MEASURE_SCALE,
+            MEASURE_SCALE / EMU_PER_POINT, wrap,
+        )
+
+    def total_width(self, paragraphs, size):
+        """不折行时所有字符的总宽度（磅）"""
+        lines = self.layout(paragraphs, size, width=math.inf, wrap=False).lines
+        return sum(line[3] for line in lines) / MEASURE_SCALE
+
+    def fits(self, paragraphs, size):
+        """prepare 得到的段落按 size 磅排版后能否放进区域"""
+        layout = self.layout(paragraphs, size)
+        if not self.wrap:
+            limit = self.width * MEASURE_SCALE
+            # 行：(基线, 左侧偏移, 可用宽度, 行宽, ...)
+            if any(line[1] + line[3] > limit for line in layout.lines):
+                return False
+        return layout.height <= self.height * MEASURE_SCALE
+
+
+class TextFitter:
+    """按字体度量为每个绑定形状计算字号：放得下时保持原字号，放不下时二分查找能放下的最大字号"""
+
+    def __init__(self, boxes):
+        # {列名: FitBox}，无法量取的形状不自动缩小
+        self.boxes = {column: box for column, box in boxes.items() if box is not None and box.measurable}
+        self._cache = {}
+        self.shrunk = 0
+        self.overflow = 0
+
+    def fit(self, column, content, max_size):
+        """返回 content 在 column 对应形状中能放下的最大字号（不超过 max_size）"""
+        box = self.boxes.get(column)
+        if box is None:
+            return max_size
+        key = (column, content, max_size)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._cache[key] = self._search(box, box.prepare(content), max_size)
+        size, fits = result
+        if size < max_size:
+            self.shrunk += 1
+        if not fits:
+            self.overflow += 1
+        return size
+
+    @staticmethod
+    def _search(box, paragraphs, max_size):
+        """返回 (字号, 是否放得下)"""
+        if box.fits(paragraphs, max_size):
+            return max_size, True
+        low = _snap(min(MIN_FONT_SIZE, max_size))
+        if not box.fits(paragraphs, low):
+            return low, False
+        # 文字铺满整个区域时的字号是能放下的上限，先用它缩小查找范围
+        high = max_size
+        total = box.total_width(paragraphs, max_size) / max_size
+        if box.line_spacing[0] == 'pct' and total > 0:
+            limit = math.sqrt(box.width * box.height / (total * box.line_height(1)))
+            high = min(high, _snap(limit) + 2 * FONT_SIZE_STEP)
+        # low 放得下，high 放不下
+        while high - low > FONT_SIZE_STEP:
+            middle = _snap((low + high) / 2)
+            if middle <= low:
+                break
+            if box.fits(paragraphs, middle):
+                low = middle
+            else:
+                high = middle
+        return low, True
+
+    def row_sizes(self, row, bindings, empty_value=' ', first_image_font_size=None):
+        """计算一行数据中每个绑定形状的字号，返回 {列名: 字号}，None 表示保持模板字号"""
+        sizes = {}
+        for binding in bindings:
+            content, first_image = cell_content(row, binding.column, empty_value)
+            box = self.boxes.get(binding.column)
+            if first_image:
+                # 首图以界面上设置的字号为上限
+                sizes[binding.column] = self.fit(binding.column, content, float(first_image_font_size))
+            elif box is not None:
+                size = self.fit(binding.column, content, box.font_size)
+                sizes[binding.column] = size if size < box.font_size else None
+            else:
+                sizes[binding.column] = None
+        return sizes
+
+    def report(self):
+        return f"自动缩小字号 {self.shrunk} 处，最小字号仍放不下 {self.overflow} 处"
+
+
+def _snap(size):
+    return int(size / FONT_SIZE_STEP) * FONT_SIZE_STEP
+
+
+def fit_box_from_shape(shape, slide, slide_width, slide_height):
+    """从python-pptx的形状读取文字区域和第一段文字格式（填充时所有段落都复制第一段的格式）
+
+    字号、字体、段落格式和文本框设置与原生渲染器一样逐级继承，占位符的字号通常来自版式或母版。
+    """
+    fmt = first_paragraph_format(slide, shape._element)
+    insets = fmt.insets
+    left, top = shape.left or 0, shape.top or 0
+    width = (shape.width or 0) - insets[0] - insets[2]
+    height = (shape.height or 0) - insets[1] - insets[3]
+    if fmt.auto_grow:
+        # 形状随文字调整大小：向下（不折行时还向右）可以一直延伸到页面边缘
+        height = slide_height - top - insets[1] - insets[3]
+        if not fmt.wrap:
+            width = slide_width - left - insets[0] - insets[2]
+
+    return FitBox(
+        width / EMU_PER_POINT,
+        height / EMU_PER_POINT,
+        fmt.size,
+        latin=fmt.latin,
+        ea=fmt.ea,
+        bold=fmt.bold,
+        line_spacing=fmt.line_spacing,
+        char_spacing=fmt.char_spacing,
+        wrap=fmt.wrap,
+        space_before=fmt.space_before,
+        space_after=fmt.space_after,
+        margin_left=fmt.margin_left,
+        indent=fmt.indent,
+        font_scale=fmt.font_scale,
+    )
+
+
+def fit_box_from_com(shape, slide_height):
+    """从WPS/PowerPoint的COM形状对象读取文字区域和格式（单位本来就是磅）"""
+    frame = shape.TextFrame
+    font = frame.TextRange.Font
+    paragraph = frame.TextRange.ParagraphFormat
+    width = shape.Width - frame.MarginLeft - frame.MarginRight
+    height = shape.Height - frame.MarginTop - frame.MarginBottom
+    # ppAutoSizeShapeToFitText = 1：形状随文字向下延伸
+    if frame.AutoSize == 1:
+        height = slide_height - shape.Top - frame.MarginTop - frame.MarginBottom
+
+    # LineRuleWithin（Before、After）为真时 SpaceWithin（Before、After）是行数，否则是磅数
+    def spacing(rule, value):
+        return ('pct', float(value)) if rule else ('pts', float(value))
+
+    # 标尺第一级：FirstMargin 是首行的位置，LeftMargin 是其余行的位置
+    level = frame.Ruler.Levels(1)
+    return FitBox(
+        width, height, float(font.Size), latin=font.Name, ea=font.NameFarEast,
+        bold=bool(font.Bold), line_spacing=spacing(paragraph.LineRuleWithin, paragraph.SpaceWithin),
+        wrap=bool(frame.WordWrap),
+        space_before=spacing(paragraph.LineRuleBefore, paragraph.SpaceBefore),
+        space_after=spacing(paragraph.LineRuleAfter, paragraph.SpaceAfter),
+        margin_left=float(level.LeftMargin), indent=float(level.FirstMargin - level.LeftMargin),
+    )
+
+
+def fitter_for_slide(prs, slide, bindings):
+    """为python-pptx模板页上的绑定形状创建 TextFitter（在填充任何数据之前调用）"""
+    shapes = list(slide.shapes)
+    return TextFitter({
+        binding.column: fit_box_from_shape(shapes[binding.index], slide, prs.slide_width, prs.slide_height)
+        for binding in bindings
+    })
@@ -0,0 +1,197 @@
+import os
+import mmap
+import time
+import pickle
+import struct
+import hashlib
+
+from app_logging import get_logger
+from job_settings import app_cache_dir
+
+# 快照格式版本，读取规则（空行、空单元格的处理）变化时递增，使旧快照全部失效
+SNAPSHOT_VERSION = 1
+
+# 文件开头：标记和版本，之后是8字节的行数（写完后回填），再之后是 pickle 流：
+# 列名列表，若干个行块（每块最多 SNAPSHOT_CHUNK_ROWS 行，每行是各列值的元组），最后是 None
+SNAPSHOT_MAGIC = b'XHSWB' + struct.pack('<H', SNAPSHOT_VERSION) + b'\n'
+_COUNT = struct.Struct('<Q')
+SNAPSHOT_CHUNK_ROWS = 1000
+
+# 保留的快照数量，超过时删除最久未使用的
+MAX_SNAPSHOTS = 20
+
+logger = get_logger(__name__)
+
+
+def default_cache_dir():
+    """表格快照的保存位置"""
+    return app_cache_dir('workbooks')
+
+
+def stat_key(path):
+    """按路径、大小和修改时间判断文件是否变化，不必每次读取整个文件"""
+    st = os.stat(path)
+    payload = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def read_snapshot_header(path):
+    """返回快照的 (列名, 行数)"""
+    with open(path, 'rb') as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError("快照格式不正确")
+        (count,) = _COUNT.unpack(f.read(_COUNT.size))
+        columns = pickle.load(f)
+    return columns, count
+
+
+def iter_snapshot_rows(path):
+    """以内存映射方式读取快照，逐行产出各列值的元组"""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            data.seek(len(SNAPSHOT_MAGIC) + _COUNT.size)
+            # 每块是独立的 pickle（各自的引用表），逐块读取
+            pickle.load(data)
+            while True:
+                chunk = pickle.load(data)
+                if chunk is None:
+                    return
+                yield from chunk
+
+
+class SnapshotWriter:
+    """第一次完整读取表格时同时写入快照，读完后才替换到正式位置，中途放弃时删除
+
+    写入出错（例如磁盘已满）时只放弃快照，不影响正在进行的读取。
+    """
+
+    def __init__(self, cache, path, columns):
+        self.cache = cache
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self.temp_path, 'wb')
+        self._file.write(SNAPSHOT_MAGIC)
+        self._file.write(_COUNT.pack(0))
+        pickle.dump(list(columns), self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunk = []
+        self.rows = 0
+        self.failed = False
+
+    def add(self, values):
+        if self.failed:
+            return
+        self._chunk.append(values)
+        self.rows += 1
+        if len(self._chunk) >= SNAPSHOT_CHUNK_ROWS:
+            try:
+                self._flush()
+            except (OSError, pickle.PicklingError) as e:
+                logger.warning("写入表格快照失败: %s", e)
+                self.discard()
+
+    def _flush(self):
+        pickle.dump(self._chunk, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._chunk = []
+
+    def commit(self):
+        """读取完成：写入行数，替换到正式位置，返回能否使用"""
+        if self.failed:
+            return False
+        try:
+            if self._chunk:
+                self._flush()
+            pickle.dump(None, self._file)
+            self._file.seek(len(SNAPSHOT_MAGIC))
+            self._file.write(_COUNT.pack(self.rows))
+            self._file.close()
+            os.replace(self.temp_path, self.path)
+            self.cache.prune()
+        except (OSError, pickle.PicklingError) as e:
+            logger.warning("保存表格快照失败: %s", e)
+            self.discard()
+            return False
+        return True
+
+    def discard(self):
+        self.failed = True
+        self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError as e:
+            logger.debug("删除未完成的表格快照失败: %s", e)
+
+
+class WorkbookSnapshotCache:
+    """解析后的表格快照：整行为空的行已跳过、空单元格已替换，保存全部列，按文件内容摘要命名
+
+    文件路径、大小和修改时间都没变时直接使用记录的摘要，否则重新计算摘要（内容相同的文件同样命中），
+    表格内容变化时摘要不同，旧快照自然不再使用，超过 max_snapshots 个时按最近使用时间删除。
+    """
+
+    def __init__(self, cache_dir=None, max_snapshots=MAX_SNAPSHOTS):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_snapshots = max_snapshots
+
+    def _snapshot_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.snapshot")
+
+    def _stat_path(self, key):
+        return os.path.join(self.cache_dir, 'stat', key)
+
+    def find(self, path):
+        """查找 path 的快照，返回 (快照路径或 None, 文件内容摘要)"""
+        key = stat_key(path)
+        try:
+            with open(self._stat_path(key), 'r', encoding='utf-8') as f:
+                digest = f.read().strip()
+        except OSError:
+            digest = None
+        if digest and os.path.exists(self._snapshot_path(digest)):
+            return self._touch(digest), digest
+
+        from incremental import file_digest
+        digest = file_digest(path)
+        os.makedirs(os.path.dirname(self._stat_path(key)), exist_ok=True)
+        with open(self._stat_path(key), 'w', encoding='utf-8') as f:
+            f.write(digest)
+        if os.path.exists(self._snapshot_path(digest)):
+            return self._touch(digest), digest
+        return None, digest
+
+    def lookup(self, digest):
+        """按摘要查找已有的快照（例如同一次运行中前一遍读取时写入的）"""
+        path = self._snapshot_path(digest)
+        return path if os.path.exists(path) else None
+
+    def _touch(self, digest):
+        path = self._snapshot_path(digest)
+        now = time.time()
+        os.utime(path, (now, now))
+        return path
+
+    def writer(self, digest, columns):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return SnapshotWriter(self, self._snapshot_path(digest), columns)
+
+    def prune(self):
+        """快照超过上限时删除最久未使用的，同时清理指向已删除快照的记录"""
+        snapshots = [
+            os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+            if name.endswith('.snapshot')
+        ]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for path in snapshots[self.max_snapshots:]:
+            os.remove(path)
+            logger.info("删除最久未使用的表格快照: %s", os.path.basename(path))
+
+        stat_dir = os.path.join(self.cache_dir, 'stat')
+        if os.path.isdir(stat_dir):
+            kept = {os.path.basename(path)[:-len('.snapshot')] for path in snapshots[:self.max_snapshots]}
+            for name in os.listdir(stat_dir):
+                try:
+                    with open(os.path.join(stat_dir, name), 'r', encoding='utf-8') as f:
+                        digest = f.read().strip()
+                    if digest not in kept:
+                        os.remove(os.path.join(stat_dir, name))
+                except OSError as e:
+                    logger.debug("清理表格快照记录失败: %s", e)